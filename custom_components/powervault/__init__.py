@@ -2,22 +2,81 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from datetime import timedelta
+import time
+from collections.abc import Callable
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any
 
-import requests
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from powervaultpy import PowerVault
-from powervaultpy.powervault import ServerError
-
-from .const import DOMAIN, POWERVAULT_COORDINATOR, UPDATE_INTERVAL
+from homeassistant.util import dt as dt_util
+
+from .api import PowervaultApiClient, PowervaultError, ServerError
+from .backfill import BackfillCheckpoint
+from .budget import PRIORITY_BACKGROUND, PRIORITY_LIVE
+from .cache import PowervaultValueCache
+from .commands import PowervaultCommandQueue
+from .const import (
+    BASE_INFO_INTERVAL,
+    BATTERY_STATE_INTERVAL,
+    CONF_METRICS,
+    CONF_STALE_AFTER,
+    CONF_TRACE,
+    DATA_BUCKET_MINUTES,
+    DEFAULT_STALE_AFTER,
+    DOMAIN,
+    POWERVAULT_BASE_INFO,
+    POWERVAULT_COMMANDS,
+    POWERVAULT_HUB,
+    POWERVAULT_MANAGER,
+    POWERVAULT_OPTIMIZER,
+    REFRESH_DEADLINE,
+    ROW_BUFFER_HOURS,
+    TRACE_OFF,
+)
+from .exporter import async_get_exporter
+from .hub import async_get_hub
+from .metrics import RefreshMetrics
 from .models import PowervaultBaseInfo, PowervaultData, PowervaultRuntimeData
+from .optimizer import OptimizerSettings, PowervaultOptimizer
+from .rolling import PowervaultRollingStats
+from .rows import PowervaultRowBuffer
+from .schema import decode_row
+from .services import async_setup_services
+from .storage import (
+    PowervaultStore,
+    async_remove_store,
+    base_info_from_dict,
+    base_info_to_dict,
+    data_from_dict,
+    data_to_dict,
+)
+from .totals import PowervaultTotalsAccumulator, row_time
+from .trace import PowervaultTrace
 
 _LOGGER = logging.getLogger(__name__)
 PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.SELECT]
+# pylint: disable-next=invalid-name
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+# pylint: disable-next=unused-argument
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Powervault services."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -25,215 +84,452 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})
     api_key = entry.data["api_key"]
     unit_id = entry.data["unit_id"]
-    client = PowerVault(api_key)
+    http_session = async_get_clientsession(hass)
+    hub = async_get_hub(hass, api_key)
+    client = hub.client
 
-    http_session = requests.Session()
-
-    base_info = await hass.async_add_executor_job(_fetch_base_info, client, unit_id)
+    manager = PowervaultDataManager(
+        hass,
+        client,
+        unit_id,
+        store=PowervaultStore(hass, entry.entry_id),
+        stale_after=timedelta(
+            minutes=entry.options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER)
+        ),
+        trace=PowervaultTrace(entry.options.get(CONF_TRACE, TRACE_OFF)),
+    )
+    await manager.async_restore()
+
+    # Use the unit details from the last run if there are any, and check them later.
+    # Before they were stored, they're in the device registry.
+    if manager.base_info is None:
+        manager.base_info = _base_info_from_registry(hass, entry)
+    cached_base_info = manager.base_info is not None
+    if manager.base_info is None:
+        # Setup is waiting for them, so they're fetched ahead of background work
+        manager.base_info = await _fetch_base_info(client, unit_id, PRIORITY_LIVE)
+
+    # The account hub schedules the refreshes, so the coordinator has no interval.
+    # Entities are only updated when the data has actually changed.
+    coordinator = DataUpdateCoordinator(
+        hass,
+        _LOGGER,
+        name="Powervault site",
+        update_method=manager.async_update_data,
+        always_update=False,
+    )
+    # The battery state is refreshed on its own, so neither failing makes the
+    # entities of the other unavailable. It's only polled while the select
+    # entity is enabled, and straight after it's been changed.
+    battery_coordinator = DataUpdateCoordinator(
+        hass,
+        _LOGGER,
+        name="Powervault battery state",
+        update_method=manager.async_update_battery_state,
+        update_interval=timedelta(seconds=BATTERY_STATE_INTERVAL),
+        always_update=False,
+    )
 
+    commands = PowervaultCommandQueue(hass, manager, battery_coordinator, hub)
     runtime_data = PowervaultRuntimeData(
         api_changed=False,
-        base_info=base_info,
+        base_info=manager.base_info,
         http_session=http_session,
-        coordinator=None,
+        coordinator=coordinator,
+        battery_coordinator=battery_coordinator,
         api_instance=client,
+        hub=hub,
+        manager=manager,
+        commands=commands,
+        optimizer=PowervaultOptimizer(
+            hass, manager, coordinator, battery_coordinator, commands
+        ),
     )
 
-    manager = PowervaultDataManager(hass, client, unit_id, runtime_data)
+    # If the unit has been set up before, don't hold up startup waiting for the
+    # API. Start the entities with the data from the last run if it's recent
+    # enough, otherwise they're unavailable until the first refresh finishes.
+    if manager.restored_data is not None or cached_base_info:
+        if manager.restored_data is not None:
+            _LOGGER.debug(
+                "Starting with the data stored at %s", manager.restored_data.time
+            )
+            coordinator.async_set_updated_data(manager.restored_data)
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} {unit_id} first refresh"
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
 
-    coordinator = DataUpdateCoordinator(
+    if manager.battery_state is not None:
+        battery_coordinator.async_set_updated_data(manager.battery_state)
+    entry.async_create_background_task(
         hass,
-        _LOGGER,
-        name="Powervault site",
-        update_method=manager.async_update_data,
-        update_interval=timedelta(seconds=UPDATE_INTERVAL),
+        battery_coordinator.async_refresh(),
+        f"{DOMAIN} {unit_id} battery state",
     )
 
-    await coordinator.async_config_entry_first_refresh()
+    @callback  # type: ignore[misc]
+    def _async_refresh_base_info(_now: datetime | None = None) -> None:
+        """Check the unit details in the background."""
+        entry.async_create_background_task(
+            hass,
+            _async_reconcile_base_info(hass, manager, runtime_data),
+            f"{DOMAIN} {unit_id} reconcile unit",
+        )
 
-    runtime_data[POWERVAULT_COORDINATOR] = coordinator
+    if cached_base_info:
+        _async_refresh_base_info()
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, _async_refresh_base_info, timedelta(seconds=BASE_INFO_INTERVAL)
+        )
+    )
+
+    hub.async_add_unit(unit_id, coordinator)
+
+    if entry.options.get(CONF_METRICS) and (exporter := async_get_exporter(hass)):
+        manager.on_refresh = partial(exporter.async_update_unit, manager, hub)
+        exporter.async_update_unit(manager, hub, manager.restored_data)
+        entry.async_on_unload(partial(exporter.async_remove_unit, unit_id))
+
+    runtime_data[POWERVAULT_OPTIMIZER].async_start()
+    entry.async_on_unload(runtime_data[POWERVAULT_OPTIMIZER].async_shutdown)
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = runtime_data
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when the options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:  # pylint: disable=consider-using-assignment-expr
-        hass.data[DOMAIN].pop(entry.entry_id)
+        runtime_data: PowervaultRuntimeData = hass.data[DOMAIN].pop(entry.entry_id)
+        runtime_data[POWERVAULT_HUB].async_remove_unit(entry.data["unit_id"])
+        runtime_data[POWERVAULT_COMMANDS].async_shutdown()
+        # Save now, so a reload starts with the latest state
+        manager = runtime_data[POWERVAULT_MANAGER]
+        if manager.store is not None:
+            await manager.store.async_save(manager.data_to_store())
 
     return unload_ok  # type: ignore[no-any-return]
 
 
-def _fetch_base_info(client: PowerVault, unit_id: str) -> PowervaultBaseInfo:
-    return _call_base_info(client, unit_id)
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored state when a config entry is removed."""
+    await async_remove_store(hass, entry.entry_id)
 
 
-def _call_base_info(client: PowerVault, unit_id: str) -> PowervaultBaseInfo:
+async def _fetch_base_info(
+    client: PowervaultApiClient, unit_id: str, priority: int = PRIORITY_BACKGROUND
+) -> PowervaultBaseInfo:
     """Return PowervaultBaseInfo for the device."""
-    unit_data = client.get_unit(unit_id)
+    try:
+        unit_data = await client.get_unit(unit_id, priority)
+    except PowervaultError as err:
+        raise ConfigEntryNotReady("Unable to fetch unit from powervault") from err
+    if unit_data is None:
+        raise ConfigEntryNotReady(f"Unit {unit_id} not found")
     return PowervaultBaseInfo(
         id=unit_data["id"], model=unit_data["model"], eprom_id=unit_data["epromId"]
     )
 
 
-def get_kwh(data: dict) -> dict:
-    """Convert the W reading to kWh over the 5 minute period.
-
-    :param data: The data to convert
-    :return: The converted data
-    """
-    # List of attributes to retrieve from data dict
-    attributes = [
-        "batteryInputFromGrid",
-        "batteryInputFromSolar",
-        "batteryOutputConsumedByHome",
-        "batteryOutputExported",
-        "homeConsumed",
-        "gridConsumedByHome",
-        "solarConsumedByHome",
-        "solarExported",
-        "solarGenerated",
-    ]
-    # For each attribute, loop through the data dict and convert the W reading to kWh over the 5 minute period
-    totals: dict[str, float] = {}
-    for row in data:
-        for attribute in attributes:
-            if attribute in row:
-                if attribute not in totals or not totals[attribute]:
-                    totals[attribute] = 0
-                value = row[attribute]
-                if value := row[attribute]:
-                    totals[attribute] += round(value / 1000 * (5 / 60), 2)
-
-    return totals
-
-
-class PowervaultDataManager:  # pylint: disable=too-few-public-methods
+@callback  # type: ignore[misc]
+def _base_info_from_registry(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> PowervaultBaseInfo | None:
+    """Return the unit details the device was registered with, if it has been."""
+    device_registry = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+        if device.name and device.model and device.sw_version is not None:
+            return PowervaultBaseInfo(
+                id=device.name, model=device.model, eprom_id=device.sw_version
+            )
+    return None
+
+
+async def _async_reconcile_base_info(
+    hass: HomeAssistant,
+    manager: PowervaultDataManager,
+    runtime_data: PowervaultRuntimeData,
+) -> None:
+    """Check the stored unit details against the API, updating them if they've changed."""
+    try:
+        base_info = await _fetch_base_info(manager.client, manager.unit_id)
+    except ConfigEntryNotReady as err:
+        _LOGGER.debug("Unable to check the unit details: %s", err)
+        return
+    if base_info == manager.base_info:
+        return
+
+    _LOGGER.debug("Unit details have changed to %s", base_info)
+    manager.base_info = runtime_data[POWERVAULT_BASE_INFO] = base_info
+    device_registry = dr.async_get(hass)
+    if device := device_registry.async_get_device(
+        identifiers={(DOMAIN, "_".join(base_info.id))}
+    ):
+        device_registry.async_update_device(
+            device.id, model=base_info.model, sw_version=base_info.eprom_id
+        )
+    if manager.store is not None:
+        manager.store.async_schedule_save(manager.data_to_store)
+
+
+class PowervaultDataManager:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
     """Class to manager powervault data."""
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         hass: HomeAssistant,
-        client: PowerVault,
+        client: PowervaultApiClient,
         unit_id: str,
-        runtime_data: PowervaultRuntimeData,
+        *,
+        store: PowervaultStore | None = None,
+        stale_after: timedelta = timedelta(minutes=DEFAULT_STALE_AFTER),
+        trace: PowervaultTrace | None = None,
     ) -> None:
         """Init the data manager."""
         self.hass = hass
         self.unit_id = unit_id
-        self.runtime_data = runtime_data
         self.client = client
+        self.store = store
+        self.stale_after = stale_after
+        self.base_info: PowervaultBaseInfo | None = None
+        self.restored_data: PowervaultData | None = None
+        self.battery_state: str | None = None
+        self.backfill: BackfillCheckpoint | None = None
+        self.optimizer_settings: OptimizerSettings | None = None
+        self.accumulator = PowervaultTotalsAccumulator()
+        self.values = PowervaultValueCache(stale_after)
+        self.rows = PowervaultRowBuffer(ROW_BUFFER_HOURS * 60 // DATA_BUCKET_MINUTES)
+        self.rolling = PowervaultRollingStats()
+        self.metrics = RefreshMetrics()
+        self.trace = trace or PowervaultTrace()
+        self._latest: list[dict[str, Any]] | None = None
+        self._data: PowervaultData | None = None
+        # Called with the latest data after every refresh, to export it
+        self.on_refresh: Callable[[PowervaultData | None], None] | None = None
+
+    async def async_restore(self) -> None:
+        """Restore the state stored before the last restart."""
+        if self.store is None:
+            return
+        stored = await self.store.async_load()
+        self.values.restore(stored.get("values", {}))
+        self.accumulator.restore(stored.get("totals", {}))
+        if "buffer" in stored:
+            self.rows.restore(stored["buffer"])
+            self.rolling.update(self.rows)
+        if stored.get("backfill"):
+            self.backfill = BackfillCheckpoint.from_dict(stored["backfill"])
+        if stored.get("base_info"):
+            self.base_info = base_info_from_dict(stored["base_info"])
+        if stored.get("optimizer"):
+            self.optimizer_settings = OptimizerSettings.from_dict(stored["optimizer"])
+        # It was part of the data before it was refreshed separately
+        self.battery_state = stored.get("battery_state") or (
+            stored.get("data") or {}
+        ).get("battery_state")
+
+        # Only start with the stored data if it's from today and isn't too old,
+        # otherwise wait for the first refresh as usual
+        if not stored.get("data"):
+            return
+        data = data_from_dict(stored["data"])
+        now = dt_util.utcnow()
+        if (
+            data.time is not None
+            and not self.accumulator.needs_full_fetch(now)
+            and now - data.time <= self.stale_after
+        ):
+            self.restored_data = data
+
+    def data_to_store(self) -> dict[str, Any]:
+        """Return the state to store."""
+        return {
+            "backfill": self.backfill.as_dict() if self.backfill else None,
+            "base_info": base_info_to_dict(self.base_info) if self.base_info else None,
+            "battery_state": self.battery_state,
+            "buffer": self.rows.as_dict(),
+            "data": data_to_dict(self._data) if self._data else None,
+            "optimizer": (
+                self.optimizer_settings.as_dict() if self.optimizer_settings else None
+            ),
+            "totals": self.accumulator.as_dict(),
+            "values": self.values.as_dict(),
+        }
+
+    async def async_update_battery_state(self) -> str:
+        """Fetch the battery state, separately from the readings."""
+        try:
+            battery_state = await self.client.get_battery_state(self.unit_id)
+        except PowervaultError as err:
+            raise UpdateFailed("Unable to fetch battery state from powervault") from err
+        self.trace.record("battery_state", battery_state=battery_state)
+        if battery_state != self.battery_state:
+            self.battery_state = battery_state
+            if self.store is not None:
+                self.store.async_schedule_save(self.data_to_store)
+        return battery_state
 
     async def async_update_data(self) -> PowervaultData:
-        """Fetch data from API endpoint."""
-        # Check if we had an error before
-        _LOGGER.debug("Checking if update failed")
-
-        return await self.hass.async_add_executor_job(self._update_data)  # type: ignore[no-any-return]
-
-    def _update_data(self) -> PowervaultData:
         """Fetch data from API endpoint."""
         _LOGGER.debug("Updating data")
-        for _ in range(2):
-            try:
-                data = _fetch_powervault_data(self.client, self.unit_id)
-            except ServerError as err:
-                raise UpdateFailed("Unable to fetch data from powervault") from err
-
-            return data
-        raise RuntimeError("unreachable")
-
-
-def _fetch_powervault_data(client: PowerVault, unit_id: str) -> PowervaultData:
-    """Process and update powervault data."""
-    data = client.get_data(unit_id)
-
-    _LOGGER.info(f"Data: {data}")
-
-    # Check the 0 index data keys, for any values that are None
-    need_to_get_past_hour = False
-    for key in data[0]:
-        if data[0][key] is None:
-            need_to_get_past_hour = True
-            break
-
-    if need_to_get_past_hour:
-        _LOGGER.info("Getting past-hour because at least one value is None")
-        past_hour_data = client.get_data(unit_id, period="past-hour")
-        _LOGGER.info(f"Data: {data}")
-
-        # Loop through keys of data[0] and replace any None values with the last value in the past hour,
-        # going back 1 index at a time until we find a value that is not None
-        for key in data[0]:
-            # Ignore the "time" key
-            if key == "time":
-                continue
-            if data[0][key] is None:
-                current_index = len(past_hour_data) - 1
-                while current_index >= 0:
-                    if (
-                        current_value := past_hour_data[current_index][key]
-                    ) is not None:
-                        data[0][key] = current_value
-                        _LOGGER.info(
-                            f"Replacing value of {key} to populated_entry from"
-                            f" {past_hour_data[current_index]['time']} with value"
-                            f" {current_value}"
-                        )
-                        break
-                    current_index -= 1
-
-    # Check that there is some data
-    if not data or len(data) == 0 or "instant_soc" not in data[0]:
-        raise ServerError(
-            "Failed to get data from Powervault API. Missing data from API call."
+        self.metrics.refreshes += 1
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(
+                self._async_fetch_data(), timeout=REFRESH_DEADLINE
+            )
+        except PowervaultError as err:
+            self.metrics.failures += 1
+            raise UpdateFailed("Unable to fetch data from powervault") from err
+        except asyncio.TimeoutError as err:
+            self.metrics.failures += 1
+            raise UpdateFailed("Timed out fetching data from powervault") from err
+        finally:
+            self.metrics.last_duration = time.monotonic() - start
+            self.metrics.duration.observe(self.metrics.last_duration)
+            if self.on_refresh is not None:
+                self.on_refresh(self._data or self.restored_data)
+
+    async def _async_load_today(
+        self, fetch: bool, now: datetime
+    ) -> PowervaultTotalsAccumulator | None:
+        """Fetch all of today's data if it's needed, totalling it as it arrives.
+
+        The rows are folded into a new accumulator, so the current one is left
+        as it is if the fetch fails part way through.
+        """
+        if not fetch:
+            return None
+        self.metrics.full_fetches += 1
+        accumulator = PowervaultTotalsAccumulator()
+        accumulator.start_day(now)
+        rows = 0
+        async with aclosing(self.client.iter_data(self.unit_id, "today")) as stream:
+            async for row in stream:
+                if not rows and "instant_soc" not in row:
+                    break
+                rows += 1
+                accumulator.add_row(row)
+                self.values.update((row,), now)
+                self.rows.add(row)
+        if not rows:
+            raise ServerError(
+                "Failed to get totals data from Powervault API. Missing data from API call."
+            )
+        self.metrics.rows += rows
+        # The rows have been streamed, so only the count can be recorded
+        self.trace.record("today", rows=rows)
+        return accumulator
+
+    async def _async_fetch_data(self) -> PowervaultData:
+        """Fetch and process the data, issuing independent API calls together."""
+        now = dt_util.utcnow()
+        full_fetch = self.accumulator.needs_full_fetch(now)
+
+        latest, today = await asyncio.gather(
+            self.client.get_data(self.unit_id),
+            self._async_load_today(full_fetch, now),
         )
+        if self.trace.enabled:
+            self.trace.record(
+                "latest",
+                latest,
+                rows=len(latest or []),
+                unchanged=latest is self._latest,
+            )
+
+        # The client returns the same object again if the payload hasn't changed.
+        # If it had gaps, they are filled again in case the values are now too old.
+        if (
+            not full_fetch
+            and latest is self._latest
+            and self._data is not None
+            and not self._data.missing
+        ):
+            _LOGGER.debug("Data hasn't changed, skipping processing")
+            self.metrics.unchanged += 1
+            return self._data
+
+        data = _validate_data(latest)
+        self.metrics.rows += len(data)
+        self.rows.extend(reversed(data))
+
+        # Fold the latest buckets into today's totals before any gaps are filled in,
+        # only using the whole day on startup, at midnight, or if we missed a bucket
+        if not full_fetch and not self.accumulator.fold(reversed(data)):
+            _LOGGER.debug("Missed a bucket, fetching all of today's data")
+            self.metrics.missed_buckets += 1
+            full_fetch = True
+            today = await self._async_load_today(full_fetch, now)
+        if today is not None:
+            self.accumulator = today
+
+        # Fill in any gaps from the last known values. Don't modify the
+        # response, the client may hand it back next time.
+        data = [dict(data[0]), *data[1:]]
+        gaps = None in data[0].values()
+        if missing := self.values.fill(data[0], now):
+            _LOGGER.debug("No recent value for %s", ", ".join(sorted(missing)))
+            self.metrics.gaps_unfilled += 1
+        elif gaps:
+            self.metrics.gaps_filled += 1
+
+        totals = dict(self.accumulator.totals)
+        if self.trace.enabled:
+            self.trace.record(
+                "data",
+                data[0],
+                time=row_time(data[0]),
+                missing=sorted(missing),
+                totals=totals,
+            )
+
+        self.rolling.update(self.rows)
+
+        self._latest = latest
+        self._data = _build_powervault_data(
+            data, totals, missing, self.rolling.values()
+        )
+        if self.store is not None:
+            self.store.async_schedule_save(self.data_to_store)
+        return self._data
 
-    _LOGGER.info(f"Returning: {data}")
-
-    totals = client.get_data(unit_id, period="today")
 
-    if not totals or len(totals) == 0 or "instant_soc" not in totals[0]:
+def _validate_data(data: list[dict[str, Any]] | None) -> list[dict[str, Any]]:
+    """Check that there is some data."""
+    if not data or len(data) == 0 or "instant_soc" not in data[0]:
         raise ServerError(
-            "Failed to get totals data from Powervault API. Missing data from API call."
+            "Failed to get data from Powervault API. Missing data from API call."
         )
+    return data
 
-    # Check for None values in any of the total data. Use instant_battery as a test
-    for row in totals:
-        # Remove anything that is None
-        if "instant_battery" not in row or row["instant_battery"] is None:
-            totals.remove(row)
-
-    totals = get_kwh(totals)
-
-    _LOGGER.info(f"Totals: {totals}")
-
-    battery_state = client.get_battery_state(unit_id)
 
+def _build_powervault_data(
+    data: list[dict],
+    totals: dict,
+    missing: frozenset[str],
+    rolling: dict[str, float | None],
+) -> PowervaultData:
+    """Build the point in time data from the latest row."""
     return PowervaultData(
-        charge=data[0]["instant_soc"],
-        batteryInputFromGrid=data[0]["batteryInputFromGrid"],
-        batteryInputFromSolar=data[0]["batteryInputFromSolar"],
-        batteryOutputConsumedByHome=data[0]["batteryOutputConsumedByHome"],
-        batteryOutputExported=data[0]["batteryOutputExported"],
-        homeConsumed=data[0]["homeConsumed"],
-        gridConsumedByHome=data[0]["gridConsumedByHome"],
-        solarConsumedByHome=data[0]["solarConsumedByHome"],
-        solarExported=data[0]["solarExported"],
-        instant_battery=data[0]["instant_battery"],
-        instant_demand=data[0]["instant_demand"],
-        instant_grid=data[0]["instant_grid"],
-        solarGenerated=data[0]["solarGenerated"],
-        solarConsumption=data[0]["solarConsumption"],
-        instant_solar=(
-            data[0]["instant_solar"] if data[0]["instant_solar"] > 10000 else 0
-        ),
-        battery_state=battery_state,
+        **decode_row(data[0]),
         totals=totals,
+        time=row_time(data[0]),
+        missing=missing,
+        rolling=rolling,
     )
@@ -0,0 +1,627 @@
+"""Async client for the Powervault REST API."""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import hashlib
+import json
+import logging
+import re
+import time
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any
+
+import aiohttp
+from homeassistant.util import dt as dt_util
+
+from .budget import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_COMMAND,
+    PRIORITY_LIVE,
+    PRIORITY_TOTALS,
+    RequestBudget,
+)
+from .const import API_CALL_TIMEOUT, API_RETRIES, API_RETRY_MAX_DELAY
+from .metrics import ApiMetrics
+from .resilience import CircuitBreaker, backoff_delay, parse_retry_after
+
+_LOGGER = logging.getLogger(__name__)
+
+BASE_URL = "https://rest-api.powervault.co.uk/v4"
+
+VALID_PERIODS = [
+    "today",
+    "yesterday",
+    "past-hour",
+    "last-hour",
+    "past-day",
+    "last-day",
+    "past-week",
+    "last-week",
+    "past-month",
+    "last-month",
+]
+
+# How much of a streamed response is read at a time
+STREAM_CHUNK_SIZE = 16384
+
+# Schedules are returned in UK local time, overrides in UTC
+SCHEDULE_TIME_ZONE = "Europe/London"
+OVERRIDE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class PowervaultError(Exception):
+    """Base error for the Powervault API."""
+
+
+class ServerError(PowervaultError):
+    """Error to indicate the API couldn't be reached or failed."""
+
+    def __init__(self, *args: object, retry_after: float | None = None) -> None:
+        """Init the error, with how long the API asked to wait if it did."""
+        super().__init__(*args)
+        self.retry_after = retry_after
+
+
+class RateLimitError(ServerError):
+    """Error to indicate the API asked for fewer requests."""
+
+
+class CircuitOpenError(ServerError):
+    """Error to indicate requests are paused after repeated failures."""
+
+
+class RequestError(PowervaultError):
+    """Error to indicate the API rejected the request."""
+
+
+@dataclass
+class _CachedResponse:
+    """The last response for a URL, used to skip decoding unchanged payloads."""
+
+    fingerprint: bytes
+    body: dict[str, Any]
+    etag: str | None
+    last_modified: str | None
+
+
+@dataclass
+class _SharedRequest:
+    """A GET request in flight, and how many callers are waiting for it."""
+
+    task: asyncio.Task[dict[str, Any] | None]
+    waiters: int = 0
+
+
+class _RowStreamParser:
+    """Parses the rows of the "data" array out of a response as it arrives.
+
+    Only the rows that haven't been returned yet and the start of the next one
+    are held, rather than the whole body.
+    """
+
+    _DATA_START = re.compile(r'"data"\s*:\s*\[')
+    _SEPARATORS = " \t\r\n,"
+
+    def __init__(self, encoding: str) -> None:
+        """Init the parser."""
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self.found = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        """Add a chunk of the body, and return the rows that are now complete."""
+        self._buffer += self._decoder.decode(chunk)
+        if self.done:
+            self._buffer = ""
+            return []
+
+        position = 0
+        if not self.found:
+            if (match := self._DATA_START.search(self._buffer)) is None:
+                # Keep enough to find the key if it's split between chunks
+                self._buffer = self._buffer[-32:]
+                return []
+            self.found = True
+            position = match.end()
+
+        rows = []
+        length = len(self._buffer)
+        while True:
+            while position < length and self._buffer[position] in self._SEPARATORS:
+                position += 1
+            if position >= length:
+                break
+            if self._buffer[position] == "]":
+                self.done = True
+                break
+            try:
+                row, position = self._json.raw_decode(self._buffer, position)
+            except ValueError:
+                # The row hasn't all arrived yet
+                break
+            rows.append(row)
+
+        self._buffer = "" if self.done else self._buffer[position:]
+        return rows
+
+    @property
+    def complete(self) -> bool:
+        """Return True if the parser isn't part way through the data array."""
+        return not self.found or self.done
+
+
+class PowervaultApiClient:  # pylint: disable=too-many-instance-attributes
+    """Async client for the Powervault API, using a shared aiohttp session.
+
+    Requests for the small, frequently polled endpoints are conditional. If
+    the API returns 304 Not Modified, or the payload is byte for byte the same
+    as last time, the previously decoded body is returned again rather than a
+    new one, so callers can check for identity to skip re-processing it.
+
+    GET requests that fail for a reason that might not last are retried with
+    jittered backoff. All requests go through a circuit breaker, so that once
+    the API is down they fail straight away, rather than every unit on the
+    account continuing to call it.
+
+    Every request takes its turn from a budget shared by everything using the
+    API key, by priority. A GET that's the same as one already in flight waits
+    for that one's response rather than being made again.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        api_key: str,
+        base_url: str = BASE_URL,
+        budget: RequestBudget | None = None,
+    ) -> None:
+        """Init the client."""
+        self._session = session
+        self._base_url = base_url
+        self._headers = {"x-api-key": api_key, "accept": "*/*"}
+        self._timeout = aiohttp.ClientTimeout(total=API_CALL_TIMEOUT)
+        # Long streams can take a while in total, so only time out if they stall
+        self._stream_timeout = aiohttp.ClientTimeout(
+            sock_connect=API_CALL_TIMEOUT, sock_read=API_CALL_TIMEOUT
+        )
+        self._cache: dict[str, _CachedResponse] = {}
+        self.metrics = ApiMetrics()
+        self.breaker = CircuitBreaker()
+        self.budget = budget or RequestBudget()
+        self._shared: dict[tuple[Any, ...], _SharedRequest] = {}
+
+    async def get_account(self) -> dict[str, Any] | None:
+        """Get the user's account data from the API."""
+        response = await self._request(
+            "GET", "/customerAccount", priority=PRIORITY_COMMAND
+        )
+
+        if response and (account := response.get("customerAccount")):
+            if account.get("id") is not None:
+                return {"id": account["id"], "accountName": account["accountName"]}
+
+        _LOGGER.error("Failed to retrieve account")
+        return None
+
+    async def get_units(self, account_id: int) -> list[dict[str, Any]] | None:
+        """Get the user's units from the API."""
+        response = await self._request(
+            "GET",
+            "/unit",
+            params={"customerAccountId": account_id},
+            priority=PRIORITY_COMMAND,
+        )
+
+        if response and response.get("units") is not None:
+            return response["units"]  # type: ignore[no-any-return]
+
+        _LOGGER.error("Failed to retrieve units")
+        return None
+
+    async def get_unit(
+        self, unit_id: str, priority: int = PRIORITY_BACKGROUND
+    ) -> dict[str, Any] | None:
+        """Get the unit details from the API."""
+        response = await self._request(
+            "GET", f"/unit/{unit_id}", conditional=True, priority=priority
+        )
+
+        if response and "unit" in response:
+            return response["unit"]  # type: ignore[no-any-return]
+
+        _LOGGER.error("Failed to retrieve unit")
+        return None
+
+    async def get_data(
+        self, unit_id: str, period: str | None = None
+    ) -> list[dict[str, Any]] | None:
+        """Get the latest metrics from the unit, or all of them for a period."""
+        params = None
+        if period is not None:
+            if period not in VALID_PERIODS:
+                raise RequestError(f"Invalid period: {period}")
+            params = {"period": period}
+
+        # The latest data is polled often, whereas periods are only fetched now and then
+        response = await self._request(
+            "GET",
+            f"/unit/{unit_id}/data",
+            params=params,
+            conditional=period is None,
+            priority=PRIORITY_LIVE if period is None else PRIORITY_TOTALS,
+        )
+
+        if response and "data" in response:
+            return response["data"]  # type: ignore[no-any-return]
+
+        _LOGGER.error("Failed to retrieve data")
+        return None
+
+    async def iter_data(  # pylint: disable=unnecessary-default-type-args
+        self, unit_id: str, period: str, priority: int = PRIORITY_TOTALS
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        """Yield all the metrics from the unit for a period, as they are received.
+
+        Unlike get_data, the rows are parsed from the response as it arrives,
+        so the whole response is never held in memory at once.
+        """
+        if period not in VALID_PERIODS:
+            raise RequestError(f"Invalid period: {period}")
+
+        # A stream isn't retried, as rows may already have been yielded
+        url = f"{self._base_url}/unit/{unit_id}/data"
+        endpoint = _endpoint(f"/unit/{unit_id}/data", {"period": period})
+        probe = self._check_breaker()
+        start = time.monotonic()
+        size = 0
+        error = True
+        try:
+            await self.budget.acquire(priority)
+            start = time.monotonic()
+            async with self._session.get(
+                url,
+                params={"period": period},
+                headers=self._headers,
+                timeout=self._stream_timeout,
+            ) as response:
+                if response.status >= 400:
+                    text = await response.text(errors="replace")
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    try:
+                        found = _check_status(url, response.status, text, retry_after)
+                    except ServerError as err:
+                        self._record_failure(err)
+                        raise
+                    if not found:
+                        self.breaker.record_success()
+                        _LOGGER.error("Failed to retrieve data")
+                        return
+                self.breaker.record_success()
+
+                parser = _RowStreamParser(response.get_encoding())
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    for row in parser.feed(chunk):
+                        yield row
+            error = not parser.complete
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            server_error = ServerError(f"Failed to connect to Powervault API ({url})")
+            self._record_failure(server_error)
+            raise server_error from err
+        finally:
+            if probe:
+                self.breaker.release()
+            # Includes the time the caller spent on each row, as it's streamed
+            self.metrics.record(endpoint, time.monotonic() - start, size, error=error)
+
+        if not parser.complete:
+            raise ServerError(f"Failed to extract response json: {url}; truncated")
+        if not parser.found:
+            _LOGGER.error("Failed to retrieve data")
+
+    async def get_battery_state(self, unit_id: str) -> str:
+        """Query the schedule and overrides to determine the current battery state."""
+        schedule_response, override_response = await asyncio.gather(
+            self._request("GET", f"/unit/{unit_id}/schedule", conditional=True),
+            self._request("GET", f"/unit/{unit_id}/stateOverride", conditional=True),
+        )
+
+        now = dt_util.utcnow()
+        current_state = None
+
+        # Schedules are in local time, for the current day of the week
+        local_now = now.astimezone(dt_util.get_time_zone(SCHEDULE_TIME_ZONE))
+        current_dow = local_now.strftime("%A").lower()
+        schedules = (schedule_response or {}).get("schedule", {})
+        for schedule_dow, schedule in schedules.items():
+            if schedule_dow.lower() != current_dow:
+                continue
+            for event in schedule:
+                start = datetime.strptime(event["start"], "%H:%M:%S").time()
+                end = datetime.strptime(event["end"], "%H:%M:%S").time()
+                if start <= local_now.time() <= end:
+                    current_state = event["state"]
+                    break
+
+        # If there is a state override, use that instead
+        for override in (override_response or {}).get("stateOverrides") or []:
+            override_start = _parse_override_time(override["start"])
+            override_end = _parse_override_time(override["end"])
+            if override_start <= now <= override_end:
+                current_state = override["state"]
+                break
+
+        if current_state is None:
+            raise ServerError("Failed to determine current state")
+
+        _LOGGER.debug("Current state: %s", current_state)
+        return current_state  # type: ignore[no-any-return]
+
+    async def set_battery_state(self, unit_id: str, battery_state: str) -> bool:
+        """Override the current battery status with the provided one for 24 hours."""
+        now = dt_util.utcnow()
+        payload = {
+            "stateOverrides": [
+                {
+                    "start": now.strftime(OVERRIDE_TIME_FORMAT),
+                    "end": (now + timedelta(hours=24)).strftime(OVERRIDE_TIME_FORMAT),
+                    "state": battery_state,
+                }
+            ]
+        }
+
+        response = await self._request(
+            "POST",
+            f"/unit/{unit_id}/stateOverride",
+            json_data=payload,
+            priority=PRIORITY_COMMAND,
+        )
+
+        return bool(
+            response
+            and "stateOverrides" in response
+            and response.get("message") == "success"
+        )
+
+    async def _request(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        json_data: dict[str, Any] | None = None,
+        conditional: bool = False,
+        priority: int = PRIORITY_LIVE,
+    ) -> dict[str, Any] | None:
+        """Make a request to the API, sharing a GET with the same one in flight.
+
+        For example, the battery state being polled while a change is being
+        confirmed is only fetched once. It's only shared with requests of the
+        same priority, so an urgent request isn't held up by a queued one.
+        """
+        if method != "GET":
+            return await self._request_with_retries(
+                method, path, params, json_data, conditional, priority
+            )
+
+        key = (path, tuple(sorted((params or {}).items())), conditional, priority)
+        shared = self._shared.get(key)
+        if shared is None or shared.task.done():
+            task = asyncio.get_running_loop().create_task(
+                self._request_with_retries(
+                    method, path, params, json_data, conditional, priority
+                )
+            )
+            shared = self._shared[key] = _SharedRequest(task)
+            task.add_done_callback(partial(self._shared_done, key))
+        else:
+            self.metrics.shared += 1
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                # Every caller has given up on it
+                shared.task.cancel()
+
+    def _shared_done(
+        self, key: tuple[Any, ...], task: asyncio.Task[dict[str, Any] | None]
+    ) -> None:
+        """Stop sharing a request once it's finished."""
+        if (shared := self._shared.get(key)) is not None and shared.task is task:
+            del self._shared[key]
+        if not task.cancelled():
+            # The callers have already been given any error
+            task.exception()
+
+    async def _request_with_retries(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None,
+        json_data: dict[str, Any] | None,
+        conditional: bool,
+        priority: int,
+    ) -> dict[str, Any] | None:
+        """Make a request to the API, retrying GETs that fail for a transient reason.
+
+        Other requests aren't retried, as they might have been made already.
+        Each attempt takes its turn from the budget.
+        """
+        attempt = 0
+        while True:
+            probe = self._check_breaker()
+            try:
+                await self.budget.acquire(priority)
+                body = await self._request_once(
+                    method, path, params, json_data, conditional
+                )
+            except ServerError as err:
+                self._record_failure(err)
+                delay = (
+                    err.retry_after
+                    if err.retry_after is not None
+                    else backoff_delay(attempt)
+                )
+                if (
+                    method != "GET"
+                    or attempt >= API_RETRIES
+                    or delay > API_RETRY_MAX_DELAY
+                ):
+                    raise
+            except RequestError:
+                # The API is up, it just didn't like the request
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return body
+            finally:
+                if probe:
+                    self.breaker.release()
+
+            attempt += 1
+            self.metrics.retries += 1
+            _LOGGER.debug("Retrying %s %s in %.1f seconds", method, path, delay)
+            await asyncio.sleep(delay)
+
+    def _check_breaker(self) -> bool:
+        """Raise an error if requests are paused, or return True for a probe."""
+        now = time.monotonic()
+        if not self.breaker.allow(now):
+            self.metrics.rejected += 1
+            raise CircuitOpenError(
+                "Requests to the Powervault API are paused for "
+                f"{self.breaker.retry_in(now):.0f} seconds after repeated failures"
+            )
+        return self.breaker.probing
+
+    def _record_failure(self, err: ServerError) -> None:
+        """Record a failure with the breaker, pausing if the API asked for longer."""
+        now = time.monotonic()
+        self.breaker.record_failure(now)
+        if err.retry_after is not None and err.retry_after > API_RETRY_MAX_DELAY:
+            self.breaker.hold(now, err.retry_after)
+
+    async def _request_once(  # pylint: disable=too-many-locals
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None,
+        json_data: dict[str, Any] | None,
+        conditional: bool,
+    ) -> dict[str, Any] | None:
+        """Make a request to the API and return the decoded JSON body."""
+        url = f"{self._base_url}{path}"
+        cache_key = f"{url}?{params}"
+        cached = self._cache.get(cache_key) if conditional else None
+
+        headers = self._headers
+        if cached is not None:
+            headers = dict(headers)
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        endpoint = _endpoint(path, params)
+        start = time.monotonic()
+        try:
+            async with self._session.request(
+                method,
+                url,
+                params=params,
+                json=json_data,
+                headers=headers,
+                timeout=self._timeout,
+            ) as response:
+                status = response.status
+                if status == 304 and cached is not None:
+                    self.metrics.record(
+                        endpoint, time.monotonic() - start, unchanged=True
+                    )
+                    return cached.body
+                raw = await response.read()
+                text = raw.decode(response.get_encoding(), errors="replace")
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            self.metrics.record(endpoint, time.monotonic() - start, error=True)
+            raise ServerError(f"Failed to connect to Powervault API ({url})") from err
+
+        fingerprint = (
+            hashlib.blake2b(raw, digest_size=16).digest() if conditional else b""
+        )
+        unchanged = cached is not None and cached.fingerprint == fingerprint
+        self.metrics.record(
+            endpoint,
+            time.monotonic() - start,
+            len(raw),
+            error=status >= 400,
+            unchanged=unchanged,
+        )
+
+        if not _check_status(url, status, text, retry_after):
+            return None
+
+        if cached is not None and unchanged:
+            return cached.body
+
+        try:
+            body: dict[str, Any] = json.loads(text)
+        except ValueError as err:
+            raise ServerError(
+                f"Failed to extract response json: {url}; {text}"
+            ) from err
+
+        if conditional:
+            self._cache[cache_key] = _CachedResponse(
+                fingerprint, body, etag, last_modified
+            )
+        return body
+
+
+def _endpoint(path: str, params: dict[str, Any] | None) -> str:
+    """Return the name of an endpoint for metrics, without the unit id."""
+    parts = path.strip("/").split("/")
+    if len(parts) > 1:
+        parts[1] = "{id}"
+    endpoint = "/".join(parts)
+    if params and "period" in params:
+        endpoint += f"?period={params['period']}"
+    return endpoint
+
+
+def _check_status(
+    url: str, status: int, text: str, retry_after: float | None = None
+) -> bool:
+    """Raise an error for a failed request, or return False if nothing was found."""
+    if status >= 500:
+        raise ServerError(
+            f"DO NOT REPORT - PowerVault server error ({url}): {status}; {text}",
+            retry_after=retry_after,
+        )
+    if status == 429:
+        raise RateLimitError(
+            f"Too many requests to Powervault API ({url})", retry_after=retry_after
+        )
+    if status in (401, 403):
+        raise RequestError(f"Invalid API key ({url}): {status}")
+    if status == 404:
+        return False
+    if status >= 400:
+        raise RequestError(f"Failed to send request ({url}): {status}; {text}")
+    return True
+
+
+def _parse_override_time(value: str) -> datetime:
+    """Parse a UTC override time."""
+    return datetime.strptime(value, OVERRIDE_TIME_FORMAT).replace(tzinfo=dt_util.UTC)
@@ -0,0 +1,163 @@
+"""Backfill of long term energy statistics for the Powervault integration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .budget import PRIORITY_BACKGROUND
+from .const import BACKFILL_CONCURRENCY, DOMAIN
+from .energy import GROUP_HOUR, EnergyColumnBuilder, EnergyColumns, integrate
+from .schema import ENERGY_TOTAL_NAMES
+from .totals import BUCKET_SECONDS
+
+if TYPE_CHECKING:
+    from . import PowervaultDataManager
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillCheckpoint:
+    """How far statistics have been imported, and the running sums at that point."""
+
+    hour: datetime
+    sums: dict[str, float]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the checkpoint in a form that can be stored."""
+        return {"hour": self.hour.isoformat(), "sums": self.sums}
+
+    @classmethod
+    def from_dict(cls, stored: dict[str, Any]) -> BackfillCheckpoint | None:
+        """Restore a checkpoint from a stored dict."""
+        if (hour := dt_util.parse_datetime(stored["hour"])) is None:
+            return None
+        return cls(hour, stored["sums"])
+
+
+def statistic_id(unit_id: str, attribute: str) -> str:
+    """Return the external statistic id for an attribute of a unit."""
+    return f"{DOMAIN}:{slugify(f'{unit_id}_{attribute}')}"
+
+
+def backfill_periods(checkpoint: datetime | None, now: datetime) -> list[str]:
+    """Return the periods to fetch, oldest first, to cover everything since a time.
+
+    The API only returns named periods rather than arbitrary ranges, so the
+    shortest set of periods that reaches back far enough is used. They
+    overlap, so rows that have already been imported are skipped.
+    """
+    today = dt_util.start_of_local_day(now)
+    if checkpoint is not None and checkpoint >= today:
+        return ["today"]
+    if checkpoint is not None and checkpoint >= today - timedelta(days=1):
+        return ["yesterday", "today"]
+    if checkpoint is not None and checkpoint >= today - timedelta(days=6):
+        return ["past-week", "today"]
+    return ["last-month", "past-month", "today"]
+
+
+async def async_backfill(  # pylint: disable=too-many-locals
+    hass: HomeAssistant, manager: PowervaultDataManager, name: str
+) -> int:
+    """Import hourly energy statistics for a unit since the last checkpoint.
+
+    The periods are fetched concurrently, but imported in order, saving the
+    checkpoint after each one so that an interrupted backfill carries on from
+    where it got to. Only whole hours are imported. Returns the number of
+    hours imported.
+    """
+    # The recorder takes a while to import, so only import it once it's running
+    # pylint: disable-next=import-outside-toplevel
+    from homeassistant.components.recorder.models import (
+        StatisticData,
+        StatisticMetaData,
+    )
+
+    # pylint: disable-next=import-outside-toplevel
+    from homeassistant.components.recorder.statistics import (
+        async_add_external_statistics,
+    )
+
+    now = dt_util.utcnow()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    checkpoint = manager.backfill
+    periods = backfill_periods(checkpoint.hour if checkpoint else None, now)
+    semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+    async def _async_fetch(period: str) -> EnergyColumns:
+        # Only the readings are kept, not the whole of each row
+        builder = EnergyColumnBuilder()
+        async with semaphore, aclosing(
+            manager.client.iter_data(manager.unit_id, period, PRIORITY_BACKGROUND)
+        ) as stream:
+            async for row in stream:
+                builder.add(row)
+        return builder.build()
+
+    _LOGGER.debug("Backfilling %s from %s", manager.unit_id, periods)
+    responses = await asyncio.gather(*(_async_fetch(period) for period in periods))
+
+    imported = 0
+    for period, columns in zip(periods, responses):
+        if not columns:
+            continue
+
+        # Stop at the last whole hour that has data
+        data_end = dt_util.utc_from_timestamp(
+            (int(columns.buckets[-1]) + 1) * BUCKET_SECONDS
+        ).replace(minute=0, second=0, microsecond=0)
+        hours = integrate(
+            columns,
+            GROUP_HOUR,
+            start=checkpoint.hour if checkpoint else None,
+            end=min(data_end, current_hour),
+        )
+        if not hours:
+            continue
+
+        sums = dict(checkpoint.sums) if checkpoint else {}
+        statistics: dict[str, list[StatisticData]] = {}
+        for hour in hours:
+            for attribute, total in hour.totals.items():
+                # The totals are in the same units as the sensors before scaling
+                sums[attribute] = sums.get(attribute, 0) + total / 1000
+                statistics.setdefault(attribute, []).append(
+                    StatisticData(
+                        start=hour.start, state=sums[attribute], sum=sums[attribute]
+                    )
+                )
+
+        for attribute, attribute_statistics in statistics.items():
+            async_add_external_statistics(
+                hass,
+                StatisticMetaData(
+                    has_mean=False,
+                    has_sum=True,
+                    name=f"{name} {ENERGY_TOTAL_NAMES.get(attribute, attribute)}",
+                    source=DOMAIN,
+                    statistic_id=statistic_id(manager.unit_id, attribute),
+                    unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+                ),
+                attribute_statistics,
+            )
+
+        _LOGGER.debug(
+            "Imported %s hours from %s, up to %s", len(hours), period, hours[-1].end
+        )
+        imported += len(hours)
+        checkpoint = manager.backfill = BackfillCheckpoint(hours[-1].end, sums)
+        if manager.store is not None:
+            await manager.store.async_save(manager.data_to_store())
+
+    return imported
@@ -0,0 +1,159 @@
+"""Request budget for the Powervault API, shared by everything using an API key."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any
+
+from .const import API_BUDGET_BURST, API_BUDGET_RATE, API_BUDGET_RESERVES
+
+# Priorities of requests, most important first
+PRIORITY_COMMAND = 0
+PRIORITY_LIVE = 1
+PRIORITY_TOTALS = 2
+PRIORITY_BACKGROUND = 3
+PRIORITY_NAMES = ("command", "live", "totals", "background")
+
+
+class RequestBudget:  # pylint: disable=too-many-instance-attributes
+    """Token bucket that hands out requests to the API by priority.
+
+    Each request takes a token, and tokens are refilled at a steady rate up to
+    the burst size. Commands from the user are never held up, and take a token
+    even if there are none left, which the other requests then wait to be
+    refilled. The other priorities wait while taking a token would leave less
+    than their reserve, so when the budget runs low the latest data is still
+    fetched while daily totals and background work queue behind it. Waiting
+    requests are let through highest priority first, then in the order they
+    arrived. Times are from time.monotonic.
+    """
+
+    def __init__(
+        self,
+        rate: float = API_BUDGET_RATE,
+        burst: float = API_BUDGET_BURST,
+        reserves: tuple[float, ...] = API_BUDGET_RESERVES,
+    ) -> None:
+        """Init the budget, with a full bucket."""
+        self.rate = rate
+        self.burst = burst
+        self._floors = [burst * reserve for reserve in reserves]
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        # Heap of waiting requests: priority, arrival and the future to resolve
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._arrivals = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        # Requests let through, those that had to wait, and the seconds they
+        # waited in total, by priority
+        self.granted = [0] * len(PRIORITY_NAMES)
+        self.delayed = [0] * len(PRIORITY_NAMES)
+        self.waited = [0.0] * len(PRIORITY_NAMES)
+
+    async def acquire(self, priority: int) -> None:
+        """Wait until a request of a priority can be made, and take its token."""
+        start = time.monotonic()
+        self._refill(start)
+        if priority == PRIORITY_COMMAND or (
+            not (self._waiters and self._waiters[0][0] <= priority)
+            and self._available(priority)
+        ):
+            self._take(priority)
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._arrivals), future)
+        heapq.heappush(self._waiters, waiter)
+        self.delayed[priority] += 1
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+            else:
+                # It was let through just as it was cancelled
+                self.tokens += 1
+            self._schedule()
+            raise
+        self.waited[priority] += time.monotonic() - start
+
+    def remaining(self, now: float) -> float:
+        """Return the tokens left, which is negative after a burst of commands."""
+        self._refill(now)
+        return self.tokens
+
+    @property
+    def waiting(self) -> list[int]:
+        """Return the number of requests waiting, by priority."""
+        counts = [0] * len(PRIORITY_NAMES)
+        for priority, _, _ in self._waiters:
+            counts[priority] += 1
+        return counts
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens refilled since the last update."""
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _available(self, priority: int) -> bool:
+        """Return True if a request of a priority can take a token now."""
+        return self.tokens - 1 >= self._floors[priority]
+
+    def _take(self, priority: int) -> None:
+        """Take a token for a request."""
+        self.tokens -= 1
+        self.granted[priority] += 1
+
+    def _wake(self) -> None:
+        """Let through the waiting requests that there are tokens for."""
+        self._timer = None
+        self._refill(time.monotonic())
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Cancelled, and not removed yet
+                heapq.heappop(self._waiters)
+                continue
+            if not self._available(priority):
+                break
+            heapq.heappop(self._waiters)
+            self._take(priority)
+            future.set_result(None)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        """Wake up when there are enough tokens for the first waiting request."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._waiters:
+            return
+        needed = 1 + self._floors[self._waiters[0][0]] - self.tokens
+        self._timer = asyncio.get_running_loop().call_later(
+            max(0.0, needed / self.rate), self._wake
+        )
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Return the state of the budget for diagnostics."""
+        return {
+            "tokens": round(self.remaining(now), 1),
+            "rate": self.rate,
+            "burst": self.burst,
+            "priorities": {
+                name: {
+                    "granted": self.granted[priority],
+                    "delayed": self.delayed[priority],
+                    "waiting": waiting,
+                    "waited": round(self.waited[priority], 1),
+                }
+                for priority, (name, waiting) in enumerate(
+                    zip(PRIORITY_NAMES, self.waiting)
+                )
+            },
+        }
@@ -0,0 +1,75 @@
+"""Last known good values for the Powervault integration."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .totals import row_time
+
+
+class PowervaultValueCache:
+    """The last value received for each field, used to fill in gaps in the data.
+
+    The API returns None for some fields at the start of every 5 minute
+    bucket. Instead of fetching the past hour to find an earlier value, the
+    last non-None value of each field is kept, along with the time of the row
+    it came from, or when it was received if the row has no time. Values older
+    than max_age aren't used, so the field stays None.
+    """
+
+    def __init__(self, max_age: timedelta) -> None:
+        """Init the cache."""
+        self.max_age = max_age
+        self._values: dict[str, tuple[Any, datetime]] = {}
+
+    def update(self, rows: Iterable[dict[str, Any]], now: datetime) -> None:
+        """Remember the non-None values in the rows, newer rows taking priority."""
+        for row in rows:
+            received = row_time(row) or now
+            for key, value in row.items():
+                if value is not None and key != "time":
+                    self._remember(key, value, received)
+
+    def fill(self, row: dict[str, Any], now: datetime) -> frozenset[str]:
+        """Fill in the None values of a row, and remember the others.
+
+        Returns the fields that are still None, because there's no recent
+        enough value for them.
+        """
+        missing = set()
+        received = row_time(row) or now
+        for key, value in row.items():
+            if key == "time":
+                continue
+            if value is not None:
+                self._remember(key, value, received)
+                continue
+            cached = self._values.get(key)
+            if cached is None or now - cached[1] > self.max_age:
+                missing.add(key)
+                continue
+            row[key] = cached[0]
+        return frozenset(missing)
+
+    def _remember(self, key: str, value: Any, received: datetime) -> None:
+        """Remember a value, unless there's one from a newer row."""
+        cached = self._values.get(key)
+        if cached is None or received >= cached[1]:
+            self._values[key] = (value, received)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the cache in a form that can be stored."""
+        return {
+            key: [value, received.isoformat()]
+            for key, (value, received) in self._values.items()
+        }
+
+    def restore(self, stored: dict[str, Any]) -> None:
+        """Restore the cache from a stored dict."""
+        for key, (value, received) in stored.items():
+            if (parsed := dt_util.parse_datetime(received)) is not None:
+                self._values[key] = (value, parsed)
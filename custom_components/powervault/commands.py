@@ -0,0 +1,185 @@
+"""Battery state changes for the Powervault integration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .api import PowervaultError, RequestError
+from .const import (
+    COMMAND_CONFIRM_DELAYS,
+    COMMAND_DEBOUNCE,
+    COMMAND_RETRIES,
+    COMMAND_RETRY_DELAY,
+    DOMAIN,
+)
+from .metrics import CommandMetrics
+
+if TYPE_CHECKING:
+    from . import PowervaultDataManager
+    from .hub import PowervaultAccountHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PowervaultCommandQueue:  # pylint: disable=too-many-instance-attributes
+    """Sends the battery state changes of a unit, one at a time.
+
+    Automations often change the state several times around a tariff
+    boundary, so selections are coalesced and only the latest is sent, once
+    they've settled. Until it's confirmed, the requested state is shown
+    instead of the one last polled. A failed send is retried with backoff,
+    and a sent change is confirmed by refreshing the battery state
+    coordinator, rather than the readings.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        manager: PowervaultDataManager,
+        coordinator: DataUpdateCoordinator[str],
+        hub: PowervaultAccountHub,
+    ) -> None:
+        """Init the queue."""
+        self.hass = hass
+        self.manager = manager
+        self.coordinator = coordinator
+        self.hub = hub
+        self.metrics = CommandMetrics()
+        # The state that was last requested, until it's confirmed or has failed
+        self.target: str | None = None
+        self._pending: str | None = None
+        self._unsub_debounce: CALLBACK_TYPE | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @callback  # type: ignore[misc]
+    def async_request(self, battery_state: str) -> None:
+        """Queue a change of battery state, replacing any that hasn't been sent."""
+        self.metrics.requested += 1
+        if self._pending is not None:
+            self.metrics.coalesced += 1
+        self._pending = self.target = battery_state
+        self._async_cancel_debounce()
+        self._unsub_debounce = async_call_later(
+            self.hass, COMMAND_DEBOUNCE, self._async_debounced
+        )
+
+    @callback  # type: ignore[misc]
+    def async_shutdown(self) -> None:
+        """Stop sending changes, dropping any that haven't been sent."""
+        self._async_cancel_debounce()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._pending = self.target = None
+
+    @callback  # type: ignore[misc]
+    def _async_cancel_debounce(self) -> None:
+        """Cancel the pending send."""
+        if self._unsub_debounce is not None:
+            self._unsub_debounce()
+            self._unsub_debounce = None
+
+    @callback  # type: ignore[misc]
+    def _async_debounced(self, _now: datetime) -> None:
+        """Start sending, once the selections have settled."""
+        self._unsub_debounce = None
+        # A send that's still running picks up the latest selection when it's done
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"{DOMAIN} {self.manager.unit_id} battery state"
+            )
+
+    def _settled(self) -> str | None:
+        """Return the selection to send next, if it has settled."""
+        return self._pending if self._unsub_debounce is None else None
+
+    async def _async_run(self) -> None:
+        """Send the latest selection until there are no more."""
+        try:
+            while (battery_state := self._settled()) is not None:
+                self._pending = None
+                if await self._async_send(battery_state) and self._pending is None:
+                    await self._async_confirm(battery_state)
+        finally:
+            self._task = None
+        if self._pending is None:
+            self.target = None
+            # Show the polled state again, in case the change didn't happen
+            self.coordinator.async_update_listeners()
+
+    async def _async_send(self, battery_state: str) -> bool:
+        """Send a change of battery state, retrying with backoff if it fails."""
+        unit_id = self.manager.unit_id
+        for attempt in range(COMMAND_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(COMMAND_RETRY_DELAY * 2 ** (attempt - 1))
+                if self._pending is not None:
+                    # There's a newer selection, so send that instead
+                    self.metrics.coalesced += 1
+                    return False
+                self.metrics.retries += 1
+            try:
+                if await self.manager.client.set_battery_state(unit_id, battery_state):
+                    self.metrics.sent += 1
+                    return True
+                self.metrics.last_error = "The change was not accepted"
+            except RequestError as err:
+                # Sending the same request again won't help
+                self.metrics.last_error = str(err)
+                break
+            except PowervaultError as err:
+                self.metrics.last_error = str(err)
+            _LOGGER.debug(
+                "Failed to set the battery state of %s, attempt %s: %s",
+                unit_id,
+                attempt + 1,
+                self.metrics.last_error,
+            )
+
+        self.metrics.failures += 1
+        _LOGGER.error(
+            "Failed to set the battery state of %s to %s: %s",
+            unit_id,
+            battery_state,
+            self.metrics.last_error,
+        )
+        return False
+
+    async def _async_confirm(self, battery_state: str) -> None:
+        """Check the battery state until it shows the change."""
+        for delay in COMMAND_CONFIRM_DELAYS:
+            await asyncio.sleep(delay)
+            if self._pending is not None:
+                return
+            await self.coordinator.async_refresh()
+            if (
+                self.coordinator.last_update_success
+                and self.coordinator.data == battery_state
+            ):
+                self.metrics.confirmed += 1
+                # Poll quickly for a while, so the readings catch up with the change
+                self.hub.async_boost()
+                return
+
+        self.metrics.unconfirmed += 1
+        _LOGGER.warning(
+            "The battery state of %s hasn't changed to %s yet",
+            self.manager.unit_id,
+            battery_state,
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the queue for diagnostics."""
+        return {
+            "target": self.target,
+            "pending": self._pending,
+            "sending": self._task is not None,
+            **self.metrics.as_dict(),
+        }
@@ -6,15 +6,24 @@ import logging
 from typing import Any
 
 import voluptuous as vol
-from homeassistant.config_entries import ConfigFlow
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.selector import selector
-from powervaultpy import PowerVault
-from powervaultpy.powervault import RequestError, ServerError
 
-from .const import DOMAIN
+from .api import PowervaultApiClient, RequestError, ServerError
+from .const import (
+    CONF_METRICS,
+    CONF_STALE_AFTER,
+    CONF_TRACE,
+    DEFAULT_STALE_AFTER,
+    DOMAIN,
+    TRACE_MODES,
+    TRACE_OFF,
+)
+from .hub import async_get_budget
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -36,15 +45,20 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
 
     Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
     """
-    powervault = PowerVault(data["api_key"])
+    powervault = PowervaultApiClient(
+        async_get_clientsession(hass),
+        data["api_key"],
+        budget=async_get_budget(hass, data["api_key"]),
+    )
 
     account_id = None
     units = None
 
     try:
-        account_response = await hass.async_add_executor_job(powervault.get_account)
+        if (account_response := await powervault.get_account()) is None:
+            raise InvalidAuth
         account_id = account_response["id"]
-        units = await hass.async_add_executor_job(powervault.get_units, account_id)
+        units = await powervault.get_units(account_id) or []
 
     except RequestError as exc:
         raise InvalidAuth from exc
@@ -72,6 +86,12 @@ class PowervaultConfigFlow(ConfigFlow, domain=DOMAIN):  # type: ignore[call-arg]
     account_info: dict[str, Any]
     api_key: str
 
+    @staticmethod
+    @callback  # type: ignore[misc]
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return PowervaultOptionsFlow(config_entry)
+
     async def async_step_pick_unit(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -128,6 +148,38 @@ class PowervaultConfigFlow(ConfigFlow, domain=DOMAIN):  # type: ignore[call-arg]
         )
 
 
+class PowervaultOptionsFlow(OptionsFlow):
+    """Handle options for Powervault."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_STALE_AFTER,
+                    default=options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+                vol.Required(
+                    CONF_TRACE, default=options.get(CONF_TRACE, TRACE_OFF)
+                ): vol.In(TRACE_MODES),
+                vol.Required(
+                    CONF_METRICS, default=options.get(CONF_METRICS, False)
+                ): bool,
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=data_schema)
+
+
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
 
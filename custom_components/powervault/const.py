@@ -7,8 +7,154 @@ MANUFACTURER = "Powervault"
 
 POWERVAULT_BASE_INFO: Final = "base_info"
 POWERVAULT_COORDINATOR: Final = "coordinator"
+POWERVAULT_BATTERY_COORDINATOR: Final = "battery_coordinator"
 POWERVAULT_API: Final = "api_instance"
 POWERVAULT_API_CHANGED: Final = "api_changed"
 POWERVAULT_HTTP_SESSION: Final = "http_session"
+POWERVAULT_HUB: Final = "hub"
+POWERVAULT_HUBS: Final = "hubs"
+POWERVAULT_BUDGETS: Final = "budgets"
+POWERVAULT_MANAGER: Final = "manager"
+POWERVAULT_COMMANDS: Final = "commands"
+POWERVAULT_OPTIMIZER: Final = "optimizer"
+POWERVAULT_EXPORTER: Final = "exporter"
 
 UPDATE_INTERVAL = 30
+
+# The battery state and unit details change rarely, so are refreshed separately
+# from the readings (in seconds)
+BATTERY_STATE_INTERVAL: Final = 300
+BASE_INFO_INTERVAL: Final = 86400
+
+# Adaptive polling (in seconds). Polls are timed to land shortly after each new
+# bucket is due, backing off up to one bucket if it's late or the API fails
+MIN_POLL_INTERVAL: Final = 15
+MAX_POLL_INTERVAL: Final = 300
+POLL_SETTLE_DELAY: Final = 20
+
+# After the battery state is changed, poll quickly for a while
+BOOST_POLL_INTERVAL: Final = 10
+BOOST_DURATION: Final = 120
+
+# Battery state changes (in seconds). Selections are sent once they've settled
+# for the debounce delay, failed sends are retried with a doubling delay, and
+# the change is confirmed by checking the battery state after each delay
+COMMAND_DEBOUNCE: Final = 2
+COMMAND_RETRIES: Final = 3
+COMMAND_RETRY_DELAY: Final = 2
+COMMAND_CONFIRM_DELAYS: Final = (2, 5, 15)
+
+# Changes to the instant power sensors of this many W or less aren't written
+INSTANT_POWER_DEADBAND: Final = 10
+
+# Instant solar readings of this many mW or less are shown as 0
+INSTANT_SOLAR_THRESHOLD: Final = 10000
+
+# Options
+CONF_STALE_AFTER: Final = "stale_after"
+
+# Minutes that the last known value of a field is used for, if the API returns None
+DEFAULT_STALE_AFTER: Final = 30
+
+# Maximum number of units on the same account that are refreshed at once
+MAX_CONCURRENT_UNITS: Final = 4
+
+# Battery states that can be set as an override
+VALID_STATUSES: Final = [
+    "normal",
+    "only-charge",
+    "only-discharge",
+    "force-charge",
+    "force-discharge",
+    "disable",
+    "dormant",
+]
+
+# The Powervault API reports power in 5 minute buckets
+DATA_BUCKET_MINUTES: Final = 5
+
+# How many hours of rows to keep in memory for each unit
+ROW_BUFFER_HOURS: Final = 48
+
+# The numeric fields of a data row that are kept in memory
+ROW_FIELDS: Final = [
+    "instant_soc",
+    "instant_battery",
+    "instant_demand",
+    "instant_grid",
+    "instant_solar",
+    "batteryInputFromGrid",
+    "batteryInputFromSolar",
+    "batteryOutputConsumedByHome",
+    "batteryOutputExported",
+    "homeConsumed",
+    "gridConsumedByHome",
+    "solarConsumedByHome",
+    "solarExported",
+    "solarGenerated",
+    "solarConsumption",
+]
+
+# Attributes that are integrated from W readings into daily kWh totals
+ENERGY_TOTAL_ATTRIBUTES: Final = [
+    "batteryInputFromGrid",
+    "batteryInputFromSolar",
+    "batteryOutputConsumedByHome",
+    "batteryOutputExported",
+    "homeConsumed",
+    "gridConsumedByHome",
+    "solarConsumedByHome",
+    "solarExported",
+    "solarGenerated",
+]
+
+# Timeouts (in seconds) for a single API call, and for a whole refresh
+API_CALL_TIMEOUT: Final = 15
+REFRESH_DEADLINE: Final = 25
+
+# Failed GET requests are retried after a random delay of up to the retry delay,
+# doubling each time, or as long as the API asks if it's no longer than the max
+API_RETRIES: Final = 2
+API_RETRY_DELAY: Final = 0.5
+API_RETRY_MAX_DELAY: Final = 5
+
+# After this many failures in a row, requests to an account are paused for the
+# cooldown (in seconds), doubling up to the max while the API is still failing
+BREAKER_THRESHOLD: Final = 5
+BREAKER_COOLDOWN: Final = 30
+BREAKER_MAX_COOLDOWN: Final = 600
+
+# Requests on each API key are limited to a budget, refilled at this rate (per
+# second) up to the burst size. Lower priorities wait while less than their share
+# of the burst (by priority: commands, live data, daily totals and background
+# work) is left, so there's always room for the more important requests
+API_BUDGET_RATE: Final = 2.0
+API_BUDGET_BURST: Final = 120
+API_BUDGET_RESERVES: Final = (0.0, 0.0, 0.25, 0.5)
+
+# How many history periods are fetched at once when backfilling statistics
+BACKFILL_CONCURRENCY: Final = 2
+
+# What is recorded in the trace that's included in the diagnostics
+CONF_TRACE: Final = "trace"
+TRACE_OFF: Final = "off"
+TRACE_SUMMARY: Final = "summary"
+TRACE_FULL: Final = "full"
+TRACE_MODES: Final = [TRACE_OFF, TRACE_SUMMARY, TRACE_FULL]
+# How many events are kept in the trace
+TRACE_SIZE: Final = 100
+
+# Whether the unit is exported for Prometheus to scrape
+CONF_METRICS: Final = "metrics"
+
+# Charge schedule optimizer. A day ahead is planned in 5 minute slots, with force
+# charge and discharge windows of these lengths (in hours), and is planned again
+# every interval (in seconds). The battery size (kWh) and power (kW) are used if
+# they aren't given, and the battery isn't discharged below the reserve.
+OPTIMIZER_HORIZON_HOURS: Final = 24
+OPTIMIZER_WINDOW_HOURS: Final = (1, 2, 3, 4, 5, 6)
+OPTIMIZER_INTERVAL: Final = 1800
+OPTIMIZER_CAPACITY: Final = 8.0
+OPTIMIZER_MAX_POWER: Final = 3.3
+OPTIMIZER_EFFICIENCY: Final = 0.9
+OPTIMIZER_RESERVE: Final = 0.1
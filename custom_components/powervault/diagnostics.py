@@ -0,0 +1,48 @@
+"""Diagnostics support for Powervault."""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DOMAIN,
+    POWERVAULT_BATTERY_COORDINATOR,
+    POWERVAULT_COMMANDS,
+    POWERVAULT_HUB,
+    POWERVAULT_MANAGER,
+    POWERVAULT_OPTIMIZER,
+)
+from .models import PowervaultRuntimeData
+
+TO_REDACT = {"api_key"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    runtime_data: PowervaultRuntimeData = hass.data[DOMAIN][entry.entry_id]
+    battery_coordinator = runtime_data[POWERVAULT_BATTERY_COORDINATOR]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "scheduler": runtime_data[POWERVAULT_HUB].scheduler.as_dict(),
+        "refresh": runtime_data[POWERVAULT_MANAGER].metrics.as_dict(),
+        # The client is shared by all the units on the account
+        "api": runtime_data[POWERVAULT_HUB].client.metrics.as_dict(),
+        "breaker": runtime_data[POWERVAULT_HUB].client.breaker.as_dict(
+            time.monotonic()
+        ),
+        "budget": runtime_data[POWERVAULT_HUB].client.budget.as_dict(time.monotonic()),
+        "battery_state": {
+            "state": battery_coordinator.data,
+            "last_update_success": battery_coordinator.last_update_success,
+        },
+        "commands": runtime_data[POWERVAULT_COMMANDS].as_dict(),
+        "optimizer": runtime_data[POWERVAULT_OPTIMIZER].as_dict(),
+        "trace": runtime_data[POWERVAULT_MANAGER].trace.as_dict(),
+    }
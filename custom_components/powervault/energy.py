@@ -0,0 +1,251 @@
+"""Batch energy integration for the Powervault integration.
+
+The running totals only ever deal with today's rows. For longer ranges, such
+as weeks of history, the rows are converted to columns once and then summed
+per hour or day in a single pass. NumPy is used if it's installed, which it
+is with most Home Assistant installs, otherwise the same is done in Python.
+"""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import ENERGY_TOTAL_ATTRIBUTES
+from .totals import BUCKET_HOURS, BUCKET_SECONDS, row_time
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover
+    HAS_NUMPY = False
+
+GROUP_HOUR = "hour"
+GROUP_DAY = "day"
+
+
+@dataclass
+class EnergyColumns:
+    """Rows of W readings as columns, one entry per 5 minute bucket.
+
+    Buckets are sorted and unique. Values that were None are NaN.
+    """
+
+    buckets: Any
+    values: dict[str, Any]
+
+    def __len__(self) -> int:
+        """Return the number of buckets."""
+        return len(self.buckets)
+
+
+@dataclass
+class EnergyPeriod:
+    """The kWh totals for a period, and how many of its buckets had data."""
+
+    start: datetime
+    end: datetime
+    totals: dict[str, float] = field(default_factory=dict)
+    buckets: int = 0
+    missing: int = 0
+
+
+class EnergyColumnBuilder:
+    """Builds columns a row at a time, e.g. as they're streamed from the API.
+
+    Only the readings that are integrated are kept for each row, rather than
+    the whole row. Rows without a time or a battery reading are incomplete,
+    so they're dropped. If there is more than one row for a bucket, the last
+    one wins.
+    """
+
+    def __init__(self, attributes: Iterable[str] | None = None) -> None:
+        """Init the builder, for the energy totals unless attributes are given."""
+        self._attributes = tuple(
+            ENERGY_TOTAL_ATTRIBUTES if attributes is None else attributes
+        )
+        self._present: set[str] = set()
+        self._readings: dict[int, tuple[float, ...]] = {}
+
+    def add(self, row: dict[str, Any]) -> None:
+        """Add a row."""
+        if row.get("instant_battery") is None:
+            return
+        if (when := row_time(row)) is None:
+            return
+        self._present.update(
+            attribute for attribute in row if attribute in self._attributes
+        )
+        self._readings[int(when.timestamp()) // BUCKET_SECONDS] = tuple(
+            _to_float(row.get(attribute)) for attribute in self._attributes
+        )
+
+    def build(self) -> EnergyColumns:
+        """Return the rows added so far as columns."""
+        buckets = sorted(self._readings)
+        values = {
+            attribute: [self._readings[bucket][index] for bucket in buckets]
+            for index, attribute in enumerate(self._attributes)
+            if attribute in self._present
+        }
+        if not HAS_NUMPY:
+            return EnergyColumns(buckets, values)
+        return EnergyColumns(
+            np.array(buckets, dtype=np.int64),
+            {key: np.array(column, dtype=np.float64) for key, column in values.items()},
+        )
+
+
+def to_columns(
+    rows: Iterable[dict[str, Any]], attributes: Iterable[str] | None = None
+) -> EnergyColumns:
+    """Convert rows to columns."""
+    builder = EnergyColumnBuilder(attributes)
+    for row in rows:
+        builder.add(row)
+    return builder.build()
+
+
+def integrate(
+    columns: EnergyColumns,
+    group: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    ndigits: int | None = None,
+) -> list[EnergyPeriod]:
+    """Integrate W readings to kWh, per local hour or day, or over the whole range.
+
+    The range defaults to the first bucket up to and including the last one.
+    Buckets in the range without a row are counted as missing rather than
+    guessed at, and None readings count as zero. Only the final totals are
+    rounded, to ndigits if it's given.
+    """
+    if not columns and (start is None or end is None):
+        return []
+
+    low = _ceil_bucket(start) if start is not None else int(columns.buckets[0])
+    high = _ceil_bucket(end) if end is not None else int(columns.buckets[-1]) + 1
+    if high <= low:  # pylint: disable=consider-using-assignment-expr
+        return []
+
+    edges = _group_edges(low, high, group)
+    if HAS_NUMPY:
+        counts, sums = _sum_numpy(columns, edges, low, high)
+    else:
+        counts, sums = _sum_python(columns, edges, low, high)
+
+    periods = []
+    for index, (edge, next_edge) in enumerate(zip(edges, edges[1:])):
+        expected = min(next_edge, high) - max(edge, low)
+        totals = {}
+        for attribute, column in sums.items():
+            total = float(column[index]) / 1000 * BUCKET_HOURS
+            totals[attribute] = round(total, ndigits) if ndigits is not None else total
+        periods.append(
+            EnergyPeriod(
+                start=_bucket_datetime(edge),
+                end=_bucket_datetime(next_edge),
+                totals=totals,
+                buckets=int(counts[index]),
+                missing=expected - int(counts[index]),
+            )
+        )
+    return periods
+
+
+def _to_float(value: Any) -> float:
+    """Return a reading as a float, with None as NaN."""
+    return math.nan if value is None else float(value)
+
+
+def _ceil_bucket(when: datetime) -> int:
+    """Return the first bucket that starts at or after a time."""
+    return -(-int(when.timestamp()) // BUCKET_SECONDS)
+
+
+def _bucket_datetime(bucket: int) -> datetime:
+    """Return the local start time of a bucket."""
+    return dt_util.as_local(  # type: ignore[no-any-return]
+        dt_util.utc_from_timestamp(bucket * BUCKET_SECONDS)
+    )
+
+
+def _group_edges(low: int, high: int, group: str | None) -> list[int]:
+    """Return the buckets that start each group, plus one past the last group.
+
+    Groups follow local time, so days are 23 or 25 hours long when the clocks
+    change.
+    """
+    if group is None:
+        return [low, high]
+
+    first = _bucket_datetime(low)
+    if group == GROUP_DAY:
+        current = dt_util.start_of_local_day(first)
+    elif group == GROUP_HOUR:
+        current = first.replace(minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f"Invalid group: {group}")
+
+    edges = []
+    while True:
+        edge = int(current.timestamp()) // BUCKET_SECONDS
+        edges.append(edge)
+        if edge >= high:
+            return edges
+        if group == GROUP_DAY:
+            current = dt_util.start_of_local_day(current.date() + timedelta(days=1))
+        else:
+            current = dt_util.as_local(dt_util.as_utc(current) + timedelta(hours=1))
+
+
+def _sum_numpy(
+    columns: EnergyColumns, edges: list[int], low: int, high: int
+) -> tuple[Any, dict[str, Any]]:
+    """Sum each column per group using NumPy."""
+    groups = len(edges) - 1
+    buckets = columns.buckets
+    in_range = (buckets >= low) & (buckets < high)
+    index = np.searchsorted(np.array(edges), buckets[in_range], side="right") - 1
+    counts = np.bincount(index, minlength=groups)
+    sums = {
+        attribute: np.bincount(
+            index, weights=np.nan_to_num(column[in_range]), minlength=groups
+        )
+        for attribute, column in columns.values.items()
+    }
+    return counts, sums
+
+
+def _sum_python(
+    columns: EnergyColumns, edges: list[int], low: int, high: int
+) -> tuple[list[int], dict[str, list[float]]]:
+    """Sum each column per group in Python, for when NumPy isn't installed."""
+    groups = len(edges) - 1
+    counts = [0] * groups
+    members: list[list[int]] = [[] for _ in range(groups)]
+    for position, bucket in enumerate(columns.buckets):
+        if low <= bucket < high:
+            index = bisect_right(edges, bucket) - 1
+            counts[index] += 1
+            members[index].append(position)
+
+    sums = {
+        attribute: [
+            math.fsum(
+                column[position]
+                for position in positions
+                if not math.isnan(column[position])
+            )
+            for positions in members
+        ]
+        for attribute, column in columns.values.items()
+    }
+    return counts, sums
@@ -1,5 +1,8 @@
 """Base class for powervault entities."""
 
+from typing import Any
+
+from homeassistant.core import callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
@@ -16,17 +19,29 @@ from .const import (
 from .models import PowervaultData, PowervaultRuntimeData
 
 
-class PowervaultEntity(CoordinatorEntity[DataUpdateCoordinator[PowervaultData]]):
-    """Base class for powervault entities."""
+class PowervaultEntity(CoordinatorEntity[DataUpdateCoordinator[Any]]):
+    """Base class for powervault entities.
+
+    Entities use the coordinator of the readings, unless they're given the one
+    for the data they show.
+    """
 
     base_unique_id: str
 
-    def __init__(self, powervault_data: PowervaultRuntimeData) -> None:
+    # The field of the data this entity shows, if it can be missing from the API
+    _data_key: str | None = None
+    # Changes to a numeric state no bigger than this aren't written
+    _deadband: float | None = None
+    _last_written: tuple[Any, ...] | None = None
+
+    def __init__(
+        self,
+        powervault_data: PowervaultRuntimeData,
+        coordinator: DataUpdateCoordinator[Any] | None = None,
+    ) -> None:
         """Initialize the entity."""
         base_info = powervault_data[POWERVAULT_BASE_INFO]
-        coordinator = powervault_data[POWERVAULT_COORDINATOR]
-        assert coordinator is not None
-        super().__init__(coordinator)
+        super().__init__(coordinator or powervault_data[POWERVAULT_COORDINATOR])
         self.powervault = powervault_data[POWERVAULT_API]
         # The serial numbers of the powervaults are unique to every site
         self.base_unique_id = "_".join(base_info.id)
@@ -38,6 +53,52 @@ class PowervaultEntity(CoordinatorEntity[DataUpdateCoordinator[PowervaultData]])
             sw_version=base_info.eprom_id,
         )
 
+    async def async_added_to_hass(self) -> None:
+        """Remember the state that is written when the entity is added."""
+        await super().async_added_to_hass()
+        self._last_written = self._current_state()
+
+    @callback  # type: ignore[misc]
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, if the state has changed."""
+        written = self._current_state()
+        if self._last_written is not None and self._is_unchanged(written):
+            return
+        self._last_written = written
+        super()._handle_coordinator_update()
+
+    def _current_state(self) -> tuple[Any, ...]:
+        """Return the parts of the entity that end up in the state machine."""
+        available = self.available
+        state = self.state if available else None
+        return (available, state, self.extra_state_attributes)
+
+    def _is_unchanged(self, written: tuple[Any, ...]) -> bool:
+        """Return True if the state is the same as the last one written."""
+        assert self._last_written is not None
+        if written == self._last_written:
+            return True
+
+        available, state, attributes = written
+        last_available, last_state, last_attributes = self._last_written
+        if self._deadband is None or (available, attributes) != (
+            last_available,
+            last_attributes,
+        ):
+            return False
+        try:
+            return abs(float(state) - float(last_state)) <= self._deadband
+        except (TypeError, ValueError):
+            return False
+
+    @property
+    def available(self) -> bool:
+        """Return if the entity is available."""
+        # There's no data until the first refresh, if it's done in the background
+        if not super().available or self.coordinator.data is None:
+            return False
+        return self._data_key is None or self._data_key not in self.data.missing
+
     @property
     def data(self) -> PowervaultData:
         """Return the coordinator data."""
@@ -0,0 +1,303 @@
+"""OpenMetrics exporter for the Powervault integration.
+
+The units with the metrics option turned on are served at METRICS_URL, for
+Prometheus to scrape. The samples of a unit are rendered once, after each
+refresh, and the body of a scrape is only put together again after one of
+the units has been refreshed, so frequent scrapes of many units are cheap.
+The API metrics are per account, which is labelled with a hash of its key.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from aiohttp import hdrs, web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfPower
+from homeassistant.core import HomeAssistant, callback
+
+from .budget import PRIORITY_NAMES
+from .const import DOMAIN, POWERVAULT_EXPORTER
+from .metrics import LATENCY_BUCKETS, LatencyHistogram
+from .models import PowervaultData
+from .resilience import BREAKER_CLOSED
+from .schema import SENSORS
+
+if TYPE_CHECKING:
+    from . import PowervaultDataManager
+    from .hub import PowervaultAccountHub
+
+_LOGGER = logging.getLogger(__name__)
+
+METRICS_URL = "/api/powervault/metrics"
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Every metric family, in the order they're served: name, type and help
+FAMILIES = [
+    ("powervault_unit", "info", "Details of the unit"),
+    ("powervault_power_watts", "gauge", "Latest power readings and statistics"),
+    ("powervault_energy_today_kwh", "gauge", "Energy totals since midnight"),
+    ("powervault_percent", "gauge", "Battery charge and other percentages"),
+    ("powervault_extra", "gauge", "Numeric fields that aren't in the schema"),
+    ("powervault_data_timestamp_seconds", "gauge", "Time of the latest data row"),
+    ("powervault_missing_fields", "gauge", "Fields with no recent enough value"),
+    ("powervault_refreshes", "counter", "Refreshes of the unit"),
+    ("powervault_refresh_failures", "counter", "Refreshes that failed"),
+    ("powervault_refreshes_unchanged", "counter", "Refreshes with unchanged data"),
+    ("powervault_full_fetches", "counter", "Refreshes that fetched the whole day"),
+    ("powervault_missed_buckets", "counter", "5 minute buckets that were missed"),
+    ("powervault_rows", "counter", "Data rows received"),
+    ("powervault_refresh_duration_seconds", "histogram", "Time taken to refresh"),
+    ("powervault_api_requests", "counter", "Requests to each API endpoint"),
+    ("powervault_api_errors", "counter", "Requests to each API endpoint that failed"),
+    ("powervault_api_unchanged", "counter", "Responses that hadn't changed"),
+    ("powervault_api_response_bytes", "counter", "Size of the responses"),
+    ("powervault_api_retries", "counter", "Requests that were retried"),
+    ("powervault_api_rejected", "counter", "Requests rejected by the breaker"),
+    ("powervault_api_shared", "counter", "Requests that shared one in flight"),
+    ("powervault_api_delayed", "counter", "Requests that waited for the budget"),
+    ("powervault_api_budget_tokens", "gauge", "Requests left in the budget"),
+    ("powervault_api_request_duration_seconds", "histogram", "Time taken by requests"),
+    ("powervault_api_breaker_open", "gauge", "1 while requests are paused"),
+]
+
+# The family of the sensors with each unit
+_SENSOR_FAMILIES = {
+    UnitOfPower.WATT: "powervault_power_watts",
+    UnitOfEnergy.KILO_WATT_HOUR: "powervault_energy_today_kwh",
+    PERCENTAGE: "powervault_percent",
+}
+
+Samples = dict[str, list[str]]
+
+
+@callback  # type: ignore[misc]
+def async_get_exporter(hass: HomeAssistant) -> PowervaultMetricsExporter | None:
+    """Return the exporter, registering its view the first time.
+
+    Returns None if the HTTP server isn't running.
+    """
+    if (existing := hass.data[DOMAIN].get(POWERVAULT_EXPORTER)) is not None:
+        return existing  # type: ignore[no-any-return]
+    if getattr(hass, "http", None) is None:
+        _LOGGER.warning("Can't expose Powervault metrics without the HTTP server")
+        return None
+    exporter = hass.data[DOMAIN][POWERVAULT_EXPORTER] = PowervaultMetricsExporter()
+    hass.http.register_view(PowervaultMetricsView(exporter))
+    return exporter
+
+
+class PowervaultMetricsExporter:
+    """The rendered samples of every exported unit and account."""
+
+    def __init__(self) -> None:
+        """Init the exporter."""
+        self._units: dict[str, Samples] = {}
+        self._accounts: dict[str, Samples] = {}
+        # The account of each unit
+        self._unit_accounts: dict[str, str] = {}
+        self._body: bytes | None = None
+
+    @callback  # type: ignore[misc]
+    def async_update_unit(
+        self,
+        manager: PowervaultDataManager,
+        hub: PowervaultAccountHub,
+        data: PowervaultData | None,
+    ) -> None:
+        """Render the samples of a unit and its account, after a refresh."""
+        account = hashlib.sha256(hub.api_key.encode()).hexdigest()[:8]
+        self._units[manager.unit_id] = _render_unit(manager, data)
+        self._accounts[account] = _render_account(account, hub)
+        self._unit_accounts[manager.unit_id] = account
+        self._body = None
+
+    @callback  # type: ignore[misc]
+    def async_remove_unit(self, unit_id: str) -> None:
+        """Stop exporting a unit, and its account if it was the last on it."""
+        self._units.pop(unit_id, None)
+        account = self._unit_accounts.pop(unit_id, None)
+        if account is not None and account not in self._unit_accounts.values():
+            self._accounts.pop(account)
+        self._body = None
+
+    def render(self) -> bytes:
+        """Return the body of a scrape."""
+        if self._body is None:
+            blocks = [*self._units.values(), *self._accounts.values()]
+            lines = []
+            for name, kind, description in FAMILIES:
+                if samples := [
+                    line for block in blocks for line in block.get(name, ())
+                ]:
+                    lines += [f"# TYPE {name} {kind}", f"# HELP {name} {description}"]
+                    lines += samples
+            lines.append("# EOF\n")
+            self._body = "\n".join(lines).encode()
+        return self._body
+
+
+class PowervaultMetricsView(HomeAssistantView):  # type: ignore[misc]
+    """Serves the metrics of the exported units."""
+
+    url = METRICS_URL
+    name = "api:powervault:metrics"
+    requires_auth = True
+
+    def __init__(self, exporter: PowervaultMetricsExporter) -> None:
+        """Init the view."""
+        self.exporter = exporter
+
+    async def get(self, _request: web.Request) -> web.Response:
+        """Return the metrics."""
+        return web.Response(
+            body=self.exporter.render(), headers={hdrs.CONTENT_TYPE: CONTENT_TYPE}
+        )
+
+
+def _render_unit(
+    manager: PowervaultDataManager, data: PowervaultData | None
+) -> Samples:
+    """Return the samples of a unit, by family."""
+    unit = {"unit": manager.unit_id}
+    samples: Samples = {name: [] for name, _, _ in FAMILIES}
+    if manager.base_info is not None:
+        samples["powervault_unit"].append(
+            _sample(
+                "powervault_unit_info",
+                {
+                    **unit,
+                    "model": manager.base_info.model,
+                    "firmware": manager.base_info.eprom_id,
+                },
+                1,
+            )
+        )
+
+    if data is not None:
+        for description in SENSORS:
+            if (
+                family := _SENSOR_FAMILIES.get(description.native_unit_of_measurement)
+            ) is not None:
+                samples[family].append(
+                    _sample(
+                        family,
+                        {**unit, "sensor": description.key},
+                        description.value_fn(data),
+                    )
+                )
+        for field, value in sorted(data.extra.items()):
+            samples["powervault_extra"].append(
+                _sample("powervault_extra", {**unit, "field": field}, value)
+            )
+        if data.time is not None:
+            samples["powervault_data_timestamp_seconds"].append(
+                _sample(
+                    "powervault_data_timestamp_seconds", unit, data.time.timestamp()
+                )
+            )
+        samples["powervault_missing_fields"].append(
+            _sample("powervault_missing_fields", unit, len(data.missing))
+        )
+
+    metrics = manager.metrics
+    for name, value in (
+        ("powervault_refreshes", metrics.refreshes),
+        ("powervault_refresh_failures", metrics.failures),
+        ("powervault_refreshes_unchanged", metrics.unchanged),
+        ("powervault_full_fetches", metrics.full_fetches),
+        ("powervault_missed_buckets", metrics.missed_buckets),
+        ("powervault_rows", metrics.rows),
+    ):
+        samples[name].append(_sample(f"{name}_total", unit, value))
+    samples["powervault_refresh_duration_seconds"] = list(
+        _histogram("powervault_refresh_duration_seconds", unit, metrics.duration)
+    )
+    return samples
+
+
+def _render_account(account: str, hub: PowervaultAccountHub) -> Samples:
+    """Return the samples of the API client of an account, by family."""
+    labels = {"account": account}
+    client = hub.client
+    samples: Samples = {name: [] for name, _, _ in FAMILIES}
+    for endpoint, metrics in sorted(client.metrics.endpoints.items()):
+        endpoint_labels = {**labels, "endpoint": endpoint}
+        for name, value in (
+            ("powervault_api_requests", metrics.requests),
+            ("powervault_api_errors", metrics.errors),
+            ("powervault_api_unchanged", metrics.unchanged),
+            ("powervault_api_response_bytes", metrics.bytes),
+        ):
+            samples[name].append(_sample(f"{name}_total", endpoint_labels, value))
+    samples["powervault_api_retries"].append(
+        _sample("powervault_api_retries_total", labels, client.metrics.retries)
+    )
+    samples["powervault_api_rejected"].append(
+        _sample("powervault_api_rejected_total", labels, client.metrics.rejected)
+    )
+    samples["powervault_api_shared"].append(
+        _sample("powervault_api_shared_total", labels, client.metrics.shared)
+    )
+    for priority, name in enumerate(PRIORITY_NAMES):
+        samples["powervault_api_delayed"].append(
+            _sample(
+                "powervault_api_delayed_total",
+                {**labels, "priority": name},
+                client.budget.delayed[priority],
+            )
+        )
+    samples["powervault_api_budget_tokens"].append(
+        _sample(
+            "powervault_api_budget_tokens",
+            labels,
+            round(client.budget.remaining(time.monotonic()), 1),
+        )
+    )
+    samples["powervault_api_request_duration_seconds"] = list(
+        _histogram(
+            "powervault_api_request_duration_seconds", labels, client.metrics.latency
+        )
+    )
+    samples["powervault_api_breaker_open"].append(
+        _sample(
+            "powervault_api_breaker_open",
+            labels,
+            int(client.breaker.state != BREAKER_CLOSED),
+        )
+    )
+    return samples
+
+
+def _histogram(
+    name: str, labels: dict[str, str], histogram: LatencyHistogram
+) -> Iterable[str]:
+    """Return the samples of a histogram, with cumulative buckets."""
+    count = 0
+    for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.counts):
+        count += bucket_count
+        yield _sample(f"{name}_bucket", {**labels, "le": repr(float(bound))}, count)
+    yield _sample(f"{name}_bucket", {**labels, "le": "+Inf"}, histogram.count)
+    yield _sample(f"{name}_count", labels, histogram.count)
+    yield _sample(f"{name}_sum", labels, histogram.total)
+
+
+def _sample(name: str, labels: dict[str, str], value: float | None) -> str:
+    """Return a sample line, with NaN for a missing value."""
+    label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    if value is None:
+        text = "NaN"
+    elif isinstance(value, int):
+        text = str(value)
+    else:
+        text = repr(float(value))
+    return f"{name}{{{label_text}}} {text}"
+
+
+def _escape(label: str) -> str:
+    """Escape a label value."""
+    return label.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
@@ -0,0 +1,160 @@
+"""Account level polling for the Powervault integration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+
+from .api import PowervaultApiClient
+from .budget import RequestBudget
+from .const import DOMAIN, MAX_CONCURRENT_UNITS, POWERVAULT_BUDGETS, POWERVAULT_HUBS
+from .models import PowervaultData
+from .scheduler import PowervaultPollScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback  # type: ignore[misc]
+def async_get_hub(hass: HomeAssistant, api_key: str) -> PowervaultAccountHub:
+    """Return the hub for an API key, creating it if needed."""
+    hubs: dict[str, PowervaultAccountHub] = hass.data[DOMAIN].setdefault(
+        POWERVAULT_HUBS, {}
+    )
+    if (hub := hubs.get(api_key)) is None:
+        hub = hubs[api_key] = PowervaultAccountHub(hass, api_key)
+    return hub
+
+
+@callback  # type: ignore[misc]
+def async_get_budget(hass: HomeAssistant, api_key: str) -> RequestBudget:
+    """Return the request budget for an API key, creating it if needed.
+
+    The budget outlives the hub, so it isn't reset when the units are reloaded,
+    and it's shared with the config flow.
+    """
+    budgets: dict[str, RequestBudget] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        POWERVAULT_BUDGETS, {}
+    )
+    if (budget := budgets.get(api_key)) is None:
+        budget = budgets[api_key] = RequestBudget()
+    return budget
+
+
+class PowervaultAccountHub:  # pylint: disable=too-many-instance-attributes
+    """Shares a client between all units on an account, and polls them together.
+
+    Each unit still has its own coordinator, so a failure for one unit doesn't
+    make the entities of the others unavailable. The coordinators don't have
+    an update interval of their own; instead the hub refreshes all of them on
+    a single tick, with a limit on how many run at once. The time of the next
+    tick is chosen by the poll scheduler.
+    """
+
+    def __init__(self, hass: HomeAssistant, api_key: str) -> None:
+        """Init the hub."""
+        self.hass = hass
+        self.api_key = api_key
+        self.client = PowervaultApiClient(
+            async_get_clientsession(hass),
+            api_key,
+            budget=async_get_budget(hass, api_key),
+        )
+        self._coordinators: dict[str, DataUpdateCoordinator[PowervaultData]] = {}
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_UNITS)
+        self.scheduler = PowervaultPollScheduler()
+        self._unsub_tick: CALLBACK_TYPE | None = None
+        self._tick_running = False
+
+    @callback  # type: ignore[misc]
+    def async_add_unit(
+        self, unit_id: str, coordinator: DataUpdateCoordinator[PowervaultData]
+    ) -> None:
+        """Start polling a unit on the next tick."""
+        self._coordinators[unit_id] = coordinator
+        if self._unsub_tick is None:
+            self._async_schedule_tick()
+
+    @callback  # type: ignore[misc]
+    def async_remove_unit(self, unit_id: str) -> None:
+        """Stop polling a unit, and remove the hub once it has no units left."""
+        self._coordinators.pop(unit_id, None)
+        if self._coordinators:
+            return
+        self._async_cancel_tick()
+        self.hass.data[DOMAIN][POWERVAULT_HUBS].pop(self.api_key, None)
+
+    @callback  # type: ignore[misc]
+    def async_boost(self) -> None:
+        """Poll quickly for a while, e.g. after the battery state has been changed."""
+        self.scheduler.boost(dt_util.utcnow())
+        if not self._tick_running:
+            self._async_schedule_tick()
+
+    @callback  # type: ignore[misc]
+    def _async_schedule_tick(self) -> None:
+        """Schedule the next tick, replacing any that is already scheduled."""
+        self._async_cancel_tick()
+        interval = self.scheduler.next_interval(dt_util.utcnow())
+        # Don't poll while requests to the account are paused
+        paused = self.client.breaker.retry_in(time.monotonic())
+        interval = max(interval, timedelta(seconds=paused))
+        _LOGGER.debug("Next refresh in %s", interval)
+        self._unsub_tick = async_call_later(self.hass, interval, self._async_tick)
+
+    @callback  # type: ignore[misc]
+    def _async_cancel_tick(self) -> None:
+        """Cancel the next tick."""
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+
+    async def _async_tick(self, _now: datetime) -> None:
+        """Refresh every unit on the account, then schedule the next tick."""
+        self._unsub_tick = None
+        if self._tick_running:
+            _LOGGER.debug("Previous refresh is still running, skipping this one")
+            return
+        self._tick_running = True
+        try:
+            coordinators = list(self._coordinators.values())
+            previous = [coordinator.data for coordinator in coordinators]
+            await asyncio.gather(
+                *(self._async_refresh_unit(coordinator) for coordinator in coordinators)
+            )
+        finally:
+            self._tick_running = False
+
+        succeeded = [c for c in coordinators if c.last_update_success]
+        self.scheduler.record_poll(
+            success=bool(succeeded),
+            changed=any(
+                coordinator.data != data
+                for coordinator, data in zip(coordinators, previous)
+                if coordinator.last_update_success
+            ),
+            row_time=max(
+                (
+                    c.data.time
+                    for c in succeeded
+                    if c.data is not None and c.data.time is not None
+                ),
+                default=None,
+            ),
+        )
+        if self._coordinators:
+            self._async_schedule_tick()
+
+    async def _async_refresh_unit(
+        self, coordinator: DataUpdateCoordinator[PowervaultData]
+    ) -> None:
+        """Refresh a single unit, limiting how many refresh at once."""
+        async with self._semaphore:
+            await coordinator.async_refresh()
@@ -0,0 +1,208 @@
+"""Request and refresh metrics for the Powervault integration."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+
+class LatencyHistogram:
+    """Counts of durations in fixed buckets, so memory use doesn't grow.
+
+    Percentiles are estimated by interpolating within the bucket they fall in,
+    which is accurate enough to see which calls are slow.
+    """
+
+    __slots__ = ("counts", "count", "total", "minimum", "maximum")
+
+    def __init__(self) -> None:
+        """Init the histogram."""
+        # The last bucket is for anything slower than the largest bound
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record a duration."""
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.minimum = min(self.minimum, seconds) if self.count else seconds
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, percent: float) -> float | None:
+        """Return an estimate of a percentile, in seconds."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                # Narrow the bucket to the values actually seen
+                lower = max(LATENCY_BUCKETS[index - 1] if index else 0.0, self.minimum)
+                upper = self.maximum
+                if index < len(LATENCY_BUCKETS):
+                    upper = min(LATENCY_BUCKETS[index], upper)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.maximum
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram for diagnostics, in ms."""
+        return {
+            "count": self.count,
+            "mean_ms": _ms(self.total / self.count) if self.count else None,
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "p99_ms": _ms(self.percentile(99)),
+            "max_ms": _ms(self.maximum),
+        }
+
+
+@dataclass
+class EndpointMetrics:
+    """Metrics for a single API endpoint."""
+
+    requests: int = 0
+    errors: int = 0
+    # Responses that were unchanged since last time, so weren't decoded again
+    unchanged: int = 0
+    bytes: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "unchanged": self.unchanged,
+            "bytes": self.bytes,
+            "latency": self.latency.as_dict(),
+        }
+
+
+class ApiMetrics:
+    """Metrics for each endpoint the API client calls."""
+
+    def __init__(self) -> None:
+        """Init the metrics."""
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self.latency = LatencyHistogram()
+        self.retries = 0
+        # Requests that failed straight away, as the circuit breaker was open
+        self.rejected = 0
+        # GET requests that waited for the same one already in flight
+        self.shared = 0
+
+    def record(
+        self,
+        endpoint: str,
+        seconds: float,
+        size: int = 0,
+        error: bool = False,
+        unchanged: bool = False,
+    ) -> None:
+        """Record a request to an endpoint."""
+        metrics = self.endpoints.setdefault(endpoint, EndpointMetrics())
+        metrics.requests += 1
+        metrics.errors += error
+        metrics.unchanged += unchanged
+        metrics.bytes += size
+        metrics.latency.observe(seconds)
+        self.latency.observe(seconds)
+
+    @property
+    def requests(self) -> int:
+        """Return the number of requests to all endpoints."""
+        return sum(metrics.requests for metrics in self.endpoints.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "shared": self.shared,
+            "latency": self.latency.as_dict(),
+            "endpoints": {
+                endpoint: metrics.as_dict()
+                for endpoint, metrics in sorted(self.endpoints.items())
+            },
+        }
+
+
+@dataclass
+class RefreshMetrics:  # pylint: disable=too-many-instance-attributes
+    """Metrics for the refreshes of a unit."""
+
+    refreshes: int = 0
+    failures: int = 0
+    # Refreshes where the latest data hadn't changed, so wasn't processed again
+    unchanged: int = 0
+    # Refreshes that fetched the whole day, and how many of those were because
+    # a bucket was missed rather than on startup or at midnight
+    full_fetches: int = 0
+    missed_buckets: int = 0
+    # Refreshes where some values were missing, and were filled in or not
+    gaps_filled: int = 0
+    gaps_unfilled: int = 0
+    rows: int = 0
+    last_duration: float | None = None
+    duration: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "unchanged": self.unchanged,
+            "full_fetches": self.full_fetches,
+            "missed_buckets": self.missed_buckets,
+            "missed_bucket_rate": (
+                self.missed_buckets / self.refreshes if self.refreshes else None
+            ),
+            "gaps_filled": self.gaps_filled,
+            "gaps_unfilled": self.gaps_unfilled,
+            "rows": self.rows,
+            "last_duration_ms": _ms(self.last_duration),
+            "duration": self.duration.as_dict(),
+        }
+
+
+@dataclass
+class CommandMetrics:  # pylint: disable=too-many-instance-attributes
+    """Metrics for the battery state changes of a unit."""
+
+    requested: int = 0
+    # Requests replaced by a later one before they were sent
+    coalesced: int = 0
+    sent: int = 0
+    retries: int = 0
+    failures: int = 0
+    confirmed: int = 0
+    unconfirmed: int = 0
+    last_error: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "requested": self.requested,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "retries": self.retries,
+            "failures": self.failures,
+            "confirmed": self.confirmed,
+            "unconfirmed": self.unconfirmed,
+            "last_error": self.last_error,
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    """Convert seconds to ms, for display."""
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -2,12 +2,20 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import TypedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, TypedDict
 
+from aiohttp import ClientSession
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from powervaultpy import PowerVault
-from requests import Session
+
+from .api import PowervaultApiClient
+
+if TYPE_CHECKING:
+    from . import PowervaultDataManager
+    from .commands import PowervaultCommandQueue
+    from .hub import PowervaultAccountHub
+    from .optimizer import PowervaultOptimizer
 
 
 @dataclass
@@ -19,9 +27,12 @@ class PowervaultBaseInfo:
     eprom_id: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PowervaultData:  # pylint: disable=too-many-instance-attributes
-    """Point in time data for the powervault integration."""
+    """Point in time data for the powervault integration.
+
+    It's frozen, so a new one is made with dataclasses.replace for any change.
+    """
 
     charge: float
     batteryInputFromGrid: float
@@ -38,15 +49,26 @@ class PowervaultData:  # pylint: disable=too-many-instance-attributes
     solarGenerated: float
     solarConsumption: float
     instant_solar: float
-    battery_state: str
     totals: dict
+    time: datetime | None = None
+    # Fields that were None, with no recent enough value to use instead
+    missing: frozenset[str] = frozenset()
+    # Rolling window statistics, by key
+    rolling: dict[str, float | None] = field(default_factory=dict)
+    # Numeric fields of the row that aren't in the schema, by name
+    extra: dict[str, float] = field(default_factory=dict)
 
 
 class PowervaultRuntimeData(TypedDict):
     """Run time data for the powerwall."""
 
-    coordinator: DataUpdateCoordinator[PowervaultData] | None
-    api_instance: PowerVault
+    coordinator: DataUpdateCoordinator[PowervaultData]
+    battery_coordinator: DataUpdateCoordinator[str]
+    api_instance: PowervaultApiClient
     base_info: PowervaultBaseInfo
     api_changed: bool
-    http_session: Session
+    http_session: ClientSession
+    hub: PowervaultAccountHub
+    manager: PowervaultDataManager
+    commands: PowervaultCommandQueue
+    optimizer: PowervaultOptimizer
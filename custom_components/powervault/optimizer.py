@@ -0,0 +1,540 @@
+"""Charge schedule optimizer for the Powervault integration.
+
+A day ahead is planned in 5 minute slots. The energy the home needs in each
+slot is forecast from the buffered rows at the same time of day, and every
+candidate schedule, a force charge window and a force discharge window that
+each start now or on the hour, is simulated against the tariff. The state of
+charge and cost of all the candidates are stepped through the slots together,
+with NumPy if it's installed, otherwise in Python, which is much slower.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import time
+from bisect import bisect_right
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_utc_time_change
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DATA_BUCKET_MINUTES,
+    DOMAIN,
+    OPTIMIZER_CAPACITY,
+    OPTIMIZER_EFFICIENCY,
+    OPTIMIZER_HORIZON_HOURS,
+    OPTIMIZER_INTERVAL,
+    OPTIMIZER_MAX_POWER,
+    OPTIMIZER_RESERVE,
+    OPTIMIZER_WINDOW_HOURS,
+)
+from .models import PowervaultData
+from .rows import PowervaultRowBuffer
+from .totals import BUCKET_HOURS, BUCKET_SECONDS
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover
+    HAS_NUMPY = False
+
+if TYPE_CHECKING:
+    from . import PowervaultDataManager
+    from .commands import PowervaultCommandQueue
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_NORMAL = "normal"
+STATE_FORCE_CHARGE = "force-charge"
+STATE_FORCE_DISCHARGE = "force-discharge"
+PLANNED_STATES = [STATE_NORMAL, STATE_FORCE_CHARGE, STATE_FORCE_DISCHARGE]
+
+SLOTS_PER_DAY = 86400 // BUCKET_SECONDS
+# The readings are in mW, so this converts one to kWh over a slot
+SLOT_KWH = BUCKET_HOURS / 1_000_000
+HORIZON_SLOTS = OPTIMIZER_HORIZON_HOURS * 3600 // BUCKET_SECONDS
+
+
+@dataclass
+class OptimizerSettings:
+    """The tariff and battery that schedules are planned for."""
+
+    # Import prices per kWh, each from a time of day until the next, sorted by time
+    import_tariff: list[tuple[dt_time, float]]
+    export_price: float = 0.0
+    capacity: float = OPTIMIZER_CAPACITY
+    max_power: float = OPTIMIZER_MAX_POWER
+    # Set the battery state to the planned one when it changes
+    apply: bool = False
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the settings in a form that can be stored."""
+        return {
+            "import_tariff": [
+                [start.isoformat(), price] for start, price in self.import_tariff
+            ],
+            "export_price": self.export_price,
+            "capacity": self.capacity,
+            "max_power": self.max_power,
+            "apply": self.apply,
+        }
+
+    @classmethod
+    def from_dict(cls, stored: dict[str, Any]) -> OptimizerSettings:
+        """Restore the settings from a stored dict."""
+        return cls(
+            import_tariff=[
+                (dt_time.fromisoformat(start), price)
+                for start, price in stored["import_tariff"]
+            ],
+            export_price=stored["export_price"],
+            capacity=stored["capacity"],
+            max_power=stored["max_power"],
+            apply=stored["apply"],
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CandidateSchedules:
+    """Candidate schedules, as the slots of their charge and discharge windows.
+
+    A window runs from its start slot up to, but not including, its end slot,
+    so an empty window has the same start and end. The first candidate has
+    neither, and is the cost of leaving the battery alone.
+    """
+
+    charge_start: list[int]
+    charge_end: list[int]
+    discharge_start: list[int]
+    discharge_end: list[int]
+
+    def __len__(self) -> int:
+        """Return the number of candidates."""
+        return len(self.charge_start)
+
+
+@dataclass(frozen=True, slots=True)
+class _Battery:
+    """The battery as simulated, in kWh."""
+
+    charge: float
+    capacity: float
+    reserve: float
+    # The most that can go in or out in a slot
+    step: float
+    efficiency: float = OPTIMIZER_EFFICIENCY
+
+
+@dataclass
+class BatterySchedule:  # pylint: disable=too-many-instance-attributes
+    """The cheapest schedule that was found, from the start of a slot."""
+
+    start: datetime
+    slots: int
+    charge: tuple[int, int]
+    discharge: tuple[int, int]
+    cost: float
+    # The cost of leaving the battery in its normal state
+    baseline_cost: float
+    candidates: int
+    duration: float
+
+    def state_at(self, when: datetime) -> str | None:
+        """Return the planned battery state at a time, or None if it's not planned."""
+        slot = int((when - self.start).total_seconds() // BUCKET_SECONDS)
+        if not 0 <= slot < self.slots:
+            return None
+        if self.charge[0] <= slot < self.charge[1]:
+            return STATE_FORCE_CHARGE
+        if self.discharge[0] <= slot < self.discharge[1]:
+            return STATE_FORCE_DISCHARGE
+        return STATE_NORMAL
+
+    def windows(self) -> list[dict[str, Any]]:
+        """Return the times the battery is forced to charge or discharge."""
+        slot = timedelta(seconds=BUCKET_SECONDS)
+        return sorted(
+            (
+                {
+                    "state": state,
+                    "start": self.start + start * slot,
+                    "end": self.start + end * slot,
+                }
+                for state, (start, end) in (
+                    (STATE_FORCE_CHARGE, self.charge),
+                    (STATE_FORCE_DISCHARGE, self.discharge),
+                )
+                if start < end
+            ),
+            key=lambda window: window["start"],
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the schedule for diagnostics."""
+        return {
+            "start": self.start,
+            "windows": self.windows(),
+            "cost": round(self.cost, 2),
+            "baseline_cost": round(self.baseline_cost, 2),
+            "candidates": self.candidates,
+            "duration_ms": round(self.duration * 1000, 1),
+        }
+
+
+def forecast(rows: PowervaultRowBuffer, start: datetime, slots: int) -> list[float]:
+    """Return the energy the home is expected to need from outside in each slot.
+
+    It's the average demand less solar in kWh, from the buffered rows at the
+    same time of day, so it's negative when there's solar to spare. Times of
+    day that have no rows use the average of all of them.
+    """
+    offset = (dt_util.as_local(start).utcoffset() or timedelta()).total_seconds()
+    sums = [0.0] * SLOTS_PER_DAY
+    counts = [0] * SLOTS_PER_DAY
+    for when, demand, solar in zip(
+        rows.times, rows.column("instant_demand"), rows.column("instant_solar")
+    ):
+        if math.isnan(demand) or math.isnan(solar):
+            continue
+        slot = int((when + offset) % 86400 // BUCKET_SECONDS)
+        sums[slot] += (demand - solar) * SLOT_KWH
+        counts[slot] += 1
+
+    total = sum(counts)
+    average = math.fsum(sums) / total if total else 0.0
+    first = int((start.timestamp() + offset) % 86400 // BUCKET_SECONDS)
+    return [
+        sums[slot] / counts[slot] if counts[slot] else average
+        for slot in ((first + index) % SLOTS_PER_DAY for index in range(slots))
+    ]
+
+
+def slot_prices(
+    tariff: Sequence[tuple[dt_time, float]], start: datetime, slots: int
+) -> list[float]:
+    """Return the import price of each slot.
+
+    Before the first period of the day, the price of the last one applies.
+    """
+    minutes = [period.hour * 60 + period.minute for period, _ in tariff]
+    local = dt_util.as_local(start)
+    first = local.hour * 60 + local.minute
+    return [
+        tariff[bisect_right(minutes, (first + index * DATA_BUCKET_MINUTES) % 1440) - 1][
+            1
+        ]
+        for index in range(slots)
+    ]
+
+
+def candidate_windows(start: datetime, slots: int) -> list[tuple[int, int]]:
+    """Return the windows a schedule can force the battery in, as slot ranges.
+
+    They start now or on the hour, and are cut short at the end of the horizon.
+    """
+    per_hour = 3600 // BUCKET_SECONDS
+    first_hour = -(dt_util.as_local(start).minute // DATA_BUCKET_MINUTES) % per_hour
+    starts = {0, *range(first_hour, slots, per_hour)}
+    return sorted(
+        {
+            (begin, min(begin + hours * per_hour, slots))
+            for begin in starts
+            for hours in OPTIMIZER_WINDOW_HOURS
+        }
+    )
+
+
+def candidate_schedules(windows: Sequence[tuple[int, int]]) -> CandidateSchedules:
+    """Return every pair of a charge and a discharge window that don't overlap.
+
+    Either window can be empty, and the first candidate has neither.
+    """
+    options = [(0, 0), *windows]
+    schedules = CandidateSchedules([], [], [], [])
+    for charge_start, charge_end in options:
+        for discharge_start, discharge_end in options:
+            if charge_start < discharge_end and discharge_start < charge_end:
+                continue
+            schedules.charge_start.append(charge_start)
+            schedules.charge_end.append(charge_end)
+            schedules.discharge_start.append(discharge_start)
+            schedules.discharge_end.append(discharge_end)
+    return schedules
+
+
+def simulate(
+    battery: _Battery,
+    need: Sequence[float],
+    import_prices: Sequence[float],
+    export_price: float,
+    schedules: CandidateSchedules,
+) -> list[float]:
+    """Return the cost of each candidate schedule over the slots.
+
+    Outside its windows the battery is used as normal: it stores solar that
+    would be exported and covers the home's demand, as far as it can. The
+    energy left in the battery at the end is valued at the cheapest import
+    price, so a schedule can't look cheap by just running the battery down.
+    """
+    if HAS_NUMPY:
+        costs: list[float] = _simulate_numpy(
+            battery, need, import_prices, export_price, schedules
+        )
+    else:
+        costs = _simulate_python(battery, need, import_prices, export_price, schedules)
+    return costs
+
+
+def _simulate_numpy(
+    battery: _Battery,
+    need: Sequence[float],
+    import_prices: Sequence[float],
+    export_price: float,
+    schedules: CandidateSchedules,
+) -> Any:
+    """Simulate all the candidates at once using NumPy."""
+    charge_start = np.array(schedules.charge_start)
+    charge_end = np.array(schedules.charge_end)
+    discharge_start = np.array(schedules.discharge_start)
+    discharge_end = np.array(schedules.discharge_end)
+    charge = np.full(len(schedules), float(battery.charge))
+    cost = np.zeros(len(schedules))
+    for slot, (needed, price) in enumerate(zip(need, import_prices)):
+        room = np.clip(
+            (battery.capacity - charge) / battery.efficiency, 0, battery.step
+        )
+        available = np.clip(charge - battery.reserve, 0, battery.step)
+        flow = np.clip(-needed, -available, room)
+        flow = np.where((charge_start <= slot) & (slot < charge_end), room, flow)
+        flow = np.where(
+            (discharge_start <= slot) & (slot < discharge_end), -available, flow
+        )
+        charge += np.where(flow > 0, flow * battery.efficiency, flow)
+        grid = needed + flow
+        cost += np.where(grid > 0, grid * price, grid * export_price)
+    cost += (battery.charge - charge) * min(import_prices)
+    return cost.tolist()
+
+
+def _simulate_python(
+    battery: _Battery,
+    need: Sequence[float],
+    import_prices: Sequence[float],
+    export_price: float,
+    schedules: CandidateSchedules,
+) -> list[float]:
+    """Simulate the candidates one at a time in Python."""
+    costs = []
+    for charge_start, charge_end, discharge_start, discharge_end in zip(
+        schedules.charge_start,
+        schedules.charge_end,
+        schedules.discharge_start,
+        schedules.discharge_end,
+    ):
+        charge = battery.charge
+        cost = 0.0
+        for slot, (needed, price) in enumerate(zip(need, import_prices)):
+            room = min(
+                max((battery.capacity - charge) / battery.efficiency, 0), battery.step
+            )
+            available = min(max(charge - battery.reserve, 0), battery.step)
+            if charge_start <= slot < charge_end:
+                flow = room
+            elif discharge_start <= slot < discharge_end:
+                flow = -available
+            else:
+                flow = min(max(-needed, -available), room)
+            charge += flow * battery.efficiency if flow > 0 else flow
+            grid = needed + flow
+            cost += grid * price if grid > 0 else grid * export_price
+        costs.append(cost + (battery.charge - charge) * min(import_prices))
+    return costs
+
+
+def optimize(
+    settings: OptimizerSettings,
+    charge_percent: float,
+    need: Sequence[float],
+    start: datetime,
+) -> BatterySchedule:
+    """Return the cheapest schedule for the forecast need of each slot from start.
+
+    It can take a while without NumPy, so is run in the executor.
+    """
+    started = time.perf_counter()
+    slots = len(need)
+    battery = _Battery(
+        charge=settings.capacity * min(max(charge_percent, 0), 100) / 100,
+        capacity=settings.capacity,
+        reserve=settings.capacity * OPTIMIZER_RESERVE,
+        step=settings.max_power * BUCKET_HOURS,
+    )
+    schedules = candidate_schedules(candidate_windows(start, slots))
+    costs = simulate(
+        battery,
+        need,
+        slot_prices(settings.import_tariff, start, slots),
+        settings.export_price,
+        schedules,
+    )
+    # Ties go to the earlier candidate, so the battery is left alone if it can be
+    best = min(range(len(costs)), key=costs.__getitem__)
+    return BatterySchedule(
+        start=start,
+        slots=slots,
+        charge=(schedules.charge_start[best], schedules.charge_end[best]),
+        discharge=(schedules.discharge_start[best], schedules.discharge_end[best]),
+        cost=costs[best],
+        baseline_cost=costs[0],
+        candidates=len(schedules),
+        duration=time.perf_counter() - started,
+    )
+
+
+class PowervaultOptimizer:  # pylint: disable=too-many-instance-attributes
+    """Plans when to force a unit to charge and discharge, and can apply the plan.
+
+    Nothing is planned until a tariff has been set. The plan is made on its
+    own coordinator, from the latest charge and the buffered rows, every
+    interval and whenever the settings change. If applying is turned on, the
+    planned state is sent through the command queue when it changes, so a
+    manual change lasts until the next planned one.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        manager: PowervaultDataManager,
+        readings: DataUpdateCoordinator[PowervaultData],
+        battery_coordinator: DataUpdateCoordinator[str],
+        commands: PowervaultCommandQueue,
+    ) -> None:
+        """Init the optimizer."""
+        self.hass = hass
+        self.manager = manager
+        self.readings = readings
+        self.battery_coordinator = battery_coordinator
+        self.commands = commands
+        self.coordinator: DataUpdateCoordinator[
+            BatterySchedule | None
+        ] = DataUpdateCoordinator(
+            hass,
+            _LOGGER,
+            name="Powervault charge schedule",
+            update_method=self._async_plan,
+            update_interval=timedelta(seconds=OPTIMIZER_INTERVAL),
+        )
+        # The planned state that was last applied
+        self._applied: str | None = None
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    @callback  # type: ignore[misc]
+    def async_start(self) -> None:
+        """Start planning, and checking the planned state at the start of each slot."""
+        self._unsubs = [
+            self.coordinator.async_add_listener(self._async_apply),
+            async_track_utc_time_change(
+                self.hass,
+                self._async_slot_started,
+                minute=f"/{DATA_BUCKET_MINUTES}",
+                second=0,
+            ),
+        ]
+        if self.manager.optimizer_settings is not None:
+            self.hass.async_create_background_task(
+                self.coordinator.async_refresh(),
+                f"{DOMAIN} {self.manager.unit_id} charge schedule",
+            )
+
+    @callback  # type: ignore[misc]
+    def async_shutdown(self) -> None:
+        """Stop planning."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    async def async_set_settings(self, settings: OptimizerSettings | None) -> None:
+        """Plan with new settings, or stop planning, saving them."""
+        self.manager.optimizer_settings = settings
+        self._applied = None
+        if self.manager.store is not None:
+            self.manager.store.async_schedule_save(self.manager.data_to_store)
+        await self.coordinator.async_refresh()
+
+    async def _async_plan(self) -> BatterySchedule | None:
+        """Plan the day ahead from the latest charge."""
+        if (settings := self.manager.optimizer_settings) is None:
+            return None
+        data = self.readings.data
+        if data is None or data.charge is None:
+            raise UpdateFailed("There's no battery charge to plan from yet")
+
+        now = dt_util.utcnow().timestamp()
+        start = dt_util.utc_from_timestamp(now - now % BUCKET_SECONDS)
+        need = forecast(self.manager.rows, start, HORIZON_SLOTS)
+        schedule: BatterySchedule = await self.hass.async_add_executor_job(
+            optimize, settings, data.charge, need, start
+        )
+        _LOGGER.debug(
+            "Planned %s from %s candidates in %.0f ms, costing %.2f rather than %.2f",
+            schedule.windows(),
+            schedule.candidates,
+            schedule.duration * 1000,
+            schedule.cost,
+            schedule.baseline_cost,
+        )
+        return schedule
+
+    @callback  # type: ignore[misc]
+    def _async_slot_started(self, _now: datetime) -> None:
+        """Update the planned state, planning again if the last plan failed."""
+        if self.manager.optimizer_settings is not None and (
+            self.coordinator.data is None or not self.coordinator.last_update_success
+        ):
+            self.hass.async_create_background_task(
+                self.coordinator.async_request_refresh(),
+                f"{DOMAIN} {self.manager.unit_id} charge schedule",
+            )
+        self.coordinator.async_update_listeners()
+
+    @callback  # type: ignore[misc]
+    def _async_apply(self) -> None:
+        """Set the battery state to the planned one, if it has changed."""
+        settings = self.manager.optimizer_settings
+        schedule = self.coordinator.data
+        if settings is None or not settings.apply or schedule is None:
+            self._applied = None
+            return
+        battery_state = schedule.state_at(dt_util.utcnow())
+        if battery_state is None or battery_state == self._applied:
+            return
+        self._applied = battery_state
+        if battery_state != (self.commands.target or self.battery_coordinator.data):
+            _LOGGER.debug(
+                "Setting the battery state of %s to %s, as planned",
+                self.manager.unit_id,
+                battery_state,
+            )
+            self.commands.async_request(battery_state)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the optimizer for diagnostics."""
+        settings = self.manager.optimizer_settings
+        schedule = self.coordinator.data
+        return {
+            "settings": settings.as_dict() if settings else None,
+            "schedule": schedule.as_dict() if schedule else None,
+            "last_update_success": self.coordinator.last_update_success,
+            "applied": self._applied,
+            "numpy": HAS_NUMPY,
+        }
@@ -0,0 +1,136 @@
+"""Retries and circuit breaking for the Powervault API client."""
+
+from __future__ import annotations
+
+import random
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    API_RETRY_DELAY,
+    API_RETRY_MAX_DELAY,
+    BREAKER_COOLDOWN,
+    BREAKER_MAX_COOLDOWN,
+    BREAKER_THRESHOLD,
+)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int) -> float:
+    """Return how long to wait before retrying, after a number of failed attempts.
+
+    The delay is picked at random up to an exponentially growing limit, so
+    units that failed together don't all retry at the same moment.
+    """
+    return random.uniform(0, min(API_RETRY_MAX_DELAY, API_RETRY_DELAY * 2**attempt))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the seconds to wait from a Retry-After header, if it's valid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt_util.UTC)
+    return max(0.0, float((when - dt_util.utcnow()).total_seconds()))
+
+
+class CircuitBreaker:  # pylint: disable=too-many-instance-attributes
+    """Stops requests to the API for a while after it has failed repeatedly.
+
+    It opens after a number of failures in a row, and requests fail straight
+    away until the cooldown has passed. Then a single probe is let through:
+    if it succeeds the breaker closes, otherwise it opens again for twice as
+    long. It can also be held open for as long as the API asks with
+    Retry-After. Times are from time.monotonic.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN,
+    ) -> None:
+        """Init the breaker."""
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        # True while the probe of a half open breaker is in flight
+        self.probing = False
+
+    def retry_in(self, now: float) -> float:
+        """Return the seconds until requests are let through again."""
+        if self.state == BREAKER_OPEN:
+            return max(0.0, self._open_until - now)
+        return 0.0
+
+    def allow(self, now: float) -> bool:
+        """Return True if a request can be made, starting a probe if one is due."""
+        if self.state == BREAKER_OPEN:
+            if now < self._open_until:
+                return False
+            self.state = BREAKER_HALF_OPEN
+        if self.state == BREAKER_HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def release(self) -> None:
+        """Let another probe through, if a request ended without an outcome."""
+        self.probing = False
+
+    def record_success(self) -> None:
+        """Record that the API responded, closing the breaker."""
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self._cooldown = self.base_cooldown
+        self.probing = False
+
+    def record_failure(self, now: float) -> None:
+        """Record that a request failed, opening the breaker if it has to."""
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN:
+            # The API is still down, so wait longer before the next probe
+            self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+            self._open(now + self._cooldown)
+        elif self.state == BREAKER_CLOSED and self.failures >= self.threshold:
+            self._open(now + self._cooldown)
+
+    def hold(self, now: float, seconds: float) -> None:
+        """Open the breaker for as long as the API asked."""
+        self._open(max(self._open_until, now + min(seconds, self.max_cooldown)))
+
+    def _open(self, until: float) -> None:
+        """Open the breaker until a time."""
+        if self.state != BREAKER_OPEN:
+            self.opened += 1
+        self.state = BREAKER_OPEN
+        self._open_until = until
+        self.probing = False
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Return the state of the breaker for diagnostics."""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "retry_in": round(self.retry_in(now), 1),
+        }
@@ -0,0 +1,188 @@
+"""Rolling window statistics for the Powervault integration."""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, bisect_right
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from .rows import PowervaultRowBuffer
+
+STAT_MEAN = "mean"
+STAT_MAX = "max"
+STAT_RATIO = "ratio"
+
+
+@dataclass(frozen=True, slots=True)
+class RollingStatistic:
+    """A statistic of a field over a rolling window.
+
+    A ratio is the sum of field over the sum of denominator.
+    """
+
+    key: str
+    name: str
+    field: str
+    kind: str
+    hours: int
+    denominator: str | None = None
+
+
+ROLLING_STATISTICS = (
+    RollingStatistic(
+        "demand_mean_1h", "Average Demand (1 Hour)", "instant_demand", STAT_MEAN, 1
+    ),
+    RollingStatistic(
+        "demand_max_24h", "Peak Demand (24 Hours)", "instant_demand", STAT_MAX, 24
+    ),
+    RollingStatistic(
+        "grid_max_24h", "Peak Grid Import (24 Hours)", "instant_grid", STAT_MAX, 24
+    ),
+    RollingStatistic(
+        "solar_max_24h", "Peak Solar (24 Hours)", "instant_solar", STAT_MAX, 24
+    ),
+    RollingStatistic(
+        "self_consumption_24h",
+        "Solar Self Consumption (24 Hours)",
+        "solarConsumedByHome",
+        STAT_RATIO,
+        24,
+        denominator="solarGenerated",
+    ),
+)
+
+
+class RollingWindow:
+    """The sum, count, min and max of the samples in the last duration seconds.
+
+    Each sample is added and expired once, and the min and max are kept in
+    monotonic deques, so updates take constant time on average no matter how
+    many samples are in the window.
+    """
+
+    __slots__ = ("duration", "total", "_samples", "_min", "_max")
+
+    def __init__(self, duration: float) -> None:
+        """Init the window."""
+        self.duration = duration
+        self.total = 0.0
+        self._samples: deque[tuple[float, float]] = deque()
+        self._min: deque[tuple[float, float]] = deque()
+        self._max: deque[tuple[float, float]] = deque()
+
+    def __len__(self) -> int:
+        """Return the number of samples in the window."""
+        return len(self._samples)
+
+    def add(self, time: float, value: float) -> None:
+        """Add a sample, which must be newer than all the others."""
+        self._samples.append((time, value))
+        self.total += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((time, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((time, value))
+        self.expire(time)
+
+    def expire(self, now: float) -> None:
+        """Drop the samples that are no longer in the window."""
+        cutoff = now - self.duration
+        while self._samples and self._samples[0][0] <= cutoff:
+            self.total -= self._samples.popleft()[1]
+        while self._min and self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= cutoff:
+            self._max.popleft()
+        if not self._samples:
+            # Don't let rounding errors build up
+            self.total = 0.0
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean of the samples."""
+        return self.total / len(self._samples) if self._samples else None
+
+    @property
+    def min(self) -> float | None:
+        """Return the smallest sample."""
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self) -> float | None:
+        """Return the largest sample."""
+        return self._max[0][1] if self._max else None
+
+
+class PowervaultRollingStats:
+    """Keeps the rolling statistics up to date from the buffered rows."""
+
+    def __init__(
+        self, statistics: Sequence[RollingStatistic] = ROLLING_STATISTICS
+    ) -> None:
+        """Init the statistics."""
+        self.statistics = statistics
+        self.latest_time: float | None = None
+        self._windows: dict[tuple[str, int], RollingWindow] = {}
+        self._reset()
+        self._longest = max(
+            (statistic.hours * 3600 for statistic in statistics), default=0
+        )
+
+    def _reset(self) -> None:
+        """Empty the windows."""
+        self.latest_time = None
+        self._windows = {}
+        for statistic in self.statistics:
+            for field in (statistic.field, statistic.denominator):
+                if field is not None:
+                    self._windows.setdefault(
+                        (field, statistic.hours), RollingWindow(statistic.hours * 3600)
+                    )
+
+    def update(self, rows: PowervaultRowBuffer) -> None:
+        """Add the rows that have been added or replaced since the last update.
+
+        New rows are added to the windows as they are. If a row the windows
+        have already seen has changed, which happens at the start of most
+        buckets as blank values are filled in, the windows are filled again
+        from the rows that are still in them.
+        """
+        times = rows.times
+        if (changed := rows.take_changed()) is None or not times:
+            return
+        if self.latest_time is not None and changed > self.latest_time:
+            start = bisect_left(times, changed)
+        else:
+            self._reset()
+            start = bisect_right(times, times[-1] - self._longest)
+
+        columns = {field: rows.column(field) for field, _ in self._windows}
+        for position in range(start, len(times)):
+            time = times[position]
+            for (field, _), window in self._windows.items():
+                if not math.isnan(value := columns[field][position]):
+                    window.add(time, value)
+                else:
+                    window.expire(time)
+        self.latest_time = times[-1]
+
+    def values(self) -> dict[str, float | None]:
+        """Return the current value of each statistic."""
+        values: dict[str, float | None] = {}
+        for statistic in self.statistics:
+            window = self._windows[(statistic.field, statistic.hours)]
+            if statistic.kind == STAT_MEAN:
+                values[statistic.key] = window.mean
+            elif statistic.kind == STAT_MAX:
+                values[statistic.key] = window.max
+            else:
+                assert statistic.denominator is not None
+                denominator = self._windows[(statistic.denominator, statistic.hours)]
+                values[statistic.key] = (
+                    window.total / denominator.total if denominator.total else None
+                )
+        return values
@@ -0,0 +1,133 @@
+"""Compact in memory history of data rows for the Powervault integration."""
+
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from .const import ROW_FIELDS
+from .totals import row_time
+
+
+class PowervaultRowBuffer:
+    """The most recent data rows, stored as one array of floats per field.
+
+    A row is kept as a float per field rather than a dict, so days of rows
+    take a fraction of the memory. The columns are sorted by time, with one
+    row per time, and the oldest rows are dropped once there are more than
+    capacity of them. Fields that were None are NaN.
+
+    The time of the earliest row added or replaced is kept until it's taken,
+    so that what's been worked out from the rows can be brought up to date,
+    even when a row it has already seen is filled in later.
+    """
+
+    __slots__ = ("capacity", "fields", "index", "times", "_columns", "_changed")
+
+    def __init__(self, capacity: int, fields: Sequence[str] | None = None) -> None:
+        """Init the buffer, with the usual row fields unless fields are given."""
+        self.capacity = capacity
+        self.fields = tuple(ROW_FIELDS if fields is None else fields)
+        self.index = {field: position for position, field in enumerate(self.fields)}
+        self.times = array("d")
+        self._columns = [array("d") for _ in self.fields]
+        self._changed: float | None = None
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.times)
+
+    def column(self, field: str) -> array[float]:
+        """Return the values of a field, oldest first."""
+        return self._columns[self.index[field]]
+
+    def add(self, row: dict[str, Any]) -> bool:
+        """Add a row, replacing any with the same time.
+
+        Returns False if the row has no time, or is too old to keep.
+        """
+        if (when := row_time(row)) is None:
+            return False
+        timestamp = when.timestamp()
+        values = [_to_float(row.get(field)) for field in self.fields]
+
+        # Rows almost always arrive in order, so only search if this one didn't
+        if not self.times or timestamp > self.times[-1]:
+            position = len(self.times)
+        else:
+            position = bisect_left(self.times, timestamp)
+            if position < len(self.times) and self.times[position] == timestamp:
+                for column, value in zip(self._columns, values):
+                    column[position] = value
+                self._mark_changed(timestamp)
+                return True
+            if position == 0 and len(self.times) >= self.capacity:
+                return False
+
+        self.times.insert(position, timestamp)
+        for column, value in zip(self._columns, values):
+            column.insert(position, value)
+        self._mark_changed(timestamp)
+        self._trim()
+        return True
+
+    def extend(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Add a number of rows."""
+        for row in rows:
+            self.add(row)
+
+    def take_changed(self) -> float | None:
+        """Return the time of the earliest row added or replaced since the last call.
+
+        Returns None if no rows have changed.
+        """
+        changed, self._changed = self._changed, None
+        return changed
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the rows in a form that can be stored."""
+        return {
+            "fields": self.fields,
+            "times": self.times.tolist(),
+            "columns": [
+                [None if math.isnan(value) else value for value in column]
+                for column in self._columns
+            ],
+        }
+
+    def restore(self, stored: dict[str, Any]) -> None:
+        """Restore the rows from a stored dict, keeping the fields of this buffer."""
+        stored_index = {
+            field: position for position, field in enumerate(stored["fields"])
+        }
+        self.times = array("d", stored["times"])
+        self._columns = []
+        for field in self.fields:
+            if (position := stored_index.get(field)) is None:
+                self._columns.append(array("d", [math.nan] * len(self.times)))
+                continue
+            self._columns.append(
+                array("d", (_to_float(value) for value in stored["columns"][position]))
+            )
+        self._trim()
+        self._changed = self.times[0] if self.times else None
+
+    def _mark_changed(self, timestamp: float) -> None:
+        """Note that the row at a time was added or replaced."""
+        if self._changed is None or timestamp < self._changed:
+            self._changed = timestamp
+
+    def _trim(self) -> None:
+        """Drop the oldest rows, once there are more than the capacity."""
+        if (excess := len(self.times) - self.capacity) > 0:
+            del self.times[:excess]
+            for column in self._columns:
+                del column[:excess]
+
+
+def _to_float(value: Any) -> float:
+    """Return a value as a float, with None as NaN."""
+    return math.nan if value is None else float(value)
@@ -0,0 +1,108 @@
+"""Adaptive poll scheduling for the Powervault integration."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any
+
+from .const import (
+    BOOST_DURATION,
+    BOOST_POLL_INTERVAL,
+    DATA_BUCKET_MINUTES,
+    MAX_POLL_INTERVAL,
+    MIN_POLL_INTERVAL,
+    POLL_SETTLE_DELAY,
+    UPDATE_INTERVAL,
+)
+
+
+class PowervaultPollScheduler:
+    """Chooses when to poll next, based on when the API publishes new buckets.
+
+    The API only publishes a new row every 5 minutes, so most fixed interval
+    polls return the same data. The scheduler tracks the time of the latest
+    row, and aims to poll just after the next one is due. If it's late, or a
+    poll fails, it backs off exponentially. After the battery state has been
+    changed it polls quickly for a while so the change shows up.
+    """
+
+    def __init__(self) -> None:
+        """Init the scheduler."""
+        self.interval = timedelta(seconds=UPDATE_INTERVAL)
+        self.polls = 0
+        self.changed_polls = 0
+        self.latest_row_time: datetime | None = None
+        self._unchanged = 0
+        self._failures = 0
+        self._boost_until: datetime | None = None
+
+    @property
+    def hit_rate(self) -> float | None:
+        """Return the fraction of polls that returned new data."""
+        if not self.polls:
+            return None
+        return self.changed_polls / self.polls
+
+    def record_poll(
+        self, success: bool, changed: bool, row_time: datetime | None
+    ) -> None:
+        """Record the outcome of a poll."""
+        self.polls += 1
+        if not success:
+            self._failures += 1
+            return
+
+        self._failures = 0
+        if changed:
+            self.changed_polls += 1
+            self._unchanged = 0
+        else:
+            self._unchanged += 1
+        if row_time is not None and (
+            self.latest_row_time is None or row_time > self.latest_row_time
+        ):
+            self.latest_row_time = row_time
+
+    def boost(self, now: datetime) -> None:
+        """Poll quickly for a while, after something has been changed."""
+        self._boost_until = now + timedelta(seconds=BOOST_DURATION)
+
+    def next_interval(self, now: datetime) -> timedelta:
+        """Work out how long to wait before the next poll."""
+        self.interval = timedelta(seconds=self._next_seconds(now))
+        return self.interval
+
+    def _next_seconds(self, now: datetime) -> float:
+        """Return the number of seconds until the next poll."""
+        if self._boost_until is not None and now < self._boost_until:
+            return BOOST_POLL_INTERVAL
+
+        if self._failures:
+            return float(
+                min(UPDATE_INTERVAL * 2 ** (self._failures - 1), MAX_POLL_INTERVAL)
+            )
+
+        if self.latest_row_time is None:
+            return UPDATE_INTERVAL
+
+        expected = self.latest_row_time + timedelta(
+            minutes=DATA_BUCKET_MINUTES, seconds=POLL_SETTLE_DELAY
+        )
+        if expected > now:
+            return max((expected - now).total_seconds(), MIN_POLL_INTERVAL)
+
+        # The next bucket is late, so back off until it turns up
+        return float(min(MIN_POLL_INTERVAL * 2**self._unchanged, MAX_POLL_INTERVAL))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the scheduler state for diagnostics."""
+        return {
+            "interval": self.interval.total_seconds(),
+            "polls": self.polls,
+            "changed_polls": self.changed_polls,
+            "hit_rate": self.hit_rate,
+            "latest_row_time": self.latest_row_time,
+            "consecutive_unchanged": self._unchanged,
+            "consecutive_failures": self._failures,
+            "boost_until": self._boost_until,
+        }
@@ -0,0 +1,232 @@
+"""Schema of the Powervault data, and the sensors that show it.
+
+The sensor descriptions are the one place the fields of a data row are
+listed: the descriptions with a payload key are decoded into PowervaultData,
+and every description becomes a sensor. Numeric fields that aren't in the
+schema are kept too, and get a sensor of their own when they first appear.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Any, Final
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfPower
+
+from .const import INSTANT_POWER_DEADBAND, INSTANT_SOLAR_THRESHOLD
+from .models import PowervaultData
+from .rolling import ROLLING_STATISTICS, STAT_RATIO, RollingStatistic
+
+ValueFn = Callable[[PowervaultData], Any]
+
+
+@dataclass
+class PowervaultRequiredKeysMixin:
+    """Mixin for required keys."""
+
+    value_fn: Callable[[PowervaultData], float | None]
+
+
+@dataclass
+class PowervaultSensorEntityDescription(
+    SensorEntityDescription, PowervaultRequiredKeysMixin
+):
+    """Describes a Powervault sensor, and the field it's decoded from."""
+
+    # The field of a data row the value is read from, if it comes straight from
+    # the API. The key is then the name of the field of PowervaultData.
+    payload_key: str | None = None
+    # Changes to the state no bigger than this aren't written
+    deadband: float | None = None
+
+
+def _scaled(
+    get_value: ValueFn, divisor: float, digits: int | None = None
+) -> Callable[[PowervaultData], float | None]:
+    """Return a function for a value divided by a number, and rounded."""
+
+    def _value(data: PowervaultData) -> float | None:
+        value: float | None = get_value(data)
+        if value is None:  # pylint: disable=consider-using-assignment-expr
+            return None
+        return round(value / divisor, digits)
+
+    return _value
+
+
+def _percent(get_value: ValueFn) -> Callable[[PowervaultData], float | None]:
+    """Return a function for a ratio as a percentage."""
+
+    def _value(data: PowervaultData) -> float | None:
+        value: float | None = get_value(data)
+        return None if value is None else round(value * 100, 1)
+
+    return _value
+
+
+def _threshold(get_value: ValueFn, threshold: float) -> ValueFn:
+    """Return a function for a value that is 0 up to a threshold."""
+
+    def _value(data: PowervaultData) -> Any:
+        value = get_value(data)
+        if value is not None and value <= threshold:
+            return 0
+        return value
+
+    return _value
+
+
+def _power(
+    key: str, name: str, get_value: ValueFn | None = None
+) -> PowervaultSensorEntityDescription:
+    """Describe a W reading, from a field of the data in mW."""
+    return PowervaultSensorEntityDescription(  # pylint: disable=unexpected-keyword-arg
+        key=key,
+        name=name,
+        payload_key=key,
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_scaled(get_value or attrgetter(key), 1000),
+        deadband=INSTANT_POWER_DEADBAND if key.startswith("instant_") else None,
+    )
+
+
+def _energy_total(attribute: str, name: str) -> PowervaultSensorEntityDescription:
+    """Describe today's kWh total of a reading."""
+
+    def _get_total(data: PowervaultData) -> Any:
+        return data.totals.get(attribute)
+
+    return PowervaultSensorEntityDescription(  # pylint: disable=unexpected-keyword-arg
+        key=f"total{attribute}",
+        name=name,
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=_scaled(_get_total, 1000, 2),
+    )
+
+
+def _rolling(statistic: RollingStatistic) -> PowervaultSensorEntityDescription:
+    """Describe a rolling window statistic."""
+
+    def _get_statistic(data: PowervaultData) -> Any:
+        return data.rolling.get(statistic.key)
+
+    if statistic.kind == STAT_RATIO:
+        return (
+            PowervaultSensorEntityDescription(  # pylint: disable=unexpected-keyword-arg
+                key=statistic.key,
+                name=statistic.name,
+                native_unit_of_measurement=PERCENTAGE,
+                state_class=SensorStateClass.MEASUREMENT,
+                value_fn=_percent(_get_statistic),
+            )
+        )
+    return PowervaultSensorEntityDescription(  # pylint: disable=unexpected-keyword-arg
+        key=statistic.key,
+        name=statistic.name,
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_scaled(_get_statistic, 1000),
+        deadband=INSTANT_POWER_DEADBAND,
+    )
+
+
+def discovered_sensor(field: str) -> PowervaultSensorEntityDescription:
+    """Describe a numeric field that isn't in the schema.
+
+    Its unit isn't known, so the value is shown as it is, and the sensor is
+    disabled until it's enabled by the user.
+    """
+
+    def _get_extra(data: PowervaultData) -> float | None:
+        return data.extra.get(field)
+
+    return PowervaultSensorEntityDescription(  # pylint: disable=unexpected-keyword-arg
+        key=field,
+        name=field,
+        payload_key=field,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=_get_extra,
+    )
+
+
+# Daily energy totals, by the attribute they're integrated from
+ENERGY_TOTAL_NAMES: Final = {
+    "batteryInputFromGrid": "Total Battery Input From Grid",
+    "batteryInputFromSolar": "Total Battery Input From Solar",
+    "batteryOutputConsumedByHome": "Total Battery Output Consumed By Home",
+    "batteryOutputExported": "Total Battery Output Exported",
+    "homeConsumed": "Total Home Consumed",
+    "gridConsumedByHome": "Total Grid Consumed By Home",
+    "solarConsumedByHome": "Total Solar Consumed By Home",
+    "solarExported": "Total Solar Exported",
+    "solarGenerated": "Total Solar Generated",
+}
+
+SENSORS: Final[tuple[PowervaultSensorEntityDescription, ...]] = (
+    PowervaultSensorEntityDescription(  # pylint: disable=unexpected-keyword-arg
+        key="charge",
+        name="Charge",
+        payload_key="instant_soc",
+        device_class=SensorDeviceClass.BATTERY,
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_scaled(attrgetter("charge"), 1),
+    ),
+    _power("batteryInputFromGrid", "Battery Input From Grid"),
+    _power("batteryInputFromSolar", "Battery Input From Solar"),
+    _power("batteryOutputConsumedByHome", "Battery Output Consumed By Home"),
+    _power("batteryOutputExported", "Battery Output Exported"),
+    _power("homeConsumed", "Home Consumed"),
+    _power("gridConsumedByHome", "Grid Consumed By Home"),
+    _power("solarConsumedByHome", "Solar Consumed By Home"),
+    _power("solarExported", "Solar Exported"),
+    _power("instant_battery", "Instant Battery"),
+    _power("instant_demand", "Instant Demand"),
+    _power("instant_grid", "Instant Grid"),
+    _power("solarGenerated", "Solar Generated"),
+    _power("solarConsumption", "Solar Consumption"),
+    _power(
+        "instant_solar",
+        "Instant Solar",
+        _threshold(attrgetter("instant_solar"), INSTANT_SOLAR_THRESHOLD),
+    ),
+    *(_energy_total(attribute, name) for attribute, name in ENERGY_TOTAL_NAMES.items()),
+    *(_rolling(statistic) for statistic in ROLLING_STATISTICS),
+)
+
+# The fields of PowervaultData that are decoded from a row, and their row keys
+PAYLOAD_FIELDS: Final = {
+    description.key: description.payload_key
+    for description in SENSORS
+    if description.payload_key is not None
+}
+
+# Row keys that aren't discovered, including the keys of the sensors, so a
+# discovered sensor can't have the unique ID of one in the schema
+_KNOWN_KEYS: Final = frozenset(
+    {"time", *PAYLOAD_FIELDS.values(), *(description.key for description in SENSORS)}
+)
+
+
+def decode_row(row: dict[str, Any]) -> dict[str, Any]:
+    """Return the fields of PowervaultData that are read from a data row."""
+    decoded = {field: row.get(key) for field, key in PAYLOAD_FIELDS.items()}
+    decoded["extra"] = {
+        key: value
+        for key, value in row.items()
+        if key not in _KNOWN_KEYS and type(value) in (int, float)
+    }
+    return decoded
@@ -6,9 +6,13 @@ from homeassistant.components.select import SelectEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from powervaultpy import VALID_STATUSES, PowerVault
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    POWERVAULT_BATTERY_COORDINATOR,
+    POWERVAULT_COMMANDS,
+    VALID_STATUSES,
+)
 from .entity import PowervaultEntity
 from .models import PowervaultRuntimeData
 
@@ -19,7 +23,7 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Powervault charge status select entities."""
-    powervault_data: PowerVault = hass.data[DOMAIN][config_entry.entry_id]
+    powervault_data: PowervaultRuntimeData = hass.data[DOMAIN][config_entry.entry_id]
     async_add_entities([PowervaultSelectEntity(powervault_data)])
 
 
@@ -33,7 +37,11 @@ class PowervaultSelectEntity(
         powervault_data: PowervaultRuntimeData,
     ) -> None:
         """Initialize the select entity."""
-        super().__init__(powervault_data)
+        super().__init__(
+            powervault_data, powervault_data[POWERVAULT_BATTERY_COORDINATOR]
+        )
+        self.powervault_data = powervault_data
+        self.commands = powervault_data[POWERVAULT_COMMANDS]
 
         self._attr_name = "Powervault Charge Status"
         self._attr_unique_id = f"{self.base_unique_id}_charge_status"
@@ -44,7 +52,8 @@ class PowervaultSelectEntity(
     @callback  # type: ignore[misc]
     def _async_update_attrs(self) -> None:
         """Update entity attributes."""
-        self._attr_current_option = self.data.battery_state
+        # Show the state that was asked for until the change is confirmed
+        self._attr_current_option = self.commands.target or self.coordinator.data
 
     @callback  # type: ignore[misc]
     def _handle_coordinator_update(self) -> None:
@@ -54,11 +63,8 @@ class PowervaultSelectEntity(
 
     async def async_select_option(self, option: str) -> None:
         """Change the current preset."""
-        await self.coordinator.hass.async_add_executor_job(
-            self.powervault.set_battery_state,
-            self.coordinator.config_entry.data["unit_id"],
-            option,
-        )
+        self.commands.async_request(option)
 
         self._attr_current_option = option
         self.async_write_ha_state()
+        self._last_written = self._current_state()
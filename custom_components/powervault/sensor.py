@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import logging
+from typing import Any
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -10,77 +11,28 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfPower
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from powervaultpy import PowerVault
-
-from .const import DOMAIN, POWERVAULT_COORDINATOR
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    POWERVAULT_COORDINATOR,
+    POWERVAULT_HUB,
+    POWERVAULT_MANAGER,
+    POWERVAULT_OPTIMIZER,
+)
 from .entity import PowervaultEntity
 from .models import PowervaultRuntimeData
+from .optimizer import PLANNED_STATES
+from .schema import SENSORS, PowervaultSensorEntityDescription, discovered_sensor
 
 _LOGGER = logging.getLogger(__name__)
 
-# @dataclass
-# class PowervaultRequiredKeysMixin:
-#     """Mixin for required keys."""
-
-#     value_fn: Callable[[Meter], float]
-
-
-# @dataclass
-# class PowervaultSensorEntityDescription(
-#     SensorEntityDescription, PowervaultRequiredKeysMixin
-# ):
-#     """Describes Powervault entity."""
-
-
-# def _get_meter_power(meter: Meter) -> float:
-#     """Get the current value in kW."""
-#     return meter.get_power(precision=3)
-
-
-# def _get_meter_frequency(meter: Meter) -> float:
-#     """Get the current value in Hz."""
-#     return round(meter.frequency, 1)
-
-
-# def _get_meter_total_current(meter: Meter) -> float:
-#     """Get the current value in A."""
-#     return meter.get_instant_total_current()
-
-
-# def _get_meter_average_voltage(meter: Meter) -> float:
-#     """Get the current value in V."""
-#     return round(meter.average_voltage, 1)
-
-energy_sensor_names = [
-    ["batteryInputFromGrid", "Battery Input From Grid"],
-    ["batteryInputFromSolar", "Battery Input From Solar"],
-    ["batteryOutputConsumedByHome", "Battery Output Consumed By Home"],
-    ["batteryOutputExported", "Battery Output Exported"],
-    ["homeConsumed", "Home Consumed"],
-    ["gridConsumedByHome", "Grid Consumed By Home"],
-    ["solarConsumedByHome", "Solar Consumed By Home"],
-    ["solarExported", "Solar Exported"],
-    ["instant_battery", "Instant Battery"],
-    ["instant_demand", "Instant Demand"],
-    ["instant_grid", "Instant Grid"],
-    ["solarGenerated", "Solar Generated"],
-    ["solarConsumption", "Solar Consumption"],
-    ["instant_solar", "Instant Solar"],
-]
-
-power_sensor_names = [
-    ["batteryInputFromGrid", "Total Battery Input From Grid"],
-    ["batteryInputFromSolar", "Total Battery Input From Solar"],
-    ["batteryOutputConsumedByHome", "Total Battery Output Consumed By Home"],
-    ["batteryOutputExported", "Total Battery Output Exported"],
-    ["homeConsumed", "Total Home Consumed"],
-    ["gridConsumedByHome", "Total Grid Consumed By Home"],
-    ["solarConsumedByHome", "Total Solar Consumed By Home"],
-    ["solarExported", "Total Solar Exported"],
-    ["solarGenerated", "Total Solar Generated"],
+diagnostic_sensor_names = [
+    ["refresh_duration", "Refresh Duration"],
+    ["api_latency_p95", "API Latency 95th Percentile"],
 ]
 
 
@@ -90,106 +42,127 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the powerwall sensors."""
-    powervault_data: PowerVault = hass.data[DOMAIN][config_entry.entry_id]
+    powervault_data: PowervaultRuntimeData = hass.data[DOMAIN][config_entry.entry_id]
     coordinator = powervault_data[POWERVAULT_COORDINATOR]
     assert coordinator is not None
     entities: list[PowervaultEntity] = [
-        PowervaultChargeSensor(powervault_data),
+        PowervaultSensor(powervault_data, description) for description in SENSORS
     ]
 
-    # if data.backup_reserve is not None:
-    #     entities.append(PowerWallBackupReserveSensor(powerwall_data))
+    for sensor in diagnostic_sensor_names:
+        entities.append(
+            PowervaultDiagnosticSensor(powervault_data, sensor[0], sensor[1])
+        )
 
-    # for meter in data.meters.meters:
-    #     entities.append(PowerWallExportSensor(powerwall_data, meter))
-    #     entities.append(PowerWallImportSensor(powerwall_data, meter))
-    for sensor in energy_sensor_names:
-        _LOGGER.debug(f"Adding sensor {sensor[0]}")
-        entities.append(PowervaultEnergySensor(powervault_data, sensor[0], sensor[1]))
-
-    for sensor in power_sensor_names:
-        _LOGGER.debug(f"Adding sensor {sensor[0]}")
-        entities.append(PowervaultPowerSensor(powervault_data, sensor[0], sensor[1]))
+    entities.append(PowervaultScheduleSensor(powervault_data))
 
     async_add_entities(entities)
 
+    discovered: set[str] = set()
 
-class PowervaultChargeSensor(PowervaultEntity, SensorEntity):
-    """Representation of an Powervault charge sensor."""
-
-    _attr_name = "Powervault Charge"
-    _attr_state_class = SensorStateClass.MEASUREMENT
-    _attr_native_unit_of_measurement = PERCENTAGE
-    _attr_device_class = SensorDeviceClass.BATTERY
+    @callback  # type: ignore[misc]
+    def _async_add_discovered_sensors() -> None:
+        """Add sensors for numeric fields the API has started returning."""
+        if coordinator.data is None or coordinator.data.extra.keys() <= discovered:
+            return
+        fields = coordinator.data.extra.keys() - discovered
+        _LOGGER.debug("Adding sensors for new fields %s", ", ".join(sorted(fields)))
+        discovered.update(fields)
+        async_add_entities(
+            PowervaultSensor(powervault_data, discovered_sensor(field))
+            for field in sorted(fields)
+        )
 
-    @property
-    def unique_id(self) -> str:
-        """Device Uniqueid."""
-        return f"{self.base_unique_id}_charge"
+    _async_add_discovered_sensors()
+    config_entry.async_on_unload(
+        coordinator.async_add_listener(_async_add_discovered_sensors)
+    )
 
-    @property
-    def native_value(self) -> float | None:
-        """Get the current value in percentage."""
-        try:
-            return round(self.data.charge)  # type: ignore[no-any-return]
-        except (KeyError, TypeError):
-            pass
-        return None
 
+class PowervaultSensor(PowervaultEntity, SensorEntity):
+    """Representation of a Powervault sensor from the schema."""
 
-class PowervaultEnergySensor(PowervaultEntity, SensorEntity):
-    """Representation of an Powervault Energy sensor."""
-
-    _attr_state_class = SensorStateClass.MEASUREMENT
-    _attr_native_unit_of_measurement = UnitOfPower.WATT
-    _attr_device_class = SensorDeviceClass.POWER
+    entity_description: PowervaultSensorEntityDescription
 
     def __init__(
         self,
         powervault_data: PowervaultRuntimeData,
-        json_key: str,
-        description: str,
+        description: PowervaultSensorEntityDescription,
     ) -> None:
         """Initialize the sensor."""
         super().__init__(powervault_data)
-        self._attr_name = f"Powervault {description}"
-        self._attr_unique_id = f"{self.base_unique_id}_{json_key}"
-        self.json_key = json_key
+        self.entity_description = description
+        self._attr_name = f"Powervault {description.name}"
+        self._attr_unique_id = f"{self.base_unique_id}_{description.key}"
+        self._data_key = description.payload_key
+        self._deadband = description.deadband
 
     @property
     def native_value(self) -> float | None:
-        """Get the current value in percentage."""
-        try:
-            return round(getattr(self.data, self.json_key) / 1000)  # type: ignore[no-any-return]
-        except (KeyError, TypeError):
-            pass
-        return None
+        """Get the current value."""
+        return self.entity_description.value_fn(self.data)
 
 
-class PowervaultPowerSensor(PowervaultEntity, SensorEntity):
-    """Representation of an Powervault Power sensor."""
+class PowervaultDiagnosticSensor(PowervaultEntity, SensorEntity):
+    """Representation of a Powervault refresh or API timing."""
 
-    _attr_state_class = SensorStateClass.TOTAL_INCREASING
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
     def __init__(
         self,
         powervault_data: PowervaultRuntimeData,
-        json_key: str,
+        key: str,
         description: str,
     ) -> None:
         """Initialize the sensor."""
         super().__init__(powervault_data)
         self._attr_name = f"Powervault {description}"
-        self._attr_unique_id = f"{self.base_unique_id}_total{json_key}"
-        self.json_key = json_key
+        self._attr_unique_id = f"{self.base_unique_id}_{key}"
+        self.key = key
+        self.powervault_data = powervault_data
 
     @property
     def native_value(self) -> float | None:
-        """Get the current value in percentage."""
-        try:
-            return round(self.data.totals[self.json_key] / 1000, 2)  # type: ignore[no-any-return]
-        except (KeyError, TypeError):
-            pass
-        return None
+        """Get the current value in ms."""
+        if self.key == "refresh_duration":
+            seconds = self.powervault_data[POWERVAULT_MANAGER].metrics.last_duration
+        else:
+            client = self.powervault_data[POWERVAULT_HUB].client
+            seconds = client.metrics.latency.percentile(95)
+        return None if seconds is None else round(seconds * 1000)
+
+
+class PowervaultScheduleSensor(PowervaultEntity, SensorEntity):
+    """Representation of the battery state planned by the optimizer."""
+
+    _attr_name = "Powervault Planned Battery State"
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = PLANNED_STATES
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, powervault_data: PowervaultRuntimeData) -> None:
+        """Initialize the sensor."""
+        super().__init__(
+            powervault_data, powervault_data[POWERVAULT_OPTIMIZER].coordinator
+        )
+        self._attr_unique_id = f"{self.base_unique_id}_planned_battery_state"
+
+    @property
+    def native_value(self) -> str | None:
+        """Get the planned state for now."""
+        return self.coordinator.data.state_at(dt_util.utcnow())  # type: ignore[no-any-return]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the planned windows and their cost."""
+        if (schedule := self.coordinator.data) is None:
+            return None
+        return {
+            "windows": schedule.windows(),
+            "cost": round(schedule.cost, 2),
+            "baseline_cost": round(schedule.baseline_cost, 2),
+        }
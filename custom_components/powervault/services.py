@@ -0,0 +1,175 @@
+"""Services for the Powervault integration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+
+from .api import PowervaultError
+from .backfill import async_backfill
+from .const import (
+    DOMAIN,
+    OPTIMIZER_CAPACITY,
+    OPTIMIZER_MAX_POWER,
+    POWERVAULT_MANAGER,
+    POWERVAULT_OPTIMIZER,
+    TRACE_MODES,
+)
+from .models import PowervaultRuntimeData
+from .optimizer import OptimizerSettings
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_BACKFILL = "backfill"
+SERVICE_SET_TRACE = "set_trace"
+SERVICE_PLAN_SCHEDULE = "plan_schedule"
+SERVICE_CLEAR_SCHEDULE = "clear_schedule"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_MODE = "mode"
+ATTR_IMPORT_TARIFF = "import_tariff"
+ATTR_START = "start"
+ATTR_PRICE = "price"
+ATTR_EXPORT_PRICE = "export_price"
+ATTR_CAPACITY = "capacity"
+ATTR_MAX_POWER = "max_power"
+ATTR_APPLY = "apply"
+
+BACKFILL_SCHEMA = vol.Schema({vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string})
+SET_TRACE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_MODE): vol.In(TRACE_MODES),
+    }
+)
+PLAN_SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_IMPORT_TARIFF): vol.All(
+            cv.ensure_list,
+            [
+                vol.Schema(
+                    {
+                        vol.Required(ATTR_START): cv.time,
+                        vol.Required(ATTR_PRICE): vol.Coerce(float),
+                    }
+                )
+            ],
+            vol.Length(min=1),
+        ),
+        vol.Optional(ATTR_EXPORT_PRICE, default=0): vol.Coerce(float),
+        vol.Optional(ATTR_CAPACITY, default=OPTIMIZER_CAPACITY): vol.All(
+            vol.Coerce(float), vol.Range(min=0.5)
+        ),
+        vol.Optional(ATTR_MAX_POWER, default=OPTIMIZER_MAX_POWER): vol.All(
+            vol.Coerce(float), vol.Range(min=0.1)
+        ),
+        vol.Optional(ATTR_APPLY, default=False): cv.boolean,
+    }
+)
+CLEAR_SCHEDULE_SCHEMA = vol.Schema({vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string})
+
+
+@callback  # type: ignore[misc]
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the Powervault services."""
+
+    @callback  # type: ignore[misc]
+    def _async_get_entries(call: ServiceCall) -> list[ConfigEntry]:
+        """Return the loaded entries a service call is for."""
+        entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+        entries = [
+            entry
+            for entry in hass.config_entries.async_entries(DOMAIN)
+            if entry.entry_id in hass.data.get(DOMAIN, {})
+            and entry_id in (None, entry.entry_id)
+        ]
+        if not entries:
+            raise HomeAssistantError("No loaded Powervault units found")
+        return entries
+
+    async def _async_backfill(call: ServiceCall) -> None:
+        """Backfill the energy statistics of one unit, or all of them."""
+        if "recorder" not in hass.config.components:
+            raise HomeAssistantError("The recorder is needed to backfill statistics")
+
+        entries = _async_get_entries(call)
+
+        runtime_data: list[PowervaultRuntimeData] = [
+            hass.data[DOMAIN][entry.entry_id] for entry in entries
+        ]
+        try:
+            imported = await asyncio.gather(
+                *(
+                    async_backfill(hass, data[POWERVAULT_MANAGER], entry.title)
+                    for entry, data in zip(entries, runtime_data)
+                )
+            )
+        except PowervaultError as err:
+            raise HomeAssistantError(f"Unable to backfill statistics: {err}") from err
+        _LOGGER.debug("Backfilled %s hours of statistics", sum(imported))
+
+    @callback  # type: ignore[misc]
+    def _async_set_trace(call: ServiceCall) -> None:
+        """Change what is traced for one unit, or all of them."""
+        for entry in _async_get_entries(call):
+            runtime_data: PowervaultRuntimeData = hass.data[DOMAIN][entry.entry_id]
+            runtime_data[POWERVAULT_MANAGER].trace.set_mode(call.data[ATTR_MODE])
+
+    async def _async_plan_schedule(call: ServiceCall) -> None:
+        """Plan when to charge and discharge one unit, or all of them."""
+        settings = OptimizerSettings(
+            import_tariff=sorted(
+                (period[ATTR_START], period[ATTR_PRICE])
+                for period in call.data[ATTR_IMPORT_TARIFF]
+            ),
+            export_price=call.data[ATTR_EXPORT_PRICE],
+            capacity=call.data[ATTR_CAPACITY],
+            max_power=call.data[ATTR_MAX_POWER],
+            apply=call.data[ATTR_APPLY],
+        )
+        runtime_data: list[PowervaultRuntimeData] = [
+            hass.data[DOMAIN][entry.entry_id] for entry in _async_get_entries(call)
+        ]
+        await asyncio.gather(
+            *(
+                data[POWERVAULT_OPTIMIZER].async_set_settings(settings)
+                for data in runtime_data
+            )
+        )
+
+    async def _async_clear_schedule(call: ServiceCall) -> None:
+        """Stop planning for one unit, or all of them."""
+        runtime_data: list[PowervaultRuntimeData] = [
+            hass.data[DOMAIN][entry.entry_id] for entry in _async_get_entries(call)
+        ]
+        await asyncio.gather(
+            *(
+                data[POWERVAULT_OPTIMIZER].async_set_settings(None)
+                for data in runtime_data
+            )
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BACKFILL, _async_backfill, schema=BACKFILL_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_TRACE, _async_set_trace, schema=SET_TRACE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PLAN_SCHEDULE,
+        _async_plan_schedule,
+        schema=PLAN_SCHEDULE_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CLEAR_SCHEDULE,
+        _async_clear_schedule,
+        schema=CLEAR_SCHEDULE_SCHEMA,
+    )
@@ -0,0 +1,86 @@
+"""Persistent storage for the Powervault integration."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import asdict, fields
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .models import PowervaultBaseInfo, PowervaultData
+
+# Minor versions only add keys, so older data can be loaded as it is
+STORAGE_VERSION = 1
+STORAGE_MINOR_VERSION = 5
+# Saves are delayed, so that a save isn't made after every single refresh
+SAVE_DELAY = 60
+
+
+def _storage_key(entry_id: str) -> str:
+    """Return the storage key for a config entry."""
+    return f"{DOMAIN}.{entry_id}"
+
+
+class PowervaultStore:
+    """Stores the state of a unit, so it survives a restart."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Init the store."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass,
+            STORAGE_VERSION,
+            _storage_key(entry_id),
+            minor_version=STORAGE_MINOR_VERSION,
+        )
+
+    async def async_load(self) -> dict[str, Any]:
+        """Load the stored state."""
+        return await self._store.async_load() or {}
+
+    @callback  # type: ignore[misc]
+    def async_schedule_save(self, data_func: Callable[[], dict[str, Any]]) -> None:
+        """Save the state returned by data_func, after a delay."""
+        self._store.async_delay_save(data_func, SAVE_DELAY)
+
+    async def async_save(self, data: dict[str, Any]) -> None:
+        """Save the state now, replacing any delayed save."""
+        await self._store.async_save(data)
+
+
+async def async_remove_store(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the stored state of a config entry."""
+    await Store(hass, STORAGE_VERSION, _storage_key(entry_id)).async_remove()
+
+
+def base_info_to_dict(base_info: PowervaultBaseInfo) -> dict[str, Any]:
+    """Return the base info in a form that can be stored."""
+    return asdict(base_info)
+
+
+def base_info_from_dict(stored: dict[str, Any]) -> PowervaultBaseInfo:
+    """Restore the base info from a stored dict."""
+    return PowervaultBaseInfo(**stored)
+
+
+def data_to_dict(data: PowervaultData) -> dict[str, Any]:
+    """Return the point in time data in a form that can be stored."""
+    stored = {field.name: getattr(data, field.name) for field in fields(data)}
+    stored["time"] = data.time.isoformat() if data.time else None
+    stored["missing"] = sorted(data.missing)
+    return stored
+
+
+def data_from_dict(stored: dict[str, Any]) -> PowervaultData:
+    """Restore the point in time data from a stored dict, ignoring removed fields."""
+    names = {field.name for field in fields(PowervaultData)}
+    return PowervaultData(
+        **{
+            **{key: value for key, value in stored.items() if key in names},
+            "time": dt_util.parse_datetime(stored["time"]) if stored["time"] else None,
+            "missing": frozenset(stored["missing"]),
+        }
+    )
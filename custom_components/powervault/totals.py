@@ -0,0 +1,165 @@
+"""Incremental daily energy totals for the Powervault integration."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date, datetime
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_BUCKET_MINUTES, ENERGY_TOTAL_ATTRIBUTES
+
+BUCKET_SECONDS = DATA_BUCKET_MINUTES * 60
+BUCKET_HOURS = DATA_BUCKET_MINUTES / 60
+
+
+def row_time(row: dict) -> datetime | None:
+    """Return the UTC time of a data row, or None if it can't be parsed.
+
+    The API has returned both epoch timestamps (seconds or milliseconds) and
+    ISO formatted strings, so accept either.
+    """
+    value = row.get("time")
+    if isinstance(value, (int, float)):
+        # Anything this large must be in milliseconds
+        if value > 1e11:
+            value /= 1000
+        return dt_util.utc_from_timestamp(value)  # type: ignore[no-any-return]
+    if isinstance(value, str):
+        if (parsed := dt_util.parse_datetime(value)) is None:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=dt_util.UTC)
+        return dt_util.as_utc(parsed)  # type: ignore[no-any-return]
+    return None
+
+
+def bucket_kwh(value: float | None) -> float:
+    """Convert a W reading to kWh over a single bucket.
+
+    This isn't rounded, so that rounding errors don't build up over the day.
+    """
+    if not value:
+        return 0
+    return value / 1000 * BUCKET_HOURS
+
+
+class PowervaultTotalsAccumulator:
+    """Running kWh totals for the current local day, keyed by bucket.
+
+    Rows are folded in as they arrive from the cheap "current" fetch. A row for
+    a bucket that has already been seen replaces that bucket's contribution,
+    so repeated polls within the same 5 minutes don't double count.
+    """
+
+    def __init__(self) -> None:
+        """Init the accumulator."""
+        self.day: date | None = None
+        self.totals: dict[str, float] = {}
+        self._buckets: dict[int, dict[str, float]] = {}
+        self._last_bucket: int | None = None
+
+    def needs_full_fetch(self, now: datetime) -> bool:
+        """Return True if the whole day has to be fetched and summed again."""
+        return self.day != dt_util.as_local(now).date()  # type: ignore[no-any-return]
+
+    def load_day(self, rows: Iterable[dict], now: datetime) -> None:
+        """Replace the accumulated totals with the full set of rows for today."""
+        self.start_day(now)
+        for row in rows:
+            self.add_row(row)
+
+    def start_day(self, now: datetime) -> None:
+        """Clear the accumulated totals, ready to add each of today's rows."""
+        self.day = dt_util.as_local(now).date()
+        self.totals = {}
+        self._buckets = {}
+        self._last_bucket = None
+
+    def add_row(self, row: dict) -> None:
+        """Add a row for today, e.g. as they're streamed from the API."""
+        if (when := row_time(row)) is None:
+            return
+        if dt_util.as_local(when).date() != self.day:
+            return
+        self._fold_row(row, when)
+
+    def fold(self, rows: Iterable[dict]) -> bool:
+        """Fold new or changed rows into the totals.
+
+        Returns False if the rows can't be folded in because a bucket was
+        missed or the day has rolled over, in which case the caller needs to
+        fetch the whole day and call load_day.
+        """
+        for row in rows:
+            if (when := row_time(row)) is None:
+                return False
+            row_day = dt_util.as_local(when).date()
+            if self.day is None or row_day > self.day:
+                return False
+            if row_day < self.day:
+                continue
+            bucket = int(when.timestamp()) // BUCKET_SECONDS
+            if self._last_bucket is not None and bucket > self._last_bucket + 1:
+                return False
+            self._fold_row(row, when)
+        return True
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the accumulated buckets in a compact form that can be stored."""
+        return {
+            "day": self.day.isoformat() if self.day else None,
+            "attributes": ENERGY_TOTAL_ATTRIBUTES,
+            "buckets": {
+                str(bucket): [
+                    contribution.get(attribute) for attribute in ENERGY_TOTAL_ATTRIBUTES
+                ]
+                for bucket, contribution in self._buckets.items()
+            },
+        }
+
+    def restore(self, stored: dict[str, Any]) -> None:
+        """Restore the accumulated buckets from a stored dict."""
+        if not stored.get("day"):
+            return
+        self.day = date.fromisoformat(stored["day"])
+        self.totals = {}
+        self._buckets = {}
+        self._last_bucket = None
+        attributes = stored["attributes"]
+        for bucket, values in sorted(
+            (int(bucket), values) for bucket, values in stored["buckets"].items()
+        ):
+            contribution = {
+                attribute: value
+                for attribute, value in zip(attributes, values)
+                if value is not None
+            }
+            for attribute, value in contribution.items():
+                self.totals[attribute] = self.totals.get(attribute, 0) + value
+            self._buckets[bucket] = contribution
+            self._last_bucket = bucket
+
+    def _fold_row(self, row: dict, when: datetime) -> None:
+        """Add a single row's contribution, replacing any earlier one."""
+        # Rows without a battery reading are incomplete, so don't count them
+        if row.get("instant_battery") is None:
+            return
+
+        bucket = int(when.timestamp()) // BUCKET_SECONDS
+        previous = self._buckets.get(bucket, {})
+        contribution: dict[str, float] = {}
+        for attribute in ENERGY_TOTAL_ATTRIBUTES:
+            if attribute not in row:
+                continue
+            contribution[attribute] = bucket_kwh(row[attribute])
+            self.totals[attribute] = (
+                self.totals.get(attribute, 0)
+                - previous.get(attribute, 0)
+                + contribution[attribute]
+            )
+
+        self._buckets[bucket] = contribution
+        if self._last_bucket is None or bucket > self._last_bucket:
+            self._last_bucket = bucket
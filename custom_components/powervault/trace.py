@@ -0,0 +1,50 @@
+"""Trace of the data received by the Powervault integration."""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import TRACE_FULL, TRACE_OFF, TRACE_SIZE
+
+
+class PowervaultTrace:
+    """The most recent refreshes, for downloading with the diagnostics.
+
+    Tracing is off by default, and callers check enabled before working out
+    what to record, so it costs nothing on a normal refresh. Entries are only
+    turned into text when the diagnostics are downloaded. In full mode the
+    payloads themselves are kept too, by reference, so the data must not be
+    modified once it has been recorded.
+    """
+
+    def __init__(self, mode: str = TRACE_OFF, size: int = TRACE_SIZE) -> None:
+        """Init the trace."""
+        self.mode = mode
+        self._entries: deque[dict[str, Any]] = deque(maxlen=size)
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if anything is being recorded."""
+        return self.mode != TRACE_OFF
+
+    def set_mode(self, mode: str) -> None:
+        """Change what is recorded, clearing the trace if it's turned off."""
+        self.mode = mode
+        if mode == TRACE_OFF:
+            self._entries.clear()
+
+    def record(self, event: str, payload: Any = None, **summary: Any) -> None:
+        """Record an event with a summary, and the payload in full mode."""
+        if not self.enabled:
+            return
+        entry = {"time": dt_util.utcnow(), "event": event, **summary}
+        if self.mode == TRACE_FULL and payload is not None:
+            entry["payload"] = payload
+        self._entries.append(entry)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the trace for diagnostics."""
+        return {"mode": self.mode, "entries": list(self._entries)}
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Compare the batch energy integration with the old per-row get_kwh loop.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_energy --days 31
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.powervault import energy
+from custom_components.powervault.const import ENERGY_TOTAL_ATTRIBUTES
+from custom_components.powervault.energy import (
+    GROUP_DAY,
+    GROUP_HOUR,
+    integrate,
+    to_columns,
+)
+from custom_components.powervault.totals import BUCKET_SECONDS
+
+
+def _legacy_get_kwh(data: list[dict[str, Any]]) -> dict[str, float]:
+    """The original get_kwh, rounding every row."""
+    totals: dict[str, float] = {}
+    for row in data:
+        for attribute in ENERGY_TOTAL_ATTRIBUTES:
+            if attribute in row:
+                if attribute not in totals or not totals[attribute]:
+                    totals[attribute] = 0
+                value = row[attribute]
+                totals[attribute] += round(value / 1000 * (5 / 60), 2) if value else 0
+    return totals
+
+
+def _synthetic_rows(days: int, gap_rate: float) -> list[dict[str, Any]]:
+    """Return days of 5 minute rows, with some buckets missing."""
+    rng = random.Random(1)
+    start = int(dt_util.start_of_local_day().timestamp()) - days * 86400
+    rows = []
+    for bucket in range(days * 86400 // BUCKET_SECONDS):
+        if rng.random() < gap_rate:
+            continue
+        row: dict[str, Any] = {
+            "time": (start + bucket * BUCKET_SECONDS) * 1000,
+            "instant_battery": rng.uniform(-3000, 3000),
+        }
+        for attribute in ENERGY_TOTAL_ATTRIBUTES:
+            row[attribute] = rng.uniform(0, 3_000_000)
+        rows.append(row)
+    return rows
+
+
+def _time(func: Callable[[], Any], rounds: int) -> float:
+    """Return the best time of a number of rounds, in ms."""
+    best = math.inf
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--gap-rate", type=float, default=0.01)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _synthetic_rows(args.days, args.gap_rate)
+    columns = to_columns(rows)
+    print(  # noqa: T201
+        f"{len(rows)} rows over {args.days} days, numpy: {energy.HAS_NUMPY}"
+    )
+
+    timings = {
+        "legacy get_kwh": lambda: _legacy_get_kwh(rows),
+        "to_columns": lambda: to_columns(rows),
+        "integrate total": lambda: integrate(columns),
+        "integrate per day": lambda: integrate(columns, GROUP_DAY),
+        "integrate per hour": lambda: integrate(columns, GROUP_HOUR),
+    }
+    for name, func in timings.items():
+        print(f"{name:>20}: {_time(func, args.rounds):8.2f} ms")  # noqa: T201
+
+    if energy.HAS_NUMPY:
+        energy.HAS_NUMPY = False
+        python_columns = to_columns(rows)
+        print(  # noqa: T201
+            f"{'python per hour':>20}: "
+            f"{_time(lambda: integrate(python_columns, GROUP_HOUR), args.rounds):8.2f} ms"
+        )
+        energy.HAS_NUMPY = True
+
+    # Compare both with an exact sum of the same readings
+    legacy = _legacy_get_kwh(rows)
+    batch = integrate(columns)[0]
+    attribute = ENERGY_TOTAL_ATTRIBUTES[0]
+    exact = math.fsum(row[attribute] for row in rows) / 1000 * (5 / 60)
+    print(f"missing buckets: {batch.missing}")  # noqa: T201
+    print(  # noqa: T201
+        f"{attribute} rounding error, legacy: {legacy[attribute] - exact:+.4f}"
+    )
+    print(  # noqa: T201
+        f"{attribute} rounding error, batch:  {batch.totals[attribute] - exact:+.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Measure what the metrics exporter costs per refresh and per scrape.
+
+Sets up a config entry per unit against the mock API with the metrics option
+on, then times rendering a unit after a refresh, building the body of a scrape
+after a refresh, and serving a scrape when nothing has changed. Run from the
+repository root with:
+
+    python -m tests.benchmarks.bench_exporter --units 20 --scrapes 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from functools import partial
+from typing import Any
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntry
+
+from custom_components.powervault.api import PowervaultApiClient
+from custom_components.powervault.const import (
+    CONF_METRICS,
+    DOMAIN,
+    POWERVAULT_COORDINATOR,
+    POWERVAULT_EXPORTER,
+    POWERVAULT_MANAGER,
+)
+from custom_components.powervault.exporter import PowervaultMetricsExporter
+from tests.benchmarks.bench_load import _async_start_hass
+from tests.benchmarks.stub_api import StubServer
+
+
+def _time_calls(rounds: int, call: Callable[[], Any]) -> list[float]:
+    """Call a function a number of times, returning how long each call took."""
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _report(name: str, durations: list[float]) -> None:
+    print(  # noqa: T201
+        f"{name + ':':24}median {statistics.median(durations) * 1e6:8.1f} us, "
+        f"max {max(durations) * 1e6:8.1f} us"
+    )
+
+
+async def _run(units: int, scrapes: int) -> None:
+    unit_ids = [f"unit-{index}" for index in range(units)]
+    server = StubServer(0.0, unit_ids)
+    client = partial(PowervaultApiClient, base_url=server.url)
+    with server, patch(
+        "custom_components.powervault.hub.PowervaultApiClient", client
+    ), tempfile.TemporaryDirectory() as config_dir:
+        hass = await _async_start_hass(config_dir)
+        # Register the exporter without its view, as there's no HTTP server
+        exporter = PowervaultMetricsExporter()
+        hass.data.setdefault(DOMAIN, {})[POWERVAULT_EXPORTER] = exporter
+        entries = [
+            ConfigEntry(
+                version=1,
+                minor_version=1,
+                domain=DOMAIN,
+                title=unit_id,
+                data={"api_key": "stub-key", "unit_id": unit_id},
+                source="user",
+                options={CONF_METRICS: True},
+            )
+            for unit_id in unit_ids
+        ]
+        await asyncio.gather(*map(hass.config_entries.async_add, entries))
+        await hass.async_block_till_done()
+
+        runtime_data = [hass.data[DOMAIN][entry.entry_id] for entry in entries]
+        # The first refreshes run in the background
+        await asyncio.gather(
+            *(data[POWERVAULT_COORDINATOR].async_refresh() for data in runtime_data)
+        )
+        manager = runtime_data[0][POWERVAULT_MANAGER]
+        refresh = partial(
+            manager.on_refresh, runtime_data[0][POWERVAULT_COORDINATOR].data
+        )
+        body = exporter.render()
+        lines = body.count(b"\n")
+        print(f"{units} units, {lines} lines, {len(body) / 1024:.0f} KiB")  # noqa: T201
+        _report("Render a unit", _time_calls(scrapes, refresh))
+
+        def _refresh_and_scrape() -> None:
+            refresh()
+            exporter.render()
+
+        _report("Scrape after a refresh", _time_calls(scrapes, _refresh_and_scrape))
+        _report("Scrape, unchanged", _time_calls(scrapes, exporter.render))
+
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_stop(force=True)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--units", type=int, default=20)
+    parser.add_argument("--scrapes", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.units, args.scrapes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Compare sequential and concurrent refreshes against a slow stub API.
+
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_fanout --latency 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+
+from custom_components.powervault import PowervaultDataManager
+from custom_components.powervault.api import PowervaultApiClient
+from tests.benchmarks.stub_api import StubServer
+
+
+async def _sequential_refresh(client: PowervaultApiClient, unit_id: str) -> None:
+    """Make the calls one after another, as the refresh used to.
+
+    The battery state is polled by its own coordinator, so isn't included.
+    """
+    await client.get_data(unit_id)
+    await client.get_data(unit_id, period="today")
+
+
+async def _run(latency: float, rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as config_dir, StubServer(latency) as server:
+        hass = HomeAssistant(config_dir)
+        session = aiohttp.ClientSession()
+        client = PowervaultApiClient(session, "stub-key", base_url=server.url)
+        unit_id = server.units[0]
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await _sequential_refresh(client, unit_id)
+        sequential = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            # A new manager each round so that every refresh fetches the whole day
+            manager = PowervaultDataManager(hass, client, unit_id)
+            await manager.async_update_data()
+        concurrent = (time.perf_counter() - start) / rounds
+
+        await session.close()
+        await hass.async_stop(force=True)
+
+    print(f"Per request latency: {latency * 1000:.0f} ms")  # noqa: T201
+    print(f"Sequential refresh:  {sequential * 1000:.0f} ms")  # noqa: T201
+    print(f"Concurrent refresh:  {concurrent * 1000:.0f} ms")  # noqa: T201
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(_run(args.latency, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
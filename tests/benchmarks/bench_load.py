@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""Load test the integration, with a number of units against the mock API.
+
+Sets up a config entry per unit in a minimal Home Assistant, refreshes them
+all together for a number of rounds, and reports the request rate, refresh
+latency, executor jobs and memory used. The refreshes aren't limited by the
+request budget unless --budget is given. Run from the repository root with:
+
+    python -m tests.benchmarks.bench_load --units 20 --latency 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntries, ConfigEntry, ConfigEntryState
+from homeassistant.core import CoreState, HomeAssistant
+from homeassistant.helpers import area_registry as ar
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers import issue_registry as ir
+from homeassistant.helpers.entity import async_setup as async_setup_entity
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.loader import async_setup as async_setup_loader
+
+from custom_components.powervault.api import PowervaultApiClient
+from custom_components.powervault.budget import RequestBudget
+from custom_components.powervault.const import DOMAIN, POWERVAULT_COORDINATOR
+from tests.benchmarks.stub_api import StubServer
+
+CUSTOM_COMPONENTS = Path(__file__).parents[2] / "custom_components"
+
+
+async def _async_start_hass(config_dir: str) -> HomeAssistant:
+    """Start just enough of Home Assistant to set up config entries."""
+    os.symlink(CUSTOM_COMPONENTS, os.path.join(config_dir, "custom_components"))
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    hass.config.set_time_zone("Europe/London")
+    async_setup_loader(hass)
+    async_setup_entity(hass)
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    await ir.async_load(hass)
+    hass.config_entries = ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    hass.state = CoreState.running
+    return hass
+
+
+def _count_executor_jobs(hass: HomeAssistant) -> Callable[[], int]:
+    """Count the jobs run in the executor, returning a function for the count."""
+    jobs = 0
+    run_in_executor = hass.loop.run_in_executor
+
+    def _counting(*args: Any) -> Any:
+        nonlocal jobs
+        jobs += 1
+        return run_in_executor(*args)
+
+    hass.loop.run_in_executor = _counting  # type: ignore[method-assign]
+    return lambda: jobs
+
+
+async def _async_refresh(coordinator: DataUpdateCoordinator[Any]) -> float:
+    """Refresh a unit, returning how long it took."""
+    start = time.perf_counter()
+    await coordinator.async_refresh()
+    return time.perf_counter() - start
+
+
+async def _run(args: argparse.Namespace) -> None:  # pylint: disable=too-many-locals
+    units = [f"unit-{index}" for index in range(args.units)]
+    server = StubServer(
+        args.latency,
+        units,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        gap_rate=args.gap_rate,
+        extra_fields=args.extra_fields,
+    )
+    client = partial(PowervaultApiClient, base_url=server.url)
+    tracemalloc.start()
+    # Without the budget, every request is let through straight away
+    budget = RequestBudget if args.budget else partial(RequestBudget, 1e9, 1e9)
+    with server, patch(
+        "custom_components.powervault.hub.PowervaultApiClient", client
+    ), patch(
+        "custom_components.powervault.hub.RequestBudget", budget
+    ), tempfile.TemporaryDirectory() as config_dir:
+        hass = await _async_start_hass(config_dir)
+        baseline = tracemalloc.get_traced_memory()[0]
+        executor_jobs = _count_executor_jobs(hass)
+
+        start = time.perf_counter()
+        entries = []
+        for index, unit_id in enumerate(units):
+            entry = ConfigEntry(
+                version=1,
+                minor_version=1,
+                domain=DOMAIN,
+                title=unit_id,
+                data={"api_key": f"key-{index % args.accounts}", "unit_id": unit_id},
+                source="user",
+            )
+            await hass.config_entries.async_add(entry)
+            entries.append(entry)
+        await hass.async_block_till_done()
+        setup = time.perf_counter() - start
+        setup_requests = server.request_count
+        memory = tracemalloc.get_traced_memory()[0] - baseline
+
+        # With errors, some units may not have been set up first time
+        coordinators = [
+            hass.data[DOMAIN][entry.entry_id][POWERVAULT_COORDINATOR]
+            for entry in entries
+            if entry.state is ConfigEntryState.LOADED
+        ]
+        requests = server.request_count
+        jobs = executor_jobs()
+        durations: list[float] = []
+        failures = 0
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            durations += await asyncio.gather(*map(_async_refresh, coordinators))
+            failures += sum(not c.last_update_success for c in coordinators)
+        elapsed = time.perf_counter() - start
+        requests = server.request_count - requests
+        jobs = executor_jobs() - jobs
+        _, peak = tracemalloc.get_traced_memory()
+
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_stop(force=True)
+    tracemalloc.stop()
+
+    refreshes = len(durations)
+    percentiles = statistics.quantiles(durations, n=100) if refreshes > 1 else []
+    results = {
+        "Units / accounts": f"{args.units} / {args.accounts}",
+        "Setup": f"{setup * 1000:.0f} ms, {setup_requests} requests, "
+        f"{len(coordinators)} units loaded",
+        "Refreshes": f"{refreshes} in {elapsed:.2f} s, {failures} failed",
+        "Requests": f"{requests / elapsed:.1f}/s, {requests / refreshes:.2f} per refresh",
+        "Refresh latency p50": f"{statistics.median(durations) * 1000:.1f} ms",
+        "Refresh latency p95": (
+            f"{percentiles[94] * 1000:.1f} ms" if percentiles else "n/a"
+        ),
+        "Executor jobs": f"{jobs}, {jobs / refreshes:.2f} per refresh",
+        "Memory": f"{memory / 1024:.0f} KiB, {memory / args.units / 1024:.0f} KiB "
+        f"per unit, peak {(peak - baseline) / 1024:.0f} KiB",
+    }
+    for name, value in results.items():
+        print(f"{name + ':':22}{value}")  # noqa: T201
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--units", type=int, default=10)
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--gap-rate", type=float, default=0.0)
+    parser.add_argument("--extra-fields", type=int, default=0)
+    parser.add_argument(
+        "--budget", action="store_true", help="Limit requests to the request budget"
+    )
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
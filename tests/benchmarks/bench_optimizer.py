@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Measure how long the charge schedule optimizer takes to plan a day.
+
+Plans against a day of generated demand and solar and a time of use tariff,
+with NumPy, and optionally without it. Run from the repository root with:
+
+    python -m tests.benchmarks.bench_optimizer --rounds 10 --python
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+import time
+from datetime import datetime
+from datetime import time as dt_time
+from datetime import timezone
+from unittest.mock import patch
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.powervault import optimizer
+from custom_components.powervault.optimizer import (
+    HORIZON_SLOTS,
+    OptimizerSettings,
+    optimize,
+)
+
+TARIFF = [
+    (dt_time(0, 0), 0.25),
+    (dt_time(0, 30), 0.07),
+    (dt_time(4, 30), 0.25),
+    (dt_time(16, 0), 0.40),
+    (dt_time(19, 0), 0.25),
+]
+
+
+def make_need(slots: int) -> list[float]:
+    """Return the kWh needed each slot, with solar to spare in the middle of the day."""
+    need = []
+    for slot in range(slots):
+        hour = slot / 12
+        demand = 0.03 + 0.04 * math.exp(-((hour - 18) ** 2) / 4)
+        solar = 0.15 * max(0.0, math.sin((hour - 6) / 12 * math.pi))
+        need.append(demand - solar)
+    return need
+
+
+def _time_plans(rounds: int, need: list[float], start: datetime) -> list[float]:
+    """Plan a number of times, returning how long each took."""
+    settings = OptimizerSettings(TARIFF, export_price=0.15)
+    durations = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        schedule = optimize(settings, 50, need, start)
+        durations.append(time.perf_counter() - started)
+    print(  # noqa: T201
+        f"{schedule.candidates} candidates, {len(need)} slots, "
+        f"saving {schedule.baseline_cost - schedule.cost:.2f} with "
+        f"{[(w['state'], w['start'].strftime('%H:%M')) for w in schedule.windows()]}"
+    )
+    return durations
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--python", action="store_true", help="Also plan without NumPy")
+    args = parser.parse_args()
+
+    dt_util.set_default_time_zone(dt_util.get_time_zone("Europe/London"))
+    start = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    need = make_need(HORIZON_SLOTS)
+
+    modes = [("NumPy", True)] + ([("Python", False)] if args.python else [])
+    for name, has_numpy in modes:
+        if has_numpy and not optimizer.HAS_NUMPY:
+            print("NumPy isn't installed")  # noqa: T201
+            continue
+        with patch.object(optimizer, "HAS_NUMPY", has_numpy):
+            durations = _time_plans(args.rounds if has_numpy else 1, need, start)
+        print(  # noqa: T201
+            f"{name + ':':8}median {statistics.median(durations) * 1000:.0f} ms, "
+            f"max {max(durations) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""Measure how long config entries take to set up against a slow mock API.
+
+Each unit is set up three times: as a new entry, after a restart with recent
+stored data, and after a restart where the stored data is too old to use.
+Run from the repository root with:
+
+    python -m tests.benchmarks.bench_startup --units 5 --latency 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from functools import partial
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from custom_components.powervault.api import PowervaultApiClient
+from custom_components.powervault.const import CONF_STALE_AFTER, DOMAIN
+from tests.benchmarks.bench_load import _async_start_hass
+from tests.benchmarks.stub_api import StubServer
+
+
+async def _async_setup_all(
+    hass: HomeAssistant, server: StubServer, entries: list[ConfigEntry]
+) -> tuple[float, int]:
+    """Set up the entries, returning how long it took and the requests made."""
+    requests = server.request_count
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(hass.config_entries.async_setup(entry.entry_id) for entry in entries)
+    )
+    return time.perf_counter() - start, server.request_count - requests
+
+
+async def _async_unload_all(hass: HomeAssistant, entries: list[ConfigEntry]) -> None:
+    """Unload the entries, once their background refreshes have finished."""
+    await hass.async_block_till_done()
+    for entry in entries:
+        await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def _run(units: int, latency: float) -> None:
+    unit_ids = [f"unit-{index}" for index in range(units)]
+    server = StubServer(latency, unit_ids)
+    client = partial(PowervaultApiClient, base_url=server.url)
+    results = {}
+    with server, patch(
+        "custom_components.powervault.hub.PowervaultApiClient", client
+    ), tempfile.TemporaryDirectory() as config_dir:
+        hass = await _async_start_hass(config_dir)
+        entries = [
+            ConfigEntry(
+                version=1,
+                minor_version=1,
+                domain=DOMAIN,
+                title=unit_id,
+                data={"api_key": "stub-key", "unit_id": unit_id},
+                source="user",
+            )
+            for unit_id in unit_ids
+        ]
+        # Adding an entry sets it up too
+        requests = server.request_count
+        start = time.perf_counter()
+        await asyncio.gather(*map(hass.config_entries.async_add, entries))
+        results["New entries"] = (
+            time.perf_counter() - start,
+            server.request_count - requests,
+        )
+
+        await _async_unload_all(hass, entries)
+        results["Restart"] = await _async_setup_all(hass, server, entries)
+
+        await _async_unload_all(hass, entries)
+        for entry in entries:
+            # Every stored value is too old to use
+            hass.config_entries.async_update_entry(entry, options={CONF_STALE_AFTER: 0})
+        results["Restart, old data"] = await _async_setup_all(hass, server, entries)
+
+        await _async_unload_all(hass, entries)
+        await hass.async_stop(force=True)
+
+    print(f"{units} units, {latency * 1000:.0f} ms per request")  # noqa: T201
+    for name, (seconds, requests) in results.items():
+        print(  # noqa: T201
+            f"{name + ':':20}{seconds * 1000:7.0f} ms, "
+            f"{requests} requests before setup finished"
+        )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--units", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(_run(args.units, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Mock Powervault API server for benchmarks.
+
+It serves the endpoints the integration uses, with generated data that is
+the same for every request in the same 5 minute bucket, like the real API.
+Latency, errors, blank values and the size of each row can be configured,
+and battery state overrides that are posted are returned by later requests.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+POWER_KEYS = [
+    "instant_battery",
+    "instant_demand",
+    "instant_grid",
+    "instant_solar",
+    "batteryInputFromGrid",
+    "batteryInputFromSolar",
+    "batteryOutputConsumedByHome",
+    "batteryOutputExported",
+    "homeConsumed",
+    "gridConsumedByHome",
+    "solarConsumedByHome",
+    "solarExported",
+    "solarGenerated",
+    "solarConsumption",
+]
+
+PERIODS = [
+    "today",
+    "yesterday",
+    "past-hour",
+    "last-hour",
+    "past-day",
+    "last-day",
+    "past-week",
+    "last-week",
+    "past-month",
+    "last-month",
+]
+
+
+def make_row(when: datetime, extra_fields: int = 0, blank: bool = False) -> dict:
+    """Return a data row for the given time.
+
+    A blank row has None for every reading, as the API returns at the start
+    of each bucket.
+    """
+    seed = int(when.timestamp()) // 300
+    row: dict = {"time": int(when.timestamp()) * 1000, "instant_soc": seed % 100}
+    for index, key in enumerate(POWER_KEYS):
+        row[key] = None if blank else (seed * (index + 7)) % 3_000_000
+    for index in range(extra_fields):
+        row[f"extra{index}"] = seed * index
+    return row
+
+
+def period_range(  # pylint: disable=too-many-return-statements
+    period: str | None,
+) -> tuple[datetime, datetime]:
+    """Return the times of the first and last rows the API returns for a period."""
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    now -= timedelta(minutes=now.minute % 5)
+    today = now.replace(hour=0, minute=0)
+    if period is None:
+        return now, now
+    if period in ("past-hour", "last-hour"):
+        return now - timedelta(hours=1), now
+    if period in ("past-day", "last-day"):
+        return now - timedelta(days=1), now
+    if period == "yesterday":
+        return today - timedelta(days=1), today - timedelta(minutes=5)
+    if period in ("past-week", "last-week"):
+        return now - timedelta(days=7), now
+    if period == "past-month":
+        return now - timedelta(days=30), now
+    if period == "last-month":
+        end = today.replace(day=1) - timedelta(minutes=5)
+        return end.replace(day=1, hour=0, minute=0), end
+    return today, now
+
+
+def make_rows(
+    period: str | None, extra_fields: int = 0, gap_rate: float = 0.0, seed: int = 0
+) -> list[dict]:
+    """Return the rows the API would return for a period, oldest first.
+
+    Which rows are blank depends only on the seed and the time of the row,
+    so the same rows are blank every time a period is fetched.
+    """
+    start, end = period_range(period)
+    rows = []
+    while start <= end:
+        bucket = int(start.timestamp()) // 300
+        blank = gap_rate > 0 and random.Random(seed ^ bucket).random() < gap_rate
+        rows.append(make_row(start, extra_fields, blank))
+        start += timedelta(minutes=5)
+    return rows
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handle requests for the stub API."""
+
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Respond to a GET request."""
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")[1:]
+        query = parse_qs(url.query)
+        period = query.get("period", [None])[0]
+        endpoint = "/".join(
+            parts[:1] + ["{id}"] + parts[2:] if len(parts) > 1 else parts
+        )
+        if period is not None:
+            endpoint += f"?period={period}"
+        if self._delay_or_fail(f"GET {endpoint}"):
+            return
+
+        body: dict
+        if parts == ["customerAccount"]:
+            body = {"customerAccount": {"id": 1, "accountName": "Stub"}}
+        elif parts == ["unit"]:
+            body = {"units": [{"id": unit} for unit in self.server.units]}
+        elif len(parts) < 2 or parts[1] not in self.server.units:
+            self._send({"message": "Unit not found"}, 404)
+            return
+        elif len(parts) == 2:
+            body = {"unit": {"id": parts[1], "model": "P5", "epromId": "1"}}
+        elif parts[-1] == "data":
+            if period is not None and period not in PERIODS:
+                self._send({"message": "Invalid period"}, 400)
+                return
+            body = {"data": self.server.rows(period)}
+        elif parts[-1] == "schedule":
+            days = ["monday", "tuesday", "wednesday", "thursday"]
+            days += ["friday", "saturday", "sunday"]
+            event = {
+                "start": "00:00:00",
+                "end": "23:59:59",
+                "state": self.server.schedule_state,
+            }
+            body = {"schedule": {day: [event] for day in days}}
+        else:
+            with self.server.lock:
+                overrides = list(self.server.overrides.get(parts[1], []))
+            body = {"stateOverrides": overrides}
+        self._send(body)
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Respond to a POST request, remembering any state overrides."""
+        parts = urlparse(self.path).path.strip("/").split("/")[1:]
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self._delay_or_fail("POST unit/{id}/stateOverride"):
+            return
+        if len(parts) < 2 or parts[1] not in self.server.units:
+            self._send({"message": "Unit not found"}, 404)
+            return
+        with self.server.lock:
+            self.server.overrides[parts[1]] = payload.get("stateOverrides", [])
+        self._send({**payload, "message": "success"})
+
+    def _delay_or_fail(self, endpoint: str) -> bool:
+        """Count the request and wait, then send an error if one is due."""
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.requests_by_endpoint[endpoint] += 1
+            delay = server.latency + server.rng.uniform(0, server.jitter)
+            if fail := server.rng.random() < server.error_rate:
+                server.error_count += 1
+        time.sleep(delay)
+        if fail:
+            self._send({"message": "Service unavailable"}, 503)
+        return fail
+
+    def _send(self, body: dict, status: int = 200) -> None:
+        """Send a JSON response."""
+        content = json.dumps(body).encode()
+        with self.server.lock:
+            self.server.bytes_sent += len(content)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Don't log every request."""
+
+
+class StubServer(ThreadingHTTPServer):  # pylint: disable=too-many-instance-attributes
+    """Mock Powervault API server.
+
+    Each request waits for the latency plus a random jitter, and fails with a
+    503 at the error rate. The latest row is blank at the gap rate, as are
+    that fraction of the rows of each period. Every row has extra_fields more
+    fields than usual, to test larger payloads.
+    """
+
+    daemon_threads = True
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        latency: float = 0.0,
+        units: list[str] | None = None,
+        *,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        gap_rate: float = 0.0,
+        extra_fields: int = 0,
+        schedule_state: str = "normal",
+        seed: int = 0,
+    ) -> None:
+        """Start listening on a free local port."""
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.units = units or ["stub-unit"]
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.gap_rate = gap_rate
+        self.extra_fields = extra_fields
+        self.schedule_state = schedule_state
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.overrides: dict[str, list[dict]] = {}
+        self.request_count = 0
+        self.error_count = 0
+        self.bytes_sent = 0
+        self.requests_by_endpoint: Counter[str] = Counter()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the stub API."""
+        return f"http://127.0.0.1:{self.server_address[1]}/v4"
+
+    def rows(self, period: str | None) -> list[dict]:
+        """Return the rows for a period, or the latest row."""
+        if period is None:
+            with self.lock:
+                blank = self.rng.random() < self.gap_rate
+            start, _ = period_range(None)
+            return [make_row(start, self.extra_fields, blank)]
+        return make_rows(period, self.extra_fields, self.gap_rate, self.seed)
+
+    def __enter__(self) -> StubServer:
+        """Start serving in a background thread."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Stop serving."""
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""Tests for the request budget shared by an API key."""
+
+import asyncio
+import logging
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from custom_components.powervault.budget import (  # noqa: E402
+    PRIORITY_BACKGROUND,
+    PRIORITY_COMMAND,
+    PRIORITY_LIVE,
+    PRIORITY_TOTALS,
+    RequestBudget,
+)
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+NO_RESERVES = (0.0, 0.0, 0.0, 0.0)
+
+
+async def _acquire(budget: RequestBudget, priority: int, order: list[int]) -> None:
+    """Take a token, noting the priority once it's let through."""
+    await budget.acquire(priority)
+    order.append(priority)
+
+
+def test_waiters_go_by_priority() -> None:
+    """Once the budget runs out, waiting requests go highest priority first."""
+
+    async def _test() -> None:
+        budget = RequestBudget(rate=200, burst=1, reserves=NO_RESERVES)
+        await budget.acquire(PRIORITY_LIVE)
+        order: list[int] = []
+        tasks = []
+        for priority in (PRIORITY_BACKGROUND, PRIORITY_TOTALS, PRIORITY_LIVE):
+            tasks.append(asyncio.create_task(_acquire(budget, priority, order)))
+            await asyncio.sleep(0)
+        assert budget.waiting == [0, 1, 1, 1]
+
+        await asyncio.gather(*tasks)
+
+        assert order == [PRIORITY_LIVE, PRIORITY_TOTALS, PRIORITY_BACKGROUND]
+        assert budget.waiting == [0, 0, 0, 0]
+        assert budget.delayed == [0, 1, 1, 1]
+        assert budget.granted == [0, 2, 1, 1]
+
+    asyncio.run(_test())
+
+
+def test_commands_are_never_held_up() -> None:
+    """Commands take a token even when there are none left."""
+
+    async def _test() -> None:
+        budget = RequestBudget(rate=0.001, burst=1, reserves=NO_RESERVES)
+        for _ in range(3):
+            await asyncio.wait_for(budget.acquire(PRIORITY_COMMAND), 1)
+
+        assert budget.tokens == pytest.approx(-2, abs=0.01)
+        assert budget.delayed == [0, 0, 0, 0]
+
+    asyncio.run(_test())
+
+
+def test_reserves_hold_back_low_priorities() -> None:
+    """Lower priorities wait while the budget is down to their reserve."""
+
+    async def _test() -> None:
+        budget = RequestBudget(rate=0.001, burst=4, reserves=(0.0, 0.0, 0.25, 0.5))
+        await budget.acquire(PRIORITY_BACKGROUND)
+        await budget.acquire(PRIORITY_TOTALS)
+        background = asyncio.create_task(budget.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+
+        # Live requests go ahead of the waiting background one
+        await asyncio.wait_for(budget.acquire(PRIORITY_LIVE), 1)
+        assert not background.done()
+        background.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await background
+
+    asyncio.run(_test())
+
+
+def test_cancelled_waiter() -> None:
+    """A cancelled request stops waiting, and doesn't hold up the others."""
+
+    async def _test() -> None:
+        budget = RequestBudget(rate=100, burst=1, reserves=NO_RESERVES)
+        await budget.acquire(PRIORITY_LIVE)
+        order: list[int] = []
+        live = asyncio.create_task(_acquire(budget, PRIORITY_LIVE, order))
+        totals = asyncio.create_task(_acquire(budget, PRIORITY_TOTALS, order))
+        await asyncio.sleep(0)
+
+        live.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await live
+        assert budget.waiting == [0, 0, 1, 0]
+
+        await asyncio.wait_for(totals, 1)
+        assert order == [PRIORITY_TOTALS]
+        assert budget.waiting == [0, 0, 0, 0]
+        assert budget.granted == [0, 1, 1, 0]
+
+    asyncio.run(_test())
+
+
+def test_cancelled_as_it_was_let_through() -> None:
+    """A request cancelled just as it was let through gives its token back."""
+
+    async def _test() -> None:
+        budget = RequestBudget(rate=0.001, burst=1, reserves=NO_RESERVES)
+        await budget.acquire(PRIORITY_LIVE)
+        waiter = asyncio.create_task(budget.acquire(PRIORITY_LIVE))
+        await asyncio.sleep(0)
+
+        # Let it through, and cancel it before it gets to run
+        budget.tokens += 1
+        budget._wake()  # pylint: disable=protected-access
+        assert budget.tokens == pytest.approx(0, abs=0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert budget.tokens == pytest.approx(1, abs=0.01)
+        assert budget.waiting == [0, 0, 0, 0]
+
+    asyncio.run(_test())
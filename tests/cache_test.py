@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Tests for the last known good values."""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault.cache import PowervaultValueCache  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+NOW = datetime(2024, 1, 15, 12, tzinfo=dt_util.UTC)
+
+
+def test_values_are_as_old_as_their_row() -> None:
+    """A value from an old row doesn't fill a gap just because it arrived now."""
+    cache = PowervaultValueCache(timedelta(minutes=15))
+    cache.update(
+        [
+            {"time": (NOW - timedelta(minutes=30)).isoformat(), "instant_soc": 50},
+            {"time": (NOW - timedelta(minutes=10)).isoformat(), "instant_grid": 300},
+        ],
+        NOW,
+    )
+    row: dict[str, Any] = {
+        "time": NOW.isoformat(),
+        "instant_soc": None,
+        "instant_grid": None,
+    }
+
+    assert cache.fill(row, NOW) == {"instant_soc"}
+    assert row["instant_grid"] == 300
+
+
+def test_newer_values_are_kept() -> None:
+    """A row older than the cached value doesn't replace it."""
+    cache = PowervaultValueCache(timedelta(minutes=15))
+    cache.update(
+        [
+            {"time": (NOW - timedelta(minutes=5)).isoformat(), "instant_soc": 60},
+            {"time": (NOW - timedelta(minutes=10)).isoformat(), "instant_soc": 50},
+        ],
+        NOW,
+    )
+    row: dict[str, Any] = {"time": NOW.isoformat(), "instant_soc": None}
+
+    assert not cache.fill(row, NOW)
+    assert row["instant_soc"] == 60
+
+
+def test_rows_without_a_time_are_received_now() -> None:
+    """A row with no time is treated as received when it's seen."""
+    cache = PowervaultValueCache(timedelta(minutes=15))
+    cache.update([{"instant_soc": 50}], NOW - timedelta(minutes=20))
+    cache.update([{"instant_grid": 300}], NOW)
+    row: dict[str, Any] = {"instant_soc": None, "instant_grid": None}
+
+    assert cache.fill(row, NOW) == {"instant_soc"}
+    assert row["instant_grid"] == 300
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Tests for sending battery state changes."""
+
+import asyncio
+import logging
+from collections.abc import Callable, Coroutine
+from datetime import datetime
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault import commands  # noqa: E402
+from custom_components.powervault.api import RequestError  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+
+class _Debounce:
+    """Stands in for async_call_later, firing the debounce when told to."""
+
+    def __init__(self) -> None:
+        """Init with nothing scheduled."""
+        self.action: Callable[[datetime], None] | None = None
+
+    def __call__(
+        self, _hass: object, _delay: float, action: Callable[[datetime], None]
+    ) -> Callable[[], None]:
+        """Schedule the action, returning a callback that cancels it."""
+        self.action = action
+
+        def _cancel() -> None:
+            self.action = None
+
+        return _cancel
+
+    async def fire(self, queue: commands.PowervaultCommandQueue) -> None:
+        """Fire the scheduled action, and wait for the send to finish."""
+        assert self.action is not None
+        action, self.action = self.action, None
+        action(dt_util.utcnow())
+        while queue.as_dict()["sending"]:
+            await asyncio.sleep(0)
+
+
+def _queue(polled: str) -> commands.PowervaultCommandQueue:
+    """Return a queue for a unit whose battery state is polled as given."""
+    hass = MagicMock()
+    hass.async_create_background_task.side_effect = (
+        lambda target, _name: asyncio.get_running_loop().create_task(target)
+    )
+    manager = MagicMock(unit_id="unit")
+    manager.client.set_battery_state = AsyncMock(return_value=True)
+    coordinator = MagicMock(data=polled, last_update_success=True)
+    coordinator.async_refresh = AsyncMock()
+    return commands.PowervaultCommandQueue(hass, manager, coordinator, MagicMock())
+
+
+def _run(test: Callable[[_Debounce], Coroutine[Any, Any, None]]) -> None:
+    """Run a test without waiting for real delays."""
+    debounce = _Debounce()
+    with patch.object(commands, "async_call_later", debounce), patch.object(
+        commands, "COMMAND_CONFIRM_DELAYS", (0, 0, 0)
+    ), patch.object(commands, "COMMAND_RETRY_DELAY", 0):
+        asyncio.run(test(debounce))
+
+
+def test_selections_are_debounced_and_coalesced() -> None:
+    """Only the latest of several quick selections is sent, once they settle."""
+
+    async def _test(debounce: _Debounce) -> None:
+        queue = _queue("force-discharge")
+        for battery_state in ("force-charge", "normal", "force-discharge"):
+            queue.async_request(battery_state)
+        assert queue.target == "force-discharge"
+        queue.manager.client.set_battery_state.assert_not_called()
+
+        await debounce.fire(queue)
+
+        queue.manager.client.set_battery_state.assert_awaited_once_with(
+            "unit", "force-discharge"
+        )
+        assert queue.metrics.requested == 3
+        assert queue.metrics.coalesced == 2
+        assert queue.metrics.sent == 1
+
+    _run(_test)
+
+
+def test_change_is_confirmed() -> None:
+    """A sent change is confirmed by polling the battery state."""
+
+    async def _test(debounce: _Debounce) -> None:
+        queue = _queue("force-charge")
+        queue.async_request("force-charge")
+        await debounce.fire(queue)
+
+        assert queue.metrics.confirmed == 1
+        assert queue.coordinator.async_refresh.await_count == 1
+        queue.hub.async_boost.assert_called_once()
+        assert queue.target is None
+
+    _run(_test)
+
+
+def test_change_is_unconfirmed() -> None:
+    """A change that never shows up is polled for a few times, then given up on."""
+
+    async def _test(debounce: _Debounce) -> None:
+        queue = _queue("normal")
+        queue.async_request("force-charge")
+        await debounce.fire(queue)
+
+        assert queue.metrics.unconfirmed == 1
+        assert queue.coordinator.async_refresh.await_count == 3
+        queue.hub.async_boost.assert_not_called()
+        assert queue.target is None
+        queue.coordinator.async_update_listeners.assert_called_once()
+
+    _run(_test)
+
+
+def test_rejected_change_is_not_retried() -> None:
+    """A change the API rejects fails straight away, showing the polled state."""
+
+    async def _test(debounce: _Debounce) -> None:
+        queue = _queue("normal")
+        queue.manager.client.set_battery_state.side_effect = RequestError("Rejected")
+        queue.async_request("force-charge")
+        await debounce.fire(queue)
+
+        assert queue.manager.client.set_battery_state.await_count == 1
+        assert queue.metrics.failures == 1
+        assert queue.metrics.last_error == "Rejected"
+        assert queue.target is None
+        queue.coordinator.async_update_listeners.assert_called_once()
+
+    _run(_test)
+
+
+def test_failed_change_is_retried() -> None:
+    """A change that isn't accepted is retried, and only counted once it's sent."""
+
+    async def _test(debounce: _Debounce) -> None:
+        queue = _queue("force-charge")
+        queue.manager.client.set_battery_state.side_effect = [False, False, True]
+        queue.async_request("force-charge")
+        await debounce.fire(queue)
+
+        assert queue.metrics.retries == 2
+        assert queue.metrics.sent == 1
+        assert queue.metrics.confirmed == 1
+
+    _run(_test)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""Tests for the batch energy integration."""
+
+import logging
+import random
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault import energy  # noqa: E402
+from custom_components.powervault.const import ENERGY_TOTAL_ATTRIBUTES  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+# The clocks in London went forward at 1am on the 31st, so that day was 23 hours
+LONDON = dt_util.get_time_zone("Europe/London")
+DAY_BEFORE = datetime(2024, 3, 30, tzinfo=LONDON)
+CLOCKS_CHANGE = datetime(2024, 3, 31, tzinfo=LONDON)
+DAY_AFTER = datetime(2024, 4, 1, tzinfo=LONDON)
+
+
+@contextmanager
+def _in_london() -> Iterator[None]:
+    """Use London as the local time zone."""
+    default = dt_util.DEFAULT_TIME_ZONE
+    dt_util.set_default_time_zone(LONDON)
+    try:
+        yield
+    finally:
+        dt_util.set_default_time_zone(default)
+
+
+def _rows(start: datetime, end: datetime, watts: float = 1000) -> list[dict]:
+    """Return rows with a steady reading every 5 minutes from start to end."""
+    rows = []
+    when = dt_util.as_utc(start)
+    while when < end:
+        rows.append(
+            {"time": when.isoformat(), "instant_battery": 0, "homeConsumed": watts}
+        )
+        when += timedelta(minutes=5)
+    return rows
+
+
+def _integrate(
+    rows: list[dict[str, Any]], use_numpy: bool, **kwargs: Any
+) -> list[energy.EnergyPeriod]:
+    """Integrate the rows in London time, with or without NumPy."""
+    with _in_london(), patch.object(energy, "HAS_NUMPY", use_numpy):
+        periods: list[energy.EnergyPeriod] = energy.integrate(
+            energy.to_columns(rows), **kwargs
+        )
+    return periods
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])  # type: ignore[misc]
+def test_days_follow_the_clocks(use_numpy: bool) -> None:
+    """The day the clocks go forward is 23 hours, and gaps in it are missing."""
+    if use_numpy and not energy.HAS_NUMPY:
+        pytest.skip("NumPy isn't installed")
+    rows = _rows(DAY_BEFORE, DAY_AFTER + timedelta(days=1))
+    # Two buckets after the clocks have changed have no rows
+    gap = dt_util.as_utc(CLOCKS_CHANGE + timedelta(hours=2))
+    rows = [
+        row
+        for row in rows
+        if not gap <= datetime.fromisoformat(row["time"]) < gap + timedelta(minutes=10)
+    ]
+
+    periods = _integrate(
+        rows,
+        use_numpy,
+        group=energy.GROUP_DAY,
+        start=DAY_BEFORE,
+        end=DAY_AFTER + timedelta(days=1),
+    )
+
+    assert [period.start for period in periods] == [
+        DAY_BEFORE,
+        CLOCKS_CHANGE,
+        DAY_AFTER,
+    ]
+    assert [period.buckets for period in periods] == [288, 274, 288]
+    assert [period.missing for period in periods] == [0, 2, 0]
+    assert [period.totals["homeConsumed"] for period in periods] == pytest.approx(
+        [24, 274 / 12, 24]
+    )
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])  # type: ignore[misc]
+def test_hours_skip_the_missing_hour(use_numpy: bool) -> None:
+    """There's no 1am on the day the clocks go forward."""
+    if use_numpy and not energy.HAS_NUMPY:
+        pytest.skip("NumPy isn't installed")
+    rows = _rows(CLOCKS_CHANGE, DAY_AFTER)
+
+    periods = _integrate(
+        rows, use_numpy, group=energy.GROUP_HOUR, start=CLOCKS_CHANGE, end=DAY_AFTER
+    )
+
+    assert len(periods) == 23
+    assert [period.start.hour for period in periods[:3]] == [0, 2, 3]
+    assert periods[0].end == periods[1].start
+    assert dt_util.as_utc(periods[1].start) - dt_util.as_utc(
+        periods[0].start
+    ) == timedelta(hours=1)
+    assert all(period.buckets == 12 and not period.missing for period in periods)
+    assert all(period.totals["homeConsumed"] == pytest.approx(1) for period in periods)
+
+
+@pytest.mark.parametrize(  # type: ignore[misc]
+    "group", [None, energy.GROUP_HOUR, energy.GROUP_DAY]
+)
+def test_numpy_and_python_agree(group: str | None) -> None:
+    """Both ways of summing give the same periods, with gaps and None readings."""
+    if not energy.HAS_NUMPY:
+        pytest.skip("NumPy isn't installed")
+    generator = random.Random(4)
+    rows = []
+    for row in _rows(DAY_BEFORE + timedelta(hours=7), DAY_AFTER + timedelta(hours=5)):
+        if generator.random() < 0.1:
+            continue
+        for attribute in ENERGY_TOTAL_ATTRIBUTES:
+            row[attribute] = (
+                None if generator.random() < 0.05 else generator.uniform(0, 4000)
+            )
+        rows.append(row)
+
+    numpy_periods = _integrate(rows, True, group=group, ndigits=3)
+    python_periods = _integrate(rows, False, group=group, ndigits=3)
+
+    assert len(numpy_periods) == len(python_periods)
+    for numpy_period, python_period in zip(numpy_periods, python_periods):
+        assert numpy_period.start == python_period.start
+        assert numpy_period.end == python_period.end
+        assert numpy_period.buckets == python_period.buckets
+        assert numpy_period.missing == python_period.missing
+        assert numpy_period.totals == pytest.approx(python_period.totals, abs=0.001)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""Tests for rendering the OpenMetrics exposition."""
+
+import hashlib
+import logging
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault.api import PowervaultApiClient  # noqa: E402
+from custom_components.powervault.exporter import (  # noqa: E402
+    FAMILIES,
+    PowervaultMetricsExporter,
+)
+from custom_components.powervault.metrics import RefreshMetrics  # noqa: E402
+from custom_components.powervault.models import (  # noqa: E402
+    PowervaultBaseInfo,
+    PowervaultData,
+)
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+ACCOUNT = hashlib.sha256(b"key").hexdigest()[:8]
+# A unit id with every character that has to be escaped in a label
+AWKWARD_UNIT = 'a"b\\c\nd'
+
+
+def _data() -> PowervaultData:
+    """Return data with 2 kW for every reading."""
+    watts = 2_000_000.0
+    return PowervaultData(
+        charge=55,
+        batteryInputFromGrid=watts,
+        batteryInputFromSolar=watts,
+        batteryOutputConsumedByHome=watts,
+        batteryOutputExported=watts,
+        homeConsumed=watts,
+        gridConsumedByHome=watts,
+        solarConsumedByHome=watts,
+        solarExported=watts,
+        instant_battery=watts,
+        instant_demand=watts,
+        instant_grid=watts,
+        solarGenerated=watts,
+        solarConsumption=watts,
+        instant_solar=watts,
+        totals={"homeConsumed": 4500.0},
+        time=datetime(2024, 1, 15, 12, tzinfo=dt_util.UTC),
+        extra={"temperature": 21.5},
+    )
+
+
+def _manager(unit_id: str) -> MagicMock:
+    """Return a manager for a unit that has refreshed a few times."""
+    metrics = RefreshMetrics(refreshes=3, failures=1, rows=12)
+    for seconds in (0.02, 0.3, 4.0):
+        metrics.duration.observe(seconds)
+    return MagicMock(
+        unit_id=unit_id,
+        base_info=PowervaultBaseInfo(id=unit_id, model="S4", eprom_id="1.2"),
+        metrics=metrics,
+    )
+
+
+def _hub() -> MagicMock:
+    """Return a hub whose client has made a couple of requests."""
+    client = PowervaultApiClient(MagicMock(), "key")
+    client.metrics.record("data", 0.2, size=1000)
+    client.metrics.record("data", 0.5, error=True)
+    return MagicMock(api_key="key", client=client)
+
+
+def _families(body: bytes) -> dict[str, tuple[str, list[str]]]:
+    """Return the type and samples of each family in a scrape."""
+    families: dict[str, tuple[str, list[str]]] = {}
+    name = ""
+    for line in body.decode().splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            families[name] = (kind, [])
+        elif not line.startswith("#"):
+            families[name][1].append(line)
+    return families
+
+
+def test_render() -> None:
+    """A unit and its account are rendered as valid OpenMetrics."""
+    exporter = PowervaultMetricsExporter()
+    exporter.async_update_unit(_manager("unit"), _hub(), _data())
+
+    body = exporter.render()
+    families = _families(body)
+
+    assert body.endswith(b"\n# EOF\n")
+    assert list(families) == [name for name, _, _ in FAMILIES]
+    assert 'powervault_unit_info{unit="unit",model="S4",firmware="1.2"} 1' in (
+        families["powervault_unit"][1]
+    )
+    assert (
+        'powervault_power_watts{unit="unit",sensor="homeConsumed"} 2000'
+        in families["powervault_power_watts"][1]
+    )
+    assert (
+        'powervault_energy_today_kwh{unit="unit",sensor="totalhomeConsumed"} 4.5'
+        in families["powervault_energy_today_kwh"][1]
+    )
+    assert (
+        f'powervault_api_errors_total{{account="{ACCOUNT}",endpoint="data"}} 1'
+        in families["powervault_api_errors"][1]
+    )
+    for name, (kind, samples) in families.items():
+        if kind == "counter":
+            assert all(sample.startswith(f"{name}_total{{") for sample in samples)
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    """Each bucket counts everything up to its bound, and +Inf counts it all."""
+    exporter = PowervaultMetricsExporter()
+    exporter.async_update_unit(_manager("unit"), _hub(), None)
+
+    _, samples = _families(exporter.render())["powervault_refresh_duration_seconds"]
+    buckets = [sample for sample in samples if "_bucket{" in sample]
+    counts = [int(sample.rsplit(" ", 1)[1]) for sample in buckets]
+
+    assert counts == sorted(counts)
+    assert buckets[-1] == (
+        'powervault_refresh_duration_seconds_bucket{unit="unit",le="+Inf"} 3'
+    )
+    assert 'powervault_refresh_duration_seconds_count{unit="unit"} 3' in samples
+    assert any(
+        sample.startswith('powervault_refresh_duration_seconds_sum{unit="unit"} 4.32')
+        for sample in samples
+    )
+
+
+def test_labels_are_escaped() -> None:
+    """Quotes, backslashes and newlines in a label are escaped."""
+    exporter = PowervaultMetricsExporter()
+    exporter.async_update_unit(_manager(AWKWARD_UNIT), _hub(), None)
+
+    _, samples = _families(exporter.render())["powervault_refreshes"]
+
+    assert samples == ['powervault_refreshes_total{unit="a\\"b\\\\c\\nd"} 3']
+
+
+def test_account_goes_with_its_last_unit() -> None:
+    """The account is rendered until the last of its units is removed."""
+    exporter = PowervaultMetricsExporter()
+    hub = _hub()
+    exporter.async_update_unit(_manager("first"), hub, None)
+    exporter.async_update_unit(_manager("second"), hub, None)
+
+    exporter.async_remove_unit("first")
+    body = exporter.render().decode()
+    assert 'unit="first"' not in body
+    assert 'unit="second"' in body
+    assert f'account="{ACCOUNT}"' in body
+
+    exporter.async_remove_unit("second")
+    assert exporter.render() == b"# EOF\n"
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""Tests for polling all the units on an account together."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from datetime import datetime, timedelta
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault import hub  # noqa: E402
+from custom_components.powervault.const import (  # noqa: E402
+    BOOST_POLL_INTERVAL,
+    DOMAIN,
+    MAX_CONCURRENT_UNITS,
+    POLL_SETTLE_DELAY,
+    POWERVAULT_HUBS,
+    UPDATE_INTERVAL,
+)
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+
+class _Ticks:
+    """Stands in for async_call_later, keeping the tick that's scheduled."""
+
+    def __init__(self) -> None:
+        """Init with nothing scheduled."""
+        self.scheduled = 0
+        self.cancelled = 0
+        self.delay: float | None = None
+        self.action: Callable[[datetime], Awaitable[None]] | None = None
+
+    def __call__(
+        self,
+        _hass: object,
+        delay: timedelta,
+        action: Callable[[datetime], Awaitable[None]],
+    ) -> Callable[[], None]:
+        """Schedule the tick, returning a callback that cancels it."""
+        self.scheduled += 1
+        self.delay = delay.total_seconds()
+        self.action = action
+
+        def _cancel() -> None:
+            self.cancelled += 1
+            self.delay = self.action = None
+
+        return _cancel
+
+    async def fire(self) -> None:
+        """Run the scheduled tick."""
+        assert self.action is not None
+        await self.action(dt_util.utcnow())
+
+
+def _coordinator(row_time: datetime | None, success: bool = True) -> MagicMock:
+    """Return a coordinator that gets a new row from each refresh."""
+    coordinator = MagicMock(data=None, last_update_success=True)
+
+    async def _refresh() -> None:
+        coordinator.data = MagicMock(time=row_time)
+        coordinator.last_update_success = success
+
+    coordinator.async_refresh = AsyncMock(side_effect=_refresh)
+    return coordinator
+
+
+def _run(test: Callable[[Any, _Ticks], Coroutine[Any, Any, None]]) -> None:
+    """Run a test with a hub for an account, and the ticks it schedules."""
+    ticks = _Ticks()
+    hass = MagicMock(data={DOMAIN: {}})
+    with patch.object(hub, "async_call_later", ticks), patch.object(
+        hub, "async_get_clientsession"
+    ):
+
+        async def _test() -> None:
+            await test(hub.async_get_hub(hass, "key"), ticks)
+
+        asyncio.run(_test())
+
+
+def test_units_share_a_tick() -> None:
+    """All the units are refreshed on one tick, timed from the newest row."""
+
+    async def _test(account: Any, ticks: _Ticks) -> None:
+        row_time = dt_util.utcnow() - timedelta(minutes=1)
+        first = _coordinator(row_time - timedelta(minutes=5))
+        second = _coordinator(row_time)
+        account.async_add_unit("first", first)
+        account.async_add_unit("second", second)
+        assert ticks.scheduled == 1
+        assert ticks.delay == UPDATE_INTERVAL
+
+        await ticks.fire()
+
+        assert first.async_refresh.await_count == 1
+        assert second.async_refresh.await_count == 1
+        assert account.scheduler.polls == 1
+        assert account.scheduler.changed_polls == 1
+        assert account.scheduler.latest_row_time == row_time
+        assert ticks.scheduled == 2
+        assert ticks.delay == pytest.approx(240 + POLL_SETTLE_DELAY, abs=5)
+
+    _run(_test)
+
+
+def test_failed_tick_backs_off() -> None:
+    """A tick where every unit fails counts as a failed poll."""
+
+    async def _test(account: Any, ticks: _Ticks) -> None:
+        account.async_add_unit("unit", _coordinator(None, success=False))
+
+        await ticks.fire()
+        assert ticks.delay == UPDATE_INTERVAL
+        await ticks.fire()
+        assert ticks.delay == UPDATE_INTERVAL * 2
+        assert account.scheduler.changed_polls == 0
+
+    _run(_test)
+
+
+def test_refreshes_are_limited() -> None:
+    """No more than the limit of units refresh at once."""
+
+    async def _test(account: Any, ticks: _Ticks) -> None:
+        running = 0
+        most = 0
+
+        async def _refresh() -> None:
+            nonlocal running, most
+            running += 1
+            most = max(most, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        coordinators = [_coordinator(None) for _ in range(MAX_CONCURRENT_UNITS + 3)]
+        for index, coordinator in enumerate(coordinators):
+            coordinator.async_refresh = AsyncMock(side_effect=_refresh)
+            account.async_add_unit(str(index), coordinator)
+
+        await ticks.fire()
+
+        assert most == MAX_CONCURRENT_UNITS
+        assert all(c.async_refresh.await_count == 1 for c in coordinators)
+
+    _run(_test)
+
+
+def test_paused_while_the_breaker_is_open() -> None:
+    """No tick is scheduled until the breaker lets requests through again."""
+
+    async def _test(account: Any, ticks: _Ticks) -> None:
+        account.client.breaker.hold(time.monotonic(), 120)
+        account.async_add_unit("unit", _coordinator(None))
+
+        assert ticks.delay == pytest.approx(120, abs=1)
+
+    _run(_test)
+
+
+def test_boost() -> None:
+    """A boost brings the next tick forward."""
+
+    async def _test(account: Any, ticks: _Ticks) -> None:
+        account.async_add_unit("unit", _coordinator(None))
+        assert ticks.delay == UPDATE_INTERVAL
+
+        account.async_boost()
+
+        assert ticks.scheduled == 2
+        assert ticks.delay == BOOST_POLL_INTERVAL
+
+    _run(_test)
+
+
+def test_hub_goes_with_its_last_unit() -> None:
+    """The tick stops and the hub is removed once its last unit is."""
+
+    async def _test(account: Any, ticks: _Ticks) -> None:
+        hubs = account.hass.data[DOMAIN][POWERVAULT_HUBS]
+        account.async_add_unit("first", _coordinator(None))
+        account.async_add_unit("second", _coordinator(None))
+
+        account.async_remove_unit("first")
+        assert ticks.cancelled == 0
+        assert hubs == {"key": account}
+
+        account.async_remove_unit("second")
+        assert ticks.cancelled == 1
+        assert not hubs
+
+    _run(_test)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""Tests for the charge schedule optimizer."""
+
+import logging
+import random
+from datetime import datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault import optimizer  # noqa: E402
+from custom_components.powervault.rows import PowervaultRowBuffer  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+START = datetime(2024, 1, 15, tzinfo=dt_util.UTC)
+# Cheap overnight until 6am, then dear for the rest of the day
+TWO_RATE_TARIFF = [(dt_time(0), 0.10), (dt_time(6), 0.30)]
+
+
+def test_forecast_is_in_kwh_per_slot() -> None:
+    """A steady 1.2 kW of demand and 0.2 kW of solar needs 1 kW for 5 minutes."""
+    rows = PowervaultRowBuffer(optimizer.SLOTS_PER_DAY)
+    for slot in range(optimizer.SLOTS_PER_DAY):
+        rows.add(
+            {
+                "time": (START + timedelta(minutes=5 * slot)).timestamp(),
+                "instant_demand": 1_200_000,
+                "instant_solar": 200_000,
+            }
+        )
+
+    need = optimizer.forecast(rows, START + timedelta(days=1), 24)
+
+    assert need == pytest.approx([5 / 60] * 24)
+
+
+def test_forecast_without_rows_at_a_time_of_day() -> None:
+    """Times of day without rows use the average of all of them."""
+    rows = PowervaultRowBuffer(optimizer.SLOTS_PER_DAY)
+    for slot, demand in ((0, 600_000), (1, 1_800_000)):
+        rows.add(
+            {
+                "time": (START + timedelta(minutes=5 * slot)).timestamp(),
+                "instant_demand": demand,
+                "instant_solar": 0,
+            }
+        )
+
+    need = optimizer.forecast(rows, START, 3)
+
+    assert need == pytest.approx([0.05, 0.15, 0.1])
+
+
+def test_slot_trigger_fires_once_per_slot() -> None:
+    """The planned state is checked once at the start of each 5 minute slot."""
+    manager = MagicMock(optimizer_settings=None)
+    planner = optimizer.PowervaultOptimizer(
+        MagicMock(), manager, MagicMock(), MagicMock(), MagicMock()
+    )
+    with patch.object(optimizer, "async_track_utc_time_change") as track:
+        planner.async_start()
+    track.assert_called_once()
+    pattern = track.call_args.kwargs
+
+    seconds = dt_util.parse_time_expression(pattern.get("second"), 0, 59)
+    minutes = dt_util.parse_time_expression(pattern.get("minute"), 0, 59)
+    hours = dt_util.parse_time_expression(pattern.get("hour"), 0, 23)
+    fired = []
+    now = dt_util.find_next_time_expression_time(START, seconds, minutes, hours)
+    while now < START + timedelta(hours=1):
+        fired.append(now)
+        now = dt_util.find_next_time_expression_time(
+            now + timedelta(seconds=1), seconds, minutes, hours
+        )
+
+    assert fired == [START + timedelta(minutes=5 * slot) for slot in range(12)]
+
+
+def test_optimize_charges_cheap_and_discharges_dear() -> None:
+    """The battery is filled while it's cheap and emptied before the end.
+
+    From the reserve, with a steady 1 kW of demand for 12 hours, leaving the
+    battery alone imports it all. The cheapest plan is to charge for the whole
+    of the cheap period, so the battery isn't used for the cheap demand, and
+    to export what's left in the last hour, rather than value it at the
+    cheapest import price.
+    """
+    settings = optimizer.OptimizerSettings(
+        import_tariff=TWO_RATE_TARIFF, export_price=0.15
+    )
+    need = [5 / 60] * 144
+
+    schedule = optimizer.optimize(settings, 10, need, START)
+
+    assert schedule.charge == (0, 72)
+    assert schedule.discharge == (132, 144)
+    assert schedule.baseline_cost == pytest.approx(6 * 0.10 + 6 * 0.30)
+    # 6 kWh of demand and 8 kWh to fill the battery when cheap, the last
+    # 4 slots of demand when it's dear, less 8 slots of 3.3 kW discharge, 2.3 kW of it exported
+    assert schedule.cost == pytest.approx(
+        14 * 0.10 + 4 * 5 / 60 * 0.30 - 8 * (3.3 - 1) * 5 / 60 * 0.15
+    )
+    assert schedule.candidates == len(
+        optimizer.candidate_schedules(optimizer.candidate_windows(START, 144))
+    )
+    assert schedule.state_at(START) == optimizer.STATE_FORCE_CHARGE
+    assert schedule.state_at(START + timedelta(hours=6)) == optimizer.STATE_NORMAL
+    assert (
+        schedule.state_at(START + timedelta(hours=11))
+        == optimizer.STATE_FORCE_DISCHARGE
+    )
+
+
+def test_candidate_schedules_never_overlap() -> None:
+    """The first candidate leaves the battery alone, and no windows overlap."""
+    windows = optimizer.candidate_windows(START + timedelta(minutes=20), 36)
+    schedules = optimizer.candidate_schedules(windows)
+
+    # Windows start now or on the hour, and are cut short at the end
+    assert windows[0] == (0, 12)
+    assert (8, 20) in windows
+    assert (32, 36) in windows
+    assert (
+        schedules.charge_start[0],
+        schedules.charge_end[0],
+        schedules.discharge_start[0],
+        schedules.discharge_end[0],
+    ) == (0, 0, 0, 0)
+    for charge_start, charge_end, discharge_start, discharge_end in zip(
+        schedules.charge_start,
+        schedules.charge_end,
+        schedules.discharge_start,
+        schedules.discharge_end,
+    ):
+        assert charge_end <= discharge_start or discharge_end <= charge_start
+
+
+def test_simulations_agree() -> None:
+    """NumPy and Python work out the same cost for every candidate."""
+    if not optimizer.HAS_NUMPY:
+        pytest.skip("NumPy isn't installed")
+    generator = random.Random(3)
+    # Solar makes the need negative in some slots
+    need = [generator.uniform(-0.3, 0.3) for _ in range(48)]
+    battery = optimizer._Battery(  # pylint: disable=protected-access
+        charge=4.0, capacity=8.0, reserve=0.8, step=3.3 * 5 / 60
+    )
+    import_prices = optimizer.slot_prices(TWO_RATE_TARIFF, START, 48)
+    schedules = optimizer.candidate_schedules(optimizer.candidate_windows(START, 48))
+
+    costs = optimizer.simulate(battery, need, import_prices, 0.05, schedules)
+    with patch.object(optimizer, "HAS_NUMPY", False):
+        python_costs = optimizer.simulate(battery, need, import_prices, 0.05, schedules)
+
+    assert len(costs) == len(schedules)
+    assert costs == pytest.approx(python_costs)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Tests for the circuit breaker of the API client."""
+
+import logging
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from custom_components.powervault.resilience import (  # noqa: E402
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    CircuitBreaker,
+)
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+
+def _open_breaker() -> CircuitBreaker:
+    """Return a breaker that was opened at time 0 by three failures."""
+    breaker = CircuitBreaker(threshold=3, cooldown=10, max_cooldown=30)
+    for _ in range(3):
+        assert breaker.allow(0)
+        breaker.record_failure(0)
+    return breaker
+
+
+def test_opens_after_failures_in_a_row() -> None:
+    """A success resets the count, so only failures in a row open the breaker."""
+    breaker = CircuitBreaker(threshold=3, cooldown=10, max_cooldown=30)
+    breaker.record_failure(0)
+    breaker.record_failure(0)
+    breaker.record_success()
+    breaker.record_failure(0)
+    breaker.record_failure(0)
+    assert breaker.state == BREAKER_CLOSED
+
+    breaker.record_failure(0)
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.opened == 1
+    assert not breaker.allow(5)
+    assert breaker.retry_in(5) == 5
+
+
+def test_probe_closes() -> None:
+    """After the cooldown a single probe is let through, and closes it."""
+    breaker = _open_breaker()
+
+    assert breaker.allow(10)
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert not breaker.allow(10)
+    breaker.record_success()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.allow(10)
+    assert breaker.allow(10)
+
+
+def test_failed_probe_doubles_the_cooldown() -> None:
+    """A failed probe opens it again for twice as long, up to the maximum."""
+    breaker = _open_breaker()
+
+    assert breaker.allow(10)
+    breaker.record_failure(10)
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.retry_in(10) == 20
+
+    assert breaker.allow(30)
+    breaker.record_failure(30)
+    assert breaker.retry_in(30) == 30
+    assert breaker.opened == 3
+
+    # Once it closes, the cooldown starts again from the beginning
+    assert breaker.allow(60)
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure(60)
+    assert breaker.retry_in(60) == 10
+
+
+def test_released_probe() -> None:
+    """A probe that ended without an outcome lets another one through."""
+    breaker = _open_breaker()
+
+    assert breaker.allow(10)
+    breaker.release()
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert breaker.allow(10)
+
+
+def test_hold() -> None:
+    """It's held open as long as the API asks, up to the maximum cooldown."""
+    breaker = CircuitBreaker(threshold=3, cooldown=10, max_cooldown=30)
+
+    breaker.hold(0, 15)
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.retry_in(0) == 15
+    breaker.hold(0, 5)
+    assert breaker.retry_in(0) == 15
+    breaker.hold(0, 120)
+    assert breaker.retry_in(0) == 30
+    assert breaker.opened == 1
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Tests for the rolling window statistics."""
+
+import logging
+import random
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from custom_components.powervault.rolling import (  # noqa: E402
+    PowervaultRollingStats,
+    RollingWindow,
+)
+from custom_components.powervault.rows import PowervaultRowBuffer  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+
+def test_empty_window() -> None:
+    """A window without samples has no statistics."""
+    window = RollingWindow(600)
+
+    assert len(window) == 0
+    assert window.mean is None
+    assert window.min is None
+    assert window.max is None
+
+
+def test_extremes_expire() -> None:
+    """The min and max move on to the next one once they leave the window."""
+    window = RollingWindow(600)
+    for time, value in ((0, 5.0), (300, 9.0), (600, 1.0), (900, 4.0)):
+        window.add(time, value)
+
+    # The sample at 300 is on the edge of the window, so has gone
+    assert len(window) == 2
+    assert window.min == 1.0
+    assert window.max == 4.0
+    assert window.mean == pytest.approx(2.5)
+
+    window.expire(1200)
+    assert window.min == 4.0
+    assert window.max == 4.0
+
+    window.expire(1500)
+    assert len(window) == 0
+    assert window.max is None
+    assert window.total == 0.0
+
+
+def test_matches_the_samples_in_the_window() -> None:
+    """The statistics match those of the samples still in the window."""
+    generator = random.Random(1)
+    window = RollingWindow(3600)
+    samples = []
+    for time in range(0, 86400, 300):
+        value = generator.uniform(-5000, 5000)
+        window.add(time, value)
+        samples.append((time, value))
+        values = [value for when, value in samples if when > time - 3600]
+
+        assert len(window) == len(values)
+        assert window.min == min(values)
+        assert window.max == max(values)
+        assert window.mean == pytest.approx(sum(values) / len(values))
+
+
+def _row(time: float, demand: float | None) -> dict:
+    """Return a row with a demand reading."""
+    return {"time": time, "instant_demand": demand}
+
+
+def test_stats_see_rows_filled_in_later() -> None:
+    """A bucket that was blank at first is counted once its values arrive."""
+    rows = PowervaultRowBuffer(1000)
+    stats = PowervaultRollingStats()
+    start = 1_705_276_800
+
+    rows.add(_row(start, 1000))
+    stats.update(rows)
+    rows.add(_row(start + 300, None))
+    stats.update(rows)
+    rows.add(_row(start + 300, 5000))
+    stats.update(rows)
+
+    assert list(rows.column("instant_demand")) == [1000, 5000]
+    values = stats.values()
+    assert values["demand_max_24h"] == 5000
+    assert values["demand_mean_1h"] == pytest.approx(3000)
+
+
+def test_stats_see_rows_added_out_of_order() -> None:
+    """Older rows added after newer ones, e.g. by a full fetch, are counted."""
+    rows = PowervaultRowBuffer(1000)
+    stats = PowervaultRollingStats()
+    start = 1_705_276_800
+
+    rows.add(_row(start + 600, 1000))
+    stats.update(rows)
+    rows.extend([_row(start, 4000), _row(start + 300, 2000)])
+    stats.update(rows)
+
+    values = stats.values()
+    assert values["demand_max_24h"] == 4000
+    assert values["demand_mean_1h"] == pytest.approx(7000 / 3)
+
+
+def test_stats_match_a_fresh_start() -> None:
+    """However the rows arrive, the stats match those worked out from scratch."""
+    generator = random.Random(2)
+    rows = PowervaultRowBuffer(400)
+    stats = PowervaultRollingStats()
+    start = 1_705_276_800
+    for bucket in range(600):
+        blank = generator.random() < 0.3
+        rows.add(_row(start + bucket * 300, None if blank else bucket))
+        if blank or generator.random() < 0.1:
+            # Fill in this bucket, or one from earlier, after the stats saw it
+            stats.update(rows)
+            earlier = bucket - generator.randrange(0, 20)
+            rows.add(_row(start + earlier * 300, generator.uniform(0, 5000)))
+        stats.update(rows)
+
+        fresh = PowervaultRollingStats()
+        restored = PowervaultRowBuffer(400)
+        restored.restore(rows.as_dict())
+        fresh.update(restored)
+        assert stats.values() == pytest.approx(fresh.values())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""Tests for choosing when to poll next."""
+
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault.const import (  # noqa: E402
+    BOOST_DURATION,
+    BOOST_POLL_INTERVAL,
+    MAX_POLL_INTERVAL,
+    MIN_POLL_INTERVAL,
+    POLL_SETTLE_DELAY,
+    UPDATE_INTERVAL,
+)
+from custom_components.powervault.scheduler import PowervaultPollScheduler  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+ROW_TIME = datetime(2024, 1, 15, 12, tzinfo=dt_util.UTC)
+
+
+def _seconds(scheduler: PowervaultPollScheduler, now: datetime) -> float:
+    """Return the seconds until the next poll."""
+    interval: timedelta = scheduler.next_interval(now)
+    return interval.total_seconds()
+
+
+def test_polls_at_the_usual_interval_until_there_are_rows() -> None:
+    """Without a row to go on, it polls at the usual interval."""
+    scheduler = PowervaultPollScheduler()
+
+    assert _seconds(scheduler, ROW_TIME) == UPDATE_INTERVAL
+    assert scheduler.hit_rate is None
+
+
+def test_polls_just_after_the_next_bucket() -> None:
+    """After a new bucket, the next poll is when the one after should be out."""
+    scheduler = PowervaultPollScheduler()
+    scheduler.record_poll(success=True, changed=True, row_time=ROW_TIME)
+
+    now = ROW_TIME + timedelta(seconds=40)
+    assert _seconds(scheduler, now) == 300 + POLL_SETTLE_DELAY - 40
+    assert scheduler.interval == timedelta(seconds=300 + POLL_SETTLE_DELAY - 40)
+    # It never polls sooner than the minimum, however close the bucket is
+    now = ROW_TIME + timedelta(minutes=5, seconds=POLL_SETTLE_DELAY - 1)
+    assert _seconds(scheduler, now) == MIN_POLL_INTERVAL
+
+    # An older row doesn't move the next poll back
+    scheduler.record_poll(
+        success=True, changed=True, row_time=ROW_TIME - timedelta(minutes=5)
+    )
+    assert scheduler.latest_row_time == ROW_TIME
+
+
+def test_backs_off_while_the_bucket_is_late() -> None:
+    """Each poll that finds nothing new doubles the wait, up to the maximum."""
+    scheduler = PowervaultPollScheduler()
+    scheduler.record_poll(success=True, changed=True, row_time=ROW_TIME)
+    now = ROW_TIME + timedelta(minutes=6)
+
+    waits = []
+    for _ in range(7):
+        waits.append(_seconds(scheduler, now))
+        scheduler.record_poll(success=True, changed=False, row_time=ROW_TIME)
+
+    assert waits == [15, 30, 60, 120, 240, MAX_POLL_INTERVAL, MAX_POLL_INTERVAL]
+    assert scheduler.hit_rate == pytest.approx(1 / 8)
+
+    # The next bucket resets the back off
+    new_row_time = ROW_TIME + timedelta(minutes=5)
+    scheduler.record_poll(success=True, changed=True, row_time=new_row_time)
+    assert _seconds(scheduler, now) == 300 + POLL_SETTLE_DELAY - 60
+
+
+def test_backs_off_after_failures() -> None:
+    """Failed polls double the wait from the usual interval, until one succeeds."""
+    scheduler = PowervaultPollScheduler()
+    scheduler.record_poll(success=True, changed=True, row_time=ROW_TIME)
+    now = ROW_TIME + timedelta(seconds=40)
+
+    waits = []
+    for _ in range(6):
+        scheduler.record_poll(success=False, changed=False, row_time=None)
+        waits.append(_seconds(scheduler, now))
+
+    assert waits == [30, 60, 120, 240, MAX_POLL_INTERVAL, MAX_POLL_INTERVAL]
+    assert scheduler.as_dict()["consecutive_failures"] == 6
+
+    scheduler.record_poll(success=True, changed=False, row_time=ROW_TIME)
+    assert _seconds(scheduler, now) == 300 + POLL_SETTLE_DELAY - 40
+
+
+def test_boost_expires() -> None:
+    """A boost polls quickly, even after failures, until it runs out."""
+    scheduler = PowervaultPollScheduler()
+    scheduler.record_poll(success=True, changed=True, row_time=ROW_TIME)
+    scheduler.record_poll(success=False, changed=False, row_time=None)
+    now = ROW_TIME + timedelta(seconds=40)
+
+    scheduler.boost(now)
+
+    assert _seconds(scheduler, now) == BOOST_POLL_INTERVAL
+    later = now + timedelta(seconds=BOOST_DURATION - 1)
+    assert _seconds(scheduler, later) == BOOST_POLL_INTERVAL
+    expired = now + timedelta(seconds=BOOST_DURATION)
+    assert _seconds(scheduler, expired) == UPDATE_INTERVAL
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Tests for parsing the rows of a response as it arrives."""
+
+import json
+import logging
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from custom_components.powervault.api import _RowStreamParser  # noqa: E402
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+ROWS = [
+    {"time": 1705276800000, "instant_soc": 50, "note": "café ☀"},
+    {"time": 1705277100000, "instant_soc": 51, "note": '[]{},"data": ['},
+]
+
+
+def _parse(body: bytes, size: int) -> tuple[list[dict], _RowStreamParser]:
+    """Feed a body to a parser in chunks of a size, returning the rows."""
+    parser = _RowStreamParser("utf-8")
+    rows = []
+    for start in range(0, len(body), size):
+        rows += parser.feed(body[start : start + size])
+    return rows, parser
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 4096])  # type: ignore[misc]
+def test_rows_split_across_chunks(size: int) -> None:
+    """Rows are parsed however the body is split, including multi-byte characters."""
+    body = json.dumps({"unit": "a", "data": ROWS}, ensure_ascii=False).encode()
+
+    rows, parser = _parse(body, size)
+
+    assert rows == ROWS
+    assert parser.complete
+
+
+def test_data_inside_strings() -> None:
+    """The data array is found by its key, not by "data" in a string before it."""
+    body = json.dumps(
+        {"message": 'no "data": [here]', "label": "data", "data": ROWS}
+    ).encode()
+
+    rows, parser = _parse(body, 5)
+
+    assert rows == ROWS
+    assert parser.complete
+
+
+def test_truncated_body() -> None:
+    """A body that stops part way through the data array isn't complete."""
+    body = json.dumps({"data": ROWS}).encode()
+
+    rows, parser = _parse(body[:-10], 16)
+
+    assert rows == ROWS[:1]
+    assert not parser.complete
+
+
+def test_no_data() -> None:
+    """A body without a data array has no rows, and is complete."""
+    rows, parser = _parse(b'{"error": "Unit not found"}', 4)
+
+    assert not rows
+    assert not parser.found
+    assert parser.complete
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""Tests for folding data rows into today's totals."""
+
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+# pylint: disable=wrong-import-position
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.powervault.totals import (  # noqa: E402
+    PowervaultTotalsAccumulator,
+)
+
+logging.getLogger().setLevel(logging.DEBUG)
+
+MIDNIGHT = datetime(2024, 1, 15, tzinfo=dt_util.UTC)
+
+
+def _row(minutes: int, watts: float = 1200) -> dict:
+    """Return a row for the bucket a number of minutes after midnight."""
+    return {
+        "time": (MIDNIGHT + timedelta(minutes=minutes)).isoformat(),
+        "instant_battery": 0,
+        "homeConsumed": watts,
+    }
+
+
+def _accumulator() -> PowervaultTotalsAccumulator:
+    """Return an accumulator for the day, with the first two buckets folded in."""
+    accumulator = PowervaultTotalsAccumulator()
+    accumulator.load_day([_row(0), _row(5)], MIDNIGHT + timedelta(minutes=5))
+    return accumulator
+
+
+def test_fold_next_buckets() -> None:
+    """Consecutive buckets are added to the totals, oldest first."""
+    accumulator = _accumulator()
+
+    assert accumulator.fold([_row(10), _row(15)])
+    # 1.2 kW for four 5 minute buckets
+    assert accumulator.totals["homeConsumed"] == pytest.approx(0.4)
+
+
+def test_fold_newest_first_sees_a_gap() -> None:
+    """Rows have to be folded oldest first, or the newest looks like a gap."""
+    accumulator = _accumulator()
+
+    assert not accumulator.fold([_row(15), _row(10)])
+
+
+def test_fold_replaces_a_bucket() -> None:
+    """A bucket seen again replaces its contribution rather than adding to it."""
+    accumulator = _accumulator()
+
+    assert accumulator.fold([_row(5, 2400)])
+    assert accumulator.fold([_row(5, 600)])
+    assert accumulator.totals["homeConsumed"] == pytest.approx(0.15)
+
+
+def test_fold_missed_bucket() -> None:
+    """A missed bucket means the whole day has to be fetched again."""
+    accumulator = _accumulator()
+
+    assert not accumulator.fold([_row(15)])
+
+
+def test_fold_without_time() -> None:
+    """A row without a time can't be placed in a bucket."""
+    accumulator = _accumulator()
+
+    assert not accumulator.fold([{"instant_battery": 0, "homeConsumed": 1200}])
+
+
+def test_fold_over_midnight() -> None:
+    """Rows from yesterday are skipped, and one from tomorrow needs a new day."""
+    accumulator = _accumulator()
+
+    assert accumulator.fold([_row(-5)])
+    assert accumulator.totals["homeConsumed"] == pytest.approx(0.2)
+    assert not accumulator.needs_full_fetch(MIDNIGHT + timedelta(hours=23))
+    assert not accumulator.fold([_row(24 * 60)])
+    assert accumulator.needs_full_fetch(MIDNIGHT + timedelta(days=1))